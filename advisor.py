@@ -0,0 +1,140 @@
+"""Upgrade lookahead advisor.
+
+When the upgrade popup is open, the advisor snapshots the game, forks it
+once per offered upgrade, plays each fork ahead headlessly with a manual
+clock (later popups take their first option) and ranks the upgrades by the
+score and armor they lead to. Forks run either in this process (restoring
+the original state afterwards) or on a pool of worker processes that each
+import the game on their own.
+
+Every fork stops at the horizon or at the shared wall-clock deadline,
+whichever comes first, and records its value every ``sample_ms`` of game
+time; options are compared at the furthest point all forks reached, so a
+tight budget shortens the lookahead instead of favouring the fastest fork.
+"""
+import contextlib
+import multiprocessing
+import os
+import sys
+import time
+
+
+class Rollout:
+    """一个升级选项的前瞻结果"""
+    def __init__(self, option, values, state):
+        self.option = option
+        self.values = values   # 每隔sample_ms游戏时间记录一次的价值
+        self.state = state     # 前瞻结束时的game_state()
+        self.value = values[-1] if values else 0.0
+
+    def __repr__(self):
+        return f"Rollout({self.option!r}, value={self.value:.1f}, simulated={len(self.values)})"
+
+
+def evaluate(game, game_over_penalty):
+    """局面的价值：分数加护甲，游戏结束时扣除惩罚"""
+    return game.score + game.armor - (game_over_penalty if game.game_over else 0)
+
+
+def rollout(game, snapshot, option, horizon_ms, sample_ms, tick_ms, deadline, game_over_penalty):
+    """从快照出发选择option，向前模拟horizon_ms或直到deadline（time.monotonic()）"""
+    game.restore_game(snapshot)
+    clock = game.ManualClock(snapshot["time"])
+    game.game_clock = clock
+    popup = game.upgrade_popup
+    for button in popup.current_upgrades:
+        if button["text"] == option:
+            popup.handle_click(button["rect"].center, game.player)
+            break
+
+    values = []
+    next_sample = snapshot["time"] + sample_ms
+    end = snapshot["time"] + horizon_ms
+    while clock.time < end and time.monotonic() < deadline:
+        clock.advance(tick_ms)
+        popup = game.upgrade_popup
+        if popup.active and not game.game_over:
+            # 之后的弹窗总是选择第一个选项
+            if popup.current_upgrades:
+                popup.handle_click(popup.current_upgrades[0]["rect"].center, game.player)
+            else:
+                popup.active = False
+        game.update_game(clock.get_ticks())
+        if clock.time >= next_sample:
+            values.append(evaluate(game, game_over_penalty))
+            next_sample += sample_ms
+    return Rollout(option, values, game.game_state())
+
+
+def init_worker():
+    """工作进程：无界面导入游戏，丢弃游戏的print输出"""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    sys.stdout = open(os.devnull, "w")
+    import hofund   # noqa: F401
+
+
+def worker_rollout(args):
+    import hofund
+    return rollout(hofund, *args)
+
+
+class UpgradeAdvisor:
+    """为当前弹窗中的升级选项排序：每个选项分叉一次快照并向前模拟"""
+    def __init__(self, game, horizon_ms=60000, budget_ms=300, workers=0, sample_ms=1000,
+                 tick_ms=1000 / 60, game_over_penalty=10000):
+        self.game = game              # 游戏模块（hofund）
+        self.horizon_ms = horizon_ms
+        self.budget_ms = budget_ms
+        self.workers = workers        # 0表示在当前进程中模拟
+        self.sample_ms = sample_ms
+        self.tick_ms = tick_ms
+        self.game_over_penalty = game_over_penalty
+        self.pool = None
+
+    def rank(self):
+        """返回按价值从高到低排列的Rollout列表；弹窗没有选项时返回空列表"""
+        game = self.game
+        options = [button["text"] for button in game.upgrade_popup.current_upgrades]
+        if not options:
+            return []
+        snapshot = game.snapshot_game()
+        deadline = time.monotonic() + self.budget_ms / 1000
+        args = [(snapshot, option, self.horizon_ms, self.sample_ms, self.tick_ms, deadline,
+                 self.game_over_penalty) for option in options]
+        if self.workers:
+            if self.pool is None:
+                context = multiprocessing.get_context("spawn")
+                self.pool = context.Pool(self.workers, initializer=init_worker)
+            rollouts = self.pool.map(worker_rollout, args)
+        else:
+            rollouts = self.rank_inline(args)
+
+        # 在所有分叉都到达的最远时间点上比较
+        reached = min(len(result.values) for result in rollouts)
+        for result in rollouts:
+            result.value = result.values[reached - 1] if reached else 0.0
+        return sorted(rollouts, key=lambda result: result.value, reverse=True)
+
+    def rank_inline(self, args):
+        """在当前进程中依次模拟每个选项，每个选项分到相同的时间预算，最后恢复原来的状态"""
+        game = self.game
+        clock = game.game_clock
+        start = time.monotonic()
+        share = (args[0][5] - start) / len(args)
+        rollouts = []
+        try:
+            with contextlib.redirect_stdout(None):
+                for i, (snapshot, *rest) in enumerate(args):
+                    rest[4] = start + share * (i + 1)
+                    rollouts.append(rollout(game, snapshot, *rest))
+        finally:
+            game.restore_game(args[0][0])
+            game.game_clock = clock
+        return rollouts
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
@@ -0,0 +1,236 @@
+"""Parallel batch simulator for balance sweeps.
+
+Runs many headless games in a process pool. Every game has its own seed,
+parameter set (overrides of the balance globals in hofund.py, such as
+MONSTER_STATS or UPGRADE_DROP_CHANCE) and upgrade policy from
+simulation.POLICIES. Workers are started with the "spawn" method, so each
+one imports hofund and initializes pygame on its own. Results are folded
+into running statistics per (parameter set, policy) as they arrive, and
+optionally streamed one JSON line per game to a file, so memory stays flat
+however many games are run:
+
+    python batch.py --games 1000 --policies first random --params sweep.json --output games.jsonl
+
+A parameter file maps set names to overrides; dict-valued globals are
+merged, so only the changed fields need to be given:
+
+    {"baseline": {},
+     "tough_tanks": {"MONSTER_STATS": {"2": {"max_health": 100}}},
+     "fast_spawns": {"SPAWN_INTERVAL_SCALE": 0.8, "UPGRADE_DROP_CHANCE": 0.02}}
+"""
+import os
+
+# 工作进程无界面运行：spawn的子进程会继承这些环境变量
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import copy
+import itertools
+import json
+import math
+import multiprocessing
+import time
+
+import numpy as np
+
+# 可以被参数集覆盖的hofund全局变量
+TUNABLES = (
+    "MONSTER_STATS",
+    "SWORD_BASE_STATS",
+    "SWORD_FIRE_RATE_UPGRADE",
+    "SWORD_DAMAGE_UPGRADE",
+    "UPGRADE_DROP_CHANCE",
+    "UPGRADE_DROP_KILL_LIMIT",
+    "SPAWN_INTERVAL_SCALE",
+    "WAVE_PRESET",
+)
+SAMPLE_MS = 10000   # 护甲曲线的采样间隔
+
+# 工作进程的状态（每个进程一份）
+_defaults = None
+
+
+def init_worker():
+    """工作进程启动时导入游戏并记下平衡参数的默认值"""
+    global _defaults
+    import hofund
+    _defaults = {name: copy.deepcopy(getattr(hofund, name)) for name in TUNABLES}
+
+
+def merge(default, override):
+    """把覆盖值合并进默认值；字典逐项合并，JSON的字符串键按默认值的键类型转换"""
+    if not isinstance(default, dict) or not isinstance(override, dict):
+        return copy.deepcopy(override)
+    merged = copy.deepcopy(default)
+    keys = {str(key): key for key in default}
+    for key, value in override.items():
+        key = keys.get(str(key), key)
+        merged[key] = merge(default[key], value) if key in default else copy.deepcopy(value)
+    return merged
+
+
+def apply_overrides(overrides):
+    """恢复默认平衡参数后应用一个参数集"""
+    import hofund
+    unknown = set(overrides) - set(TUNABLES)
+    if unknown:
+        raise ValueError(f"unknown balance parameters: {', '.join(sorted(unknown))}")
+    for name, default in _defaults.items():
+        value = merge(default, overrides[name]) if name in overrides else copy.deepcopy(default)
+        if name == "SWORD_BASE_STATS":
+            value = {key: tuple(stats) for key, stats in value.items()}
+        setattr(hofund, name, value)
+
+
+def run_game(job):
+    """在工作进程中运行一局，返回结果摘要和护甲曲线"""
+    import hofund
+    import simulation
+    seed, params_name, overrides, policy_name, duration_ms, sample_ms = job
+    duration_ms = int(duration_ms)
+    apply_overrides(overrides)
+    sim = simulation.HeadlessSimulation(seed=seed, upgrade_policy=simulation.POLICIES[policy_name],
+                                        waves=hofund.WAVE_PRESET)
+    curve = [hofund.armor]
+    start = time.perf_counter()
+    for sample_time in range(sample_ms, duration_ms + 1, sample_ms):
+        sim.run(duration_ms=sample_time)
+        curve.append(hofund.armor)
+    sim.run(duration_ms=duration_ms)
+    return {
+        "params": params_name,
+        "policy": policy_name,
+        "seed": seed,
+        "survival_ms": sim.current_time if hofund.game_over else duration_ms,
+        "game_over": hofund.game_over,
+        "score": hofund.score,
+        "killed_monsters": hofund.killed_monsters,
+        "armor": hofund.armor,
+        "armor_curve": curve,
+        "wall_time": time.perf_counter() - start,
+    }
+
+
+class RunningStats:
+    """流式统计（Welford算法）：均值、标准差、最小值、最大值"""
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def summary(self):
+        std = math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+        return {"mean": self.mean, "std": std, "min": self.min, "max": self.max}
+
+
+class GroupAggregate:
+    """一组 (参数集, 策略) 的流式汇总"""
+    METRICS = ("survival_ms", "score", "killed_monsters", "armor")
+
+    def __init__(self):
+        self.games = 0
+        self.game_overs = 0
+        self.stats = {metric: RunningStats() for metric in self.METRICS}
+        self.curve_sum = None
+
+    def add(self, result):
+        self.games += 1
+        self.game_overs += result["game_over"]
+        for metric in self.METRICS:
+            self.stats[metric].add(result[metric])
+        curve = np.asarray(result["armor_curve"], np.float64)
+        self.curve_sum = curve if self.curve_sum is None else self.curve_sum + curve
+
+    def summary(self):
+        summary = {"games": self.games, "survival_rate": 1 - self.game_overs / self.games}
+        for metric, stats in self.stats.items():
+            summary[metric] = stats.summary()
+        summary["mean_armor_curve"] = (self.curve_sum / self.games).round(2).tolist()
+        return summary
+
+
+def jobs(param_sets, policies, games, base_seed, duration_ms, sample_ms):
+    """按需生成任务；各参数集和策略使用同一组种子，便于成对比较"""
+    for index in range(games):
+        for (params_name, overrides), policy_name in itertools.product(param_sets.items(), policies):
+            yield (base_seed + index, params_name, overrides, policy_name, duration_ms, sample_ms)
+
+
+def run_batch(param_sets, policies, games, base_seed=0, duration_ms=600000, sample_ms=SAMPLE_MS,
+              workers=None, output=None, chunksize=4, progress=True):
+    """运行所有对局，返回 (参数集, 策略) -> 汇总"""
+    aggregates = {}
+    total = games * len(param_sets) * len(policies)
+    start = time.perf_counter()
+    stream = open(output, "w") if output else None
+    context = multiprocessing.get_context("spawn")
+    try:
+        with context.Pool(workers, initializer=init_worker) as pool:
+            results = pool.imap_unordered(run_game, jobs(param_sets, policies, games, base_seed,
+                                                         duration_ms, sample_ms), chunksize)
+            for done, result in enumerate(results, 1):
+                key = (result["params"], result["policy"])
+                aggregates.setdefault(key, GroupAggregate()).add(result)
+                if stream is not None:
+                    stream.write(json.dumps(result) + "\n")
+                if progress and (done % 100 == 0 or done == total):
+                    print(f"{done}/{total} games, {done / (time.perf_counter() - start):.1f} games/s")
+            # 让工作进程正常退出（terminate会向已初始化pygame的进程发送SIGTERM）
+            pool.close()
+            pool.join()
+    finally:
+        if stream is not None:
+            stream.close()
+    return {key: aggregate.summary() for key, aggregate in sorted(aggregates.items())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run many headless Hofund games in parallel.")
+    parser.add_argument("--games", type=int, default=100, help="games per parameter set and policy")
+    parser.add_argument("--minutes", type=float, default=10, help="game time per game")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game")
+    parser.add_argument("--params", help="JSON file of parameter sets (default: the current values)")
+    parser.add_argument("--policies", nargs="+", default=["random"], help="upgrade policies to run")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--sample-ms", type=int, default=SAMPLE_MS, help="armor curve sampling interval")
+    parser.add_argument("--output", help="stream every game's result to this JSON-lines file")
+    parser.add_argument("--summary", help="write the aggregated results to this JSON file")
+    args = parser.parse_args()
+
+    import simulation
+    unknown = set(args.policies) - set(simulation.POLICIES)
+    if unknown:
+        parser.error(f"unknown policies: {', '.join(sorted(unknown))} (choose from {', '.join(simulation.POLICIES)})")
+    if args.params:
+        with open(args.params) as f:
+            param_sets = json.load(f)
+    else:
+        param_sets = {"default": {}}
+
+    summaries = run_batch(param_sets, args.policies, args.games, args.seed, args.minutes * 60 * 1000,
+                          args.sample_ms, args.workers, args.output)
+
+    print(f"{'params':<16} {'policy':<8} {'games':>6} {'survival':>9} {'score':>9} {'kills':>8} {'armor':>8}")
+    for (params_name, policy_name), summary in summaries.items():
+        print(f"{params_name:<16} {policy_name:<8} {summary['games']:>6} {summary['survival_rate']:>8.1%} "
+              f"{summary['score']['mean']:>9.1f} {summary['killed_monsters']['mean']:>8.1f} "
+              f"{summary['armor']['mean']:>8.1f}")
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump([{"params": params_name, "policy": policy_name, **summary}
+                       for (params_name, policy_name), summary in summaries.items()], f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
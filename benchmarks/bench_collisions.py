@@ -0,0 +1,78 @@
+"""Benchmark: sword-monster collision queries, brute force vs spatial grid.
+
+Builds synthetic scenes with monsters spread over the wormhole and attack
+areas and swords flying in random directions, checks that the grid returns
+exactly the same hits (same monsters, same order) as
+pygame.sprite.spritecollide, and times both:
+
+    python -m benchmarks.bench_collisions
+"""
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import random
+import time
+
+import pygame
+
+import hofund
+
+MONSTER_COUNTS = [100, 500, 1000, 2000]
+SWORD_COUNTS = [250, 1000, 2000]
+REPEATS = 5
+
+
+def build_scene(monster_count, sword_count, rng):
+    """生成怪物和飞剑（不加入all_sprites，不会被更新）"""
+    monsters = hofund.MonsterGroup()
+    swords = pygame.sprite.Group()
+    defense_line = int(hofund.SCREEN_HEIGHT - hofund.DEFENSE_HEIGHT)
+    for _ in range(monster_count):
+        monster = hofund.Monster(rng.choice([0, 1, 2]))
+        monster.rect.x = rng.randint(0, hofund.SCREEN_WIDTH - monster.rect.width)
+        monster.rect.bottom = rng.randint(monster.rect.height - 50, defense_line)
+        monsters.add(monster)
+    for _ in range(sword_count):
+        sword = hofund.Sword(rng.randint(0, hofund.SCREEN_WIDTH), rng.randint(-20, defense_line),
+                             rng.choice([hofund.NORMAL_SWORD, hofund.ICE_SWORD, hofund.FIRE_SWORD]),
+                             8, 20, rng.uniform(0, 180))
+        swords.add(sword)
+    return monsters, swords
+
+
+def brute_force(swords, monsters):
+    return [pygame.sprite.spritecollide(sword, monsters, False) for sword in swords]
+
+
+def grid(swords, monsters):
+    return [monsters.spritecollide(sword) for sword in swords]
+
+
+def best_time(func, *args):
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    rng = random.Random(0)
+    print(f"{'monsters':>8} {'swords':>7} {'hits':>6} {'brute ms':>9} {'grid ms':>8} {'speedup':>8}")
+    for monster_count in MONSTER_COUNTS:
+        for sword_count in SWORD_COUNTS:
+            monsters, swords = build_scene(monster_count, sword_count, rng)
+            expected = brute_force(swords, monsters)
+            assert grid(swords, monsters) == expected, "grid hits differ from spritecollide"
+            hits = sum(1 for hit in expected if hit)
+            brute_ms = best_time(brute_force, swords, monsters) * 1000
+            grid_ms = best_time(grid, swords, monsters) * 1000
+            print(f"{monster_count:>8} {sword_count:>7} {hits:>6} {brute_ms:>9.2f} {grid_ms:>8.2f} "
+                  f"{brute_ms / grid_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Benchmark: per-sprite update() vs the NumPy entity store step.
+
+Fills the game with N monsters and N swords (launched from the defense
+area, pointing up into the attack area) and times one update of movement,
+defense-line arrival and off-screen culling with each backend. Before
+timing, it checks that both backends play the same game: sword rains
+follow monsters in a crowd where far more than MOVE_BATCH_SIZE move each
+tick, and every frame's rain positions and monster health must match:
+
+    python -m benchmarks.bench_entity_store
+"""
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import random
+import time
+
+import hofund
+
+ENTITY_COUNTS = [1000, 5000, 10000, 20000]
+FRAMES = 8
+RAIN_MONSTERS = 300
+RAIN_FRAMES = 300
+
+
+def build_scene(count, use_store, seed=0):
+    """重置游戏并生成count个怪物和count把飞剑"""
+    hofund.USE_ENTITY_STORE = use_store
+    hofund.reset_game()
+    rng = random.Random(seed)
+    random.seed(seed)
+    for _ in range(count):
+        monster = hofund.make_monster(rng.choice([0, 1, 2]))
+        hofund.all_sprites.add(monster)
+        hofund.monsters.add(monster)
+        sword = hofund.make_sword(rng.randint(0, hofund.SCREEN_WIDTH), rng.randint(600, 790),
+                                  hofund.NORMAL_SWORD, 8, 20, rng.uniform(60, 120))
+        hofund.all_sprites.add(sword)
+        hofund.swords.add(sword)
+
+
+def rain_trace(use_store, seed=0):
+    """RAIN_MONSTERS只怪物，每10只头上放一场剑雨，逐帧记下剑雨的中心和所有怪物的生命值"""
+    hofund.USE_ENTITY_STORE = use_store
+    hofund.game_clock = hofund.ManualClock()
+    hofund.reset_game()
+    rng = random.Random(seed)
+    random.seed(seed)
+    monsters = []
+    for _ in range(RAIN_MONSTERS):
+        monster = hofund.make_monster(rng.choice([0, 1, 2]), rng.randint(0, hofund.SCREEN_WIDTH - 40),
+                                      rng.randint(-50, 500))
+        hofund.all_sprites.add(monster)
+        hofund.monsters.add(monster)
+        monsters.append(monster)
+    rains = []
+    for monster in monsters[::10]:
+        rain = hofund.rain_pool.acquire(monster, 3, 40, 60000)
+        hofund.all_sprites.add(rain)
+        rains.append(rain)
+    trace = []
+    for _ in range(RAIN_FRAMES):
+        hofund.game_clock.advance(1000 / hofund.FPS)
+        if use_store:
+            hofund.update_entity_store()
+        hofund.all_sprites.update()
+        hofund.game_events.resolve()
+        # 不读怪物的rect：数组后端的rect在读取时才同步，读取会掩盖剑雨用到的过时位置
+        trace.append((tuple(rain.rect.center for rain in rains), tuple(monster.health for monster in monsters)))
+    return trace
+
+
+def update_sprites():
+    hofund.all_sprites.update()
+
+
+def update_store():
+    hofund.update_entity_store()
+    hofund.all_sprites.update()
+
+
+def time_frames(update):
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        update()
+    return (time.perf_counter() - start) / FRAMES
+
+
+def main():
+    hofund.game_clock = hofund.ManualClock()
+    sprite_trace = rain_trace(False)
+    store_trace = rain_trace(True)
+    same = sum(a == b for a, b in zip(sprite_trace, store_trace))
+    assert same == RAIN_FRAMES, f"sword rains differ between backends in {RAIN_FRAMES - same} of {RAIN_FRAMES} frames"
+    print(f"sword rains over {RAIN_MONSTERS} monsters: {RAIN_FRAMES} frames identical with both backends")
+    print(f"{'entities':>8} {'sprites ms':>11} {'store ms':>9} {'speedup':>8}")
+    for count in ENTITY_COUNTS:
+        build_scene(count, False)
+        sprite_ms = time_frames(update_sprites) * 1000
+        build_scene(count, True)
+        store_ms = time_frames(update_store) * 1000
+        print(f"{count * 2:>8} {sprite_ms:>11.2f} {store_ms:>9.2f} {sprite_ms / store_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
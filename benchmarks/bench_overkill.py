@@ -0,0 +1,99 @@
+"""Benchmark: wasted sword damage with and without target allocation.
+
+Plays headless games ("rush" waves, all three sword types unlocked and
+firing ``count`` swords a shot) once aiming every shot at the nearest
+monster and once with ALLOCATE_TARGETS, where the player keeps a ledger
+of the damage already flying at each monster and sends further swords to
+the next candidate once a monster is as good as dead. Every point of
+damage fired is accounted as useful (it took health off a monster),
+overkill (the part of a killing hit beyond the monster's remaining
+health) or missed (the sword left the screen, or its target died first
+and it hit nothing); swords still flying at the end are left out.
+Reports the shares of wasted damage, swords fired per kill and the
+game's results:
+
+    python -m benchmarks.bench_overkill
+"""
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import hofund
+import simulation
+
+SWORD_COUNTS = [1, 3, 6]
+SEEDS = [1, 2, 3]
+GAME_MINUTES = 5
+
+
+def count_damage():
+    """包装Sword.reset并订阅伤害事件，统计飞剑发射、命中和溢出的伤害（剑雨的伤害不计入）"""
+    counts = {"swords": 0, "fired": 0, "useful": 0, "overkill": 0}
+    reset = hofund.Sword.reset
+
+    def counting_reset(self, x, y, sword_type, damage, damage_range, angle):
+        reset(self, x, y, sword_type, damage, damage_range, angle)
+        counts["swords"] += 1
+        counts["fired"] += hofund.hit_damage(sword_type, damage)
+
+    def count_hits(damage, kills):
+        for monster, source, amount, health in damage:
+            if source == hofund.SWORD_RAIN:
+                continue
+            overkill = max(-health, 0)
+            counts["useful"] += amount - overkill
+            counts["overkill"] += overkill
+
+    hofund.Sword.reset = counting_reset
+    hofund.game_events.subscribe(count_hits)
+
+    def restore():
+        hofund.Sword.reset = reset
+        hofund.game_events.unsubscribe(count_hits)
+    return counts, restore
+
+
+def play(count, allocate, seed):
+    hofund.ALLOCATE_TARGETS = allocate
+    sim = simulation.HeadlessSimulation(seed=seed, waves="rush")
+    player = hofund.player
+    for sword_type in (hofund.ICE_SWORD, hofund.FIRE_SWORD):
+        player.unlock_sword_type(sword_type)
+    for sword_type in (hofund.NORMAL_SWORD, hofund.ICE_SWORD, hofund.FIRE_SWORD):
+        player.sword_attributes[sword_type].count = count
+    counts, restore = count_damage()
+    try:
+        sim.run(duration_ms=GAME_MINUTES * 60 * 1000)
+    finally:
+        restore()
+    flying = sum(hofund.hit_damage(sword.sword_type, sword.damage) for sword in hofund.swords)
+    counts["missed"] = counts["fired"] - flying - counts["useful"] - counts["overkill"]
+    return counts, sim.summary()
+
+
+def main():
+    print(f"{GAME_MINUTES} minute games, rush waves, seeds {SEEDS}")
+    print(f"{'count':>5} {'mode':<8} {'fired':>8} {'overkill%':>9} {'missed%':>8} {'wasted%':>8} "
+          f"{'swords/kill':>11} {'kills':>6} {'score':>6} {'armor':>7}")
+    for count in SWORD_COUNTS:
+        for allocate in (False, True):
+            totals = {"swords": 0, "fired": 0, "useful": 0, "overkill": 0, "missed": 0}
+            kills = score = armor = 0
+            for seed in SEEDS:
+                counts, summary = play(count, allocate, seed)
+                for name in totals:
+                    totals[name] += counts[name]
+                kills += summary["killed_monsters"]
+                score += summary["score"]
+                armor += summary["armor"]
+            fired = max(1, totals["fired"])
+            print(f"{count:>5} {'allocate' if allocate else 'nearest':<8} {totals['fired']:>8} "
+                  f"{totals['overkill'] / fired:>9.1%} {totals['missed'] / fired:>8.1%} "
+                  f"{(totals['overkill'] + totals['missed']) / fired:>8.1%} "
+                  f"{totals['swords'] / max(1, kills):>11.2f} {kills:>6} {score:>6} {armor / len(SEEDS):>7.1f}")
+    hofund.ALLOCATE_TARGETS = False
+
+
+if __name__ == "__main__":
+    main()
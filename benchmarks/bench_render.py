@@ -0,0 +1,100 @@
+"""Benchmark: per-frame cost of each render stage.
+
+Plays a seeded headless game and, every few ticks, times each stage of
+draw_frame on an off-screen surface: the game-area background drawn
+immediately (fill + rects + line, as before the background layer) and
+blitted from the cached BackgroundLayer, sprites, health bars, damage
+numbers, the HUD and the sword HUD, then the whole frame with draw_frame
+and with the dirty-rectangle renderer:
+
+    python -m benchmarks.bench_render
+"""
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import time
+
+import pygame
+
+import hofund
+import simulation
+
+SEED = 5
+DURATION_MS = 120000
+SAMPLE_EVERY = 10   # 每隔几个tick计时一次
+
+
+def immediate_background(surface, current_time):
+    surface.fill(hofund.BLACK)
+    hofund.paint_game_areas(surface, hofund.BACKGROUND_THEMES[hofund.background_layer.theme])
+
+
+def cached_background(surface, current_time):
+    hofund.draw_game_areas(surface)
+
+
+def sprites(surface, current_time):
+    hofund.all_sprites.draw(surface)
+
+
+def health_bars(surface, current_time):
+    for monster in hofund.monsters:
+        monster.draw_health_bar(surface)
+
+
+def damage_numbers(surface, current_time):
+    hofund.floating_text.update(current_time)
+    hofund.floating_text.draw(surface)
+
+
+def hud(surface, current_time):
+    hofund.draw_hud(surface)
+
+
+def sword_hud(surface, current_time):
+    hofund.draw_sword_hud(surface, hofund.player, current_time)
+
+
+def main():
+    surface = pygame.Surface((hofund.SCREEN_WIDTH, hofund.SCREEN_HEIGHT))
+    dirty_surface = pygame.Surface((hofund.SCREEN_WIDTH, hofund.SCREEN_HEIGHT))
+    renderer = hofund.DirtyRenderer(dirty_surface, hofund.background_layer.get())
+    stages = [
+        ("background (immediate)", immediate_background),
+        ("background (cached)", cached_background),
+        ("sprites", sprites),
+        ("health bars", health_bars),
+        ("damage numbers", damage_numbers),
+        ("hud", hud),
+        ("sword hud", sword_hud),
+        ("frame (draw_frame)", hofund.draw_frame),
+        ("frame (dirty rects)",
+         lambda surface, current_time: renderer.render(hofund.frame_items(current_time))),
+    ]
+    totals = {name: 0.0 for name, _ in stages}
+
+    sim = simulation.HeadlessSimulation(seed=SEED, upgrade_policy=simulation.random_upgrade)
+    samples = 0
+    with sim.output():
+        while sim.current_time < DURATION_MS and not hofund.game_over:
+            sim.step()
+            # 脏矩形渲染器每帧都要绘制，才能与上一帧比较
+            if sim.ticks % SAMPLE_EVERY:
+                renderer.render(hofund.frame_items(sim.current_time))
+                continue
+            samples += 1
+            for name, stage in stages:
+                start = time.perf_counter()
+                stage(surface, sim.current_time)
+                totals[name] += time.perf_counter() - start
+
+    print(f"seed {SEED}, {DURATION_MS // 1000} s of play, {samples} sampled frames")
+    for name, _ in stages:
+        print(f"{name:<24} {totals[name] / samples * 1e6:>9.1f} us/frame")
+    print("dirty rects:", renderer.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""Benchmark: discrete vs swept (continuous) sword-monster collisions.
+
+Part one flies swords through a static field of monsters at increasing
+speeds until they hit a monster or leave the screen, once testing only the
+position after every tick (monsters.spritecollide) and once testing the
+whole path of the tick (monsters.sweepcollide). It asserts that every
+discrete hit is also a swept hit, and that from the game's speed of 50 px
+per tick up, where the discrete check lets swords tunnel through monsters,
+the swept check hits more swords. It reports the share of swords that hit
+something and the cost of the checks.
+Swords are removed as soon as they leave the screen, before the check (as
+in the game), so the last tick of a flight is never tested and the swept
+hit share still drops a little at high speeds.
+
+Part two times one check of a single tick for a few sword counts: discrete,
+swept one sword at a time (plain float arithmetic, used below
+SWEEP_BATCH_SIZE swords) and swept in one NumPy batch.
+
+Part three plays headless games with both settings of SWEPT_COLLISIONS and
+reports the share of fired swords that hit a monster, kills and score:
+
+    python -m benchmarks.bench_swept
+"""
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import contextlib
+import math
+import random
+import time
+
+import pygame
+
+import hofund
+import simulation
+
+MONSTER_COUNT = 100
+SWORD_COUNT = 500
+SPEEDS = [10, 25, 50, 100, 200]
+TUNNELLING_SPEED = 50   # 从这个速度起离散检测会穿过怪物
+TICK_SWORD_COUNTS = [8, 32, 128, 500]
+REPEATS = 20
+SEEDS = [1, 2, 3]
+GAME_MINUTES = 3
+
+
+def build_scene(rng):
+    """生成静止的怪物和向随机方向飞行的飞剑（不加入all_sprites）"""
+    monsters = hofund.MonsterGroup()
+    defense_line = int(hofund.SCREEN_HEIGHT - hofund.DEFENSE_HEIGHT)
+    for _ in range(MONSTER_COUNT):
+        monster = hofund.Monster(rng.choice([0, 1, 2]))
+        monster.rect.x = rng.randint(0, hofund.SCREEN_WIDTH - monster.rect.width)
+        monster.rect.bottom = rng.randint(monster.rect.height - 50, defense_line)
+        monsters.add(monster)
+    swords = []
+    for _ in range(SWORD_COUNT):
+        swords.append(hofund.Sword(rng.randint(0, hofund.SCREEN_WIDTH), defense_line + 20,
+                                   rng.choice([hofund.NORMAL_SWORD, hofund.ICE_SWORD, hofund.FIRE_SWORD]),
+                                   8, 20, rng.uniform(10, 170)))
+    return monsters, swords
+
+
+def fly(monsters, swords, speed, swept):
+    """按speed飞行直到命中或飞出屏幕，返回 (命中怪物的飞剑集合, 碰撞检测总耗时)"""
+    flying = pygame.sprite.Group()
+    for sword in swords:
+        sword.rect.center = sword.start
+        sword.speed = speed
+        flying.add(sword)
+    hit = set()
+    elapsed = 0.0
+    while flying:
+        for sword in flying.sprites():
+            sword.rect.x += sword.speed * math.cos(sword.angle_rad)
+            sword.rect.y -= sword.speed * math.sin(sword.angle_rad)
+            if sword.rect.bottom < 0 or sword.rect.top > hofund.SCREEN_HEIGHT or \
+               sword.rect.right < 0 or sword.rect.left > hofund.SCREEN_WIDTH:
+                flying.remove(sword)
+        start = time.perf_counter()
+        if swept:
+            hits = [sword for sword, _ in monsters.sweepcollide(flying)]
+        else:
+            hits = [sword for sword in flying if monsters.spritecollide(sword)]
+        elapsed += time.perf_counter() - start
+        hit.update(hits)
+        flying.remove(*hits)
+    return hit, elapsed
+
+
+def scatter(swords, rng):
+    """把飞剑放到怪物区域中的随机位置，速度恢复为游戏中的50像素每tick"""
+    defense_line = int(hofund.SCREEN_HEIGHT - hofund.DEFENSE_HEIGHT)
+    for sword in swords:
+        sword.speed = 50
+        sword.rect.center = (rng.randint(0, hofund.SCREEN_WIDTH), rng.randint(0, defense_line))
+
+
+def time_tick(monsters, swords, batch_size):
+    """一个tick的碰撞检测耗时（ms，REPEATS次中最好的）；batch_size为None时用离散检测"""
+    hofund.SWEEP_BATCH_SIZE = batch_size
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        if batch_size is None:
+            for sword in swords:
+                monsters.spritecollide(sword)
+        else:
+            monsters.sweepcollide(swords)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def count_hits():
+    """包装check_collisions和Player.shoot，统计发射的飞剑数和命中的飞剑数"""
+    counts = {"fired": 0, "hits": 0}
+    check_collisions = hofund.check_collisions
+    shoot = hofund.Player.shoot
+
+    def counting_check(swords, monsters):
+        before = len(swords)
+        check_collisions(swords, monsters)
+        counts["hits"] += before - len(swords)
+
+    def counting_shoot(self, current_time, all_sprites, swords, monsters):
+        before = len(swords)
+        shoot(self, current_time, all_sprites, swords, monsters)
+        counts["fired"] += len(swords) - before
+
+    hofund.check_collisions = counting_check
+    hofund.Player.shoot = counting_shoot
+    return counts, check_collisions, shoot
+
+
+def play(swept, seed):
+    hofund.SWEPT_COLLISIONS = swept
+    counts, check_collisions, shoot = count_hits()
+    try:
+        sim = simulation.HeadlessSimulation(seed=seed, upgrade_policy=simulation.random_upgrade)
+        with contextlib.redirect_stdout(None):
+            sim.run(duration_ms=GAME_MINUTES * 60 * 1000)
+    finally:
+        hofund.check_collisions = check_collisions
+        hofund.Player.shoot = shoot
+    return counts["hits"] / max(1, counts["fired"]), hofund.killed_monsters, hofund.score
+
+
+def main():
+    rng = random.Random(0)
+    monsters, swords = build_scene(rng)
+    for sword in swords:
+        sword.start = sword.rect.center
+    print(f"{MONSTER_COUNT} static monsters, {SWORD_COUNT} swords")
+    print(f"{'speed':>5} {'discrete hit%':>13} {'swept hit%':>10} {'discrete ms':>11} {'swept ms':>9}")
+    for speed in SPEEDS:
+        discrete, discrete_s = fly(monsters, swords, speed, swept=False)
+        swept, swept_s = fly(monsters, swords, speed, swept=True)
+        assert discrete <= swept, "a discrete hit was missed by the swept check"
+        if speed >= TUNNELLING_SPEED:
+            assert len(swept) > len(discrete), "the swept check found no tunnelling swords"
+        print(f"{speed:>5} {len(discrete) / SWORD_COUNT:>13.1%} {len(swept) / SWORD_COUNT:>10.1%} "
+              f"{discrete_s * 1000:>11.2f} {swept_s * 1000:>9.2f}")
+
+    batch_size = hofund.SWEEP_BATCH_SIZE
+    scatter(swords, rng)
+    print(f"\none tick, {MONSTER_COUNT} monsters (swept batch from {batch_size} swords in the game)")
+    print(f"{'swords':>6} {'discrete ms':>11} {'scalar ms':>9} {'batch ms':>8}")
+    try:
+        for count in TICK_SWORD_COUNTS:
+            tick_swords = swords[:count]
+            print(f"{count:>6} {time_tick(monsters, tick_swords, None):>11.3f} "
+                  f"{time_tick(monsters, tick_swords, float('inf')):>9.3f} {time_tick(monsters, tick_swords, 0):>8.3f}")
+    finally:
+        hofund.SWEEP_BATCH_SIZE = batch_size
+
+    print(f"\n{GAME_MINUTES} minute games, random upgrades")
+    print(f"{'seed':>4} {'mode':<8} {'hit%':>6} {'kills':>6} {'score':>6}")
+    for seed in SEEDS:
+        for swept in (False, True):
+            hit_rate, kills, score = play(swept, seed)
+            print(f"{seed:>4} {'swept' if swept else 'discrete':<8} {hit_rate:>6.1%} {kills:>6} {score:>6}")
+
+
+if __name__ == "__main__":
+    main()
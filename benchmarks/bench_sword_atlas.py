@@ -0,0 +1,66 @@
+"""Benchmark: volley spawn cost with per-sword rotation vs the sword atlas.
+
+Times a maxed volley (11 swords of each of the three types, fanned 15°
+apart) built the old way - a new Surface, a draw.rect and a
+transform.rotate per sword - and with images taken from a SwordAtlas at
+1° and 2° resolution, plus the one-off cost of prebuilding each atlas:
+
+    python -m benchmarks.bench_sword_atlas
+"""
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import random
+import time
+
+import pygame
+
+import hofund
+
+VOLLEYS = 2000
+SWORDS_PER_TYPE = 11
+SWORD_TYPES = [hofund.NORMAL_SWORD, hofund.ICE_SWORD, hofund.FIRE_SWORD]
+
+
+def rotate_per_sword(sword_type, angle):
+    """原来Sword.__init__中的图像生成方式"""
+    image = pygame.Surface((20, 5), pygame.SRCALPHA)
+    pygame.draw.rect(image, hofund.SwordAtlas.colors[sword_type], (0, 0, 20, 5))
+    return pygame.transform.rotate(image, angle)
+
+
+def volley_angles(rng):
+    base = rng.uniform(-180, 180)
+    return [base + (i - (SWORDS_PER_TYPE - 1) / 2) * 15 for i in range(SWORDS_PER_TYPE)]
+
+
+def time_volleys(make_image, seed=0):
+    rng = random.Random(seed)
+    volleys = [volley_angles(rng) for _ in range(VOLLEYS)]
+    start = time.perf_counter()
+    for angles in volleys:
+        for sword_type in SWORD_TYPES:
+            for angle in angles:
+                make_image(sword_type, angle).get_rect()
+    return (time.perf_counter() - start) / VOLLEYS
+
+
+def main():
+    swords = SWORDS_PER_TYPE * len(SWORD_TYPES)
+    print(f"volley of {swords} swords, {VOLLEYS} volleys")
+    legacy_us = time_volleys(rotate_per_sword) * 1e6
+    print(f"{'per-sword rotate':<22} {legacy_us:>9.1f} us/volley")
+    for step in (1, 2):
+        atlas = hofund.SwordAtlas(step)
+        start = time.perf_counter()
+        atlas.build()
+        build_ms = (time.perf_counter() - start) * 1000
+        atlas_us = time_volleys(atlas.get) * 1e6
+        print(f"{f'atlas {step} deg':<22} {atlas_us:>9.1f} us/volley  "
+              f"({legacy_us / atlas_us:.0f}x, prebuild {build_ms:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Benchmark: incremental target index vs the linear find_nearest_monster scan.
+
+Spawns N monsters over the wormhole and attack areas, advances them frame
+by frame and, each frame, checks that the index picks the same target as
+the original two-pass scan while timing both queries and the index upkeep
+done as monsters move. The upkeep is timed as the batch mover
+(``MonsterGroup.move_many``) pays it: the moved monsters' old and new
+bottoms are compared in one NumPy pass and only the monsters that crossed a
+band boundary are re-bucketed. The game picks a target from shoot() and from
+auto_use_sword_rain(), so the last two columns compare the per-frame cost
+of two scans with the index upkeep plus two index queries:
+
+    python -m benchmarks.bench_targeting
+"""
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import random
+import time
+
+import numpy as np
+
+import hofund
+
+MONSTER_COUNTS = [50, 200, 1000, 5000]
+FRAMES = 300
+
+
+def scan_nearest_monster(player, monsters):
+    """原来的线性扫描（去掉了print）"""
+    nearest_monster = None
+    min_distance = float('inf')
+    defense_line = hofund.SCREEN_HEIGHT - hofund.DEFENSE_HEIGHT
+    attack_line = hofund.SCREEN_HEIGHT - hofund.DEFENSE_HEIGHT - hofund.ATTACK_HEIGHT
+    attacking_monsters = [monster for monster in monsters if monster.attacking]
+    if attacking_monsters:
+        for monster in attacking_monsters:
+            dx = monster.rect.centerx - player.rect.centerx
+            dy = monster.rect.centery - player.rect.centery
+            distance = (dx * dx + dy * dy) ** 0.5
+            if distance < min_distance:
+                min_distance = distance
+                nearest_monster = monster
+    else:
+        for monster in monsters:
+            if monster.rect.bottom >= attack_line and not monster.attacking:
+                distance_to_defense = defense_line - monster.rect.bottom
+                if distance_to_defense < min_distance:
+                    min_distance = distance_to_defense
+                    nearest_monster = monster
+    return nearest_monster
+
+
+def build_scene(count, seed=0):
+    hofund.reset_game()
+    rng = random.Random(seed)
+    random.seed(seed)
+    for _ in range(count):
+        monster = hofund.Monster(rng.choice([0, 1, 2]))
+        monster.rect.y = rng.randint(-50, 400)
+        monster.y_float = float(monster.rect.y)
+        hofund.all_sprites.add(monster)
+        hofund.monsters.add(monster)
+
+
+def main():
+    hofund.game_clock = hofund.ManualClock()
+    print(f"{'monsters':>8} {'scan us':>8} {'1st query us':>12} {'2nd query us':>12} {'upkeep us':>10} "
+          f"{'2 scans us':>11} {'upkeep+2 us':>12}")
+    for count in MONSTER_COUNTS:
+        build_scene(count)
+        player = hofund.player
+        monsters = hofund.monsters
+        targets = monsters.targets
+        scan_time = first_time = second_time = upkeep_time = 0.0
+        for _ in range(FRAMES):
+            moved = []
+            old_bottoms = []
+            for monster in monsters:
+                if monster.attacking:
+                    continue
+                old_y = monster.rect.y
+                monster.y_float += monster.speed
+                monster.rect.y = int(monster.y_float)
+                if monster.rect.bottom >= hofund.SCREEN_HEIGHT - hofund.DEFENSE_HEIGHT:
+                    monster.attacking = True
+                    monster.rect.bottom = hofund.SCREEN_HEIGHT - hofund.DEFENSE_HEIGHT
+                if monster.rect.y != old_y:
+                    moved.append(monster)
+                    old_bottoms.append(old_y + monster.rect.height)
+            # 数组后端的位置本来就在数组里；与MonsterGroup.move_many一样，只有可能换了桶的怪物才更新索引
+            new_bottoms = np.array([monster.rect.bottom for monster in moved])
+            old_bottoms = np.array(old_bottoms)
+            start = time.perf_counter()
+            for i in targets.bands_changed(old_bottoms, new_bottoms).nonzero()[0].tolist():
+                targets.update(moved[i])
+            upkeep_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            expected = scan_nearest_monster(player, monsters)
+            scan_time += time.perf_counter() - start
+            start = time.perf_counter()
+            chosen = player.find_nearest_monster(monsters)
+            middle = time.perf_counter()
+            again = player.find_nearest_monster(monsters)
+            second_time += time.perf_counter() - middle
+            first_time += middle - start
+            assert chosen is expected and again is expected, "target index picked a different monster"
+        scan_us = scan_time / FRAMES * 1e6
+        first_us = first_time / FRAMES * 1e6
+        second_us = second_time / FRAMES * 1e6
+        upkeep_us = upkeep_time / FRAMES * 1e6
+        print(f"{count:>8} {scan_us:>8.1f} {first_us:>12.1f} {second_us:>12.1f} {upkeep_us:>10.1f} "
+              f"{2 * scan_us:>11.1f} {upkeep_us + first_us + second_us:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
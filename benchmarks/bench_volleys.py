@@ -0,0 +1,147 @@
+"""Benchmark: one sprite per sword vs one volley entity per shot.
+
+Part one fires a burst of shots of ``count`` swords per sword type into a
+synthetic field of monsters, fanned 15 degrees apart or all stacked on one
+angle (as when the target attacks the defense line), once as Sword sprites
+and once with USE_VOLLEYS, and flies them until every sword has hit or left
+the screen, timing movement plus collisions and draw_frame per tick (best
+of REPEATS runs). Part two plays
+the same headless game ("rush" waves, every sword type firing ``count``
+swords 20 times a second) in both modes, rendering every tick. Both parts
+check that kills and score come out identical, and report the live sprite
+count and the cost per tick:
+
+    python -m benchmarks.bench_volleys
+"""
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import random
+import time
+
+import pygame
+
+import hofund
+import simulation
+
+SWORD_COUNTS = [1, 3, 6, 11]
+SHOTS = 40            # 第一部分每种飞剑的发射次数
+MONSTERS = 300
+SPREADS = {"fan": 15, "stacked": 0}   # 相邻飞剑的角度差
+REPEATS = 3
+FIRE_RATE = 20        # 每秒发射次数（每种飞剑）
+SEED = 7
+WARMUP_MS = 60000
+MEASURE_MS = 60000
+
+
+def burst(count, volleys, spread):
+    """返回 (平均精灵数, 每tick移动和碰撞耗时ms, 每tick绘制耗时ms, (击杀数, 分数))"""
+    hofund.USE_VOLLEYS = volleys
+    hofund.game_clock = hofund.ManualClock(0)
+    hofund.reset_game(SEED)
+    rng = random.Random(SEED)
+    defense_line = int(hofund.SCREEN_HEIGHT - hofund.DEFENSE_HEIGHT)
+    for _ in range(MONSTERS):
+        monster_type = rng.choice([0, 1, 2])
+        width, height = hofund.MONSTER_SIZES[monster_type]
+        monster = hofund.monster_pool.acquire(monster_type, rng.randint(0, hofund.SCREEN_WIDTH - width),
+                                              rng.randint(-50, defense_line - height))
+        hofund.all_sprites.add(monster)
+        hofund.monsters.add(monster)
+    x, y = hofund.player.rect.center
+    for shot in range(SHOTS):
+        base_angle = rng.uniform(30, 150)
+        for sword_type in (hofund.NORMAL_SWORD, hofund.ICE_SWORD, hofund.FIRE_SWORD):
+            angles = [base_angle + (i - (count - 1) / 2) * spread for i in range(count)]
+            if volleys:
+                hofund.swords.add(hofund.sword_pool.acquire(x, y, sword_type, 8, 20, angles))
+                continue
+            for angle in angles:
+                sword = hofund.sword_pool.acquire(x, y, sword_type, 8, 20, angle)
+                hofund.all_sprites.add(sword)
+                hofund.swords.add(sword)
+
+    surface = pygame.Surface((hofund.SCREEN_WIDTH, hofund.SCREEN_HEIGHT))
+    sprites = 0
+    ticks = 0
+    logic = draw = 0.0
+    while hofund.swords:
+        start = time.perf_counter()
+        if volleys:
+            hofund.update_volleys(hofund.swords)
+        else:
+            hofund.swords.update()
+        hofund.check_collisions(hofund.swords, hofund.monsters)
+        hofund.game_events.resolve()
+        middle = time.perf_counter()
+        hofund.draw_frame(surface, 0)
+        draw += time.perf_counter() - middle
+        logic += middle - start
+        sprites += len(hofund.all_sprites) + (len(hofund.swords) if volleys else 0)
+        ticks += 1
+    return sprites / ticks, logic / ticks * 1000, draw / ticks * 1000, (hofund.killed_monsters, hofund.score)
+
+
+def play(count, volleys):
+    """返回 (平均精灵数, 每tick逻辑耗时ms, 每tick绘制耗时ms, 最终状态)"""
+    sim = simulation.HeadlessSimulation(seed=SEED, volleys=volleys, waves="rush")
+    player = hofund.player
+    for sword_type in (hofund.ICE_SWORD, hofund.FIRE_SWORD):
+        player.unlock_sword_type(sword_type)
+    for sword_type in (hofund.NORMAL_SWORD, hofund.ICE_SWORD, hofund.FIRE_SWORD):
+        stats = player.sword_attributes[sword_type]
+        stats.count = count
+        stats.fire_rate = FIRE_RATE
+        stats.refresh()
+    sim.run(duration_ms=WARMUP_MS)
+
+    surface = pygame.Surface((hofund.SCREEN_WIDTH, hofund.SCREEN_HEIGHT))
+    sprites = 0
+    ticks = 0
+    logic = draw = 0.0
+    with sim.output():
+        while sim.current_time < WARMUP_MS + MEASURE_MS and not hofund.game_over:
+            start = time.perf_counter()
+            sim.step()
+            middle = time.perf_counter()
+            hofund.draw_frame(surface, sim.current_time)
+            draw += time.perf_counter() - middle
+            logic += middle - start
+            sprites += len(hofund.all_sprites) + (len(hofund.swords) if volleys else 0)
+            ticks += 1
+    return sprites / ticks, logic / ticks * 1000, draw / ticks * 1000, sim.summary()
+
+
+def main():
+    hofund.sword_atlas.build()
+    print(f"{SHOTS} shots per sword type into {MONSTERS} monsters")
+    print(f"{'spread':<8} {'count':>5} {'mode':<7} {'sprites':>8} {'logic ms':>9} {'draw ms':>8} {'kills':>6}")
+    for spread_name, spread in SPREADS.items():
+        for count in SWORD_COUNTS:
+            results = {}
+            for volleys in (False, True):
+                runs = [burst(count, volleys, spread) for _ in range(REPEATS)]
+                sprites, _, _, results[volleys] = runs[0]
+                logic_ms = min(run[1] for run in runs)
+                draw_ms = min(run[2] for run in runs)
+                print(f"{spread_name:<8} {count:>5} {'volleys' if volleys else 'swords':<7} {sprites:>8.1f} "
+                      f"{logic_ms:>9.3f} {draw_ms:>8.3f} {results[volleys][0]:>6}")
+            assert results[False] == results[True], "volleys changed the kills"
+
+    print("\nheadless game, rush waves")
+    print(f"{'count':>5} {'mode':<7} {'sprites':>8} {'logic ms':>9} {'draw ms':>8} {'kills':>6} {'score':>6}")
+    for count in SWORD_COUNTS:
+        results = {}
+        for volleys in (False, True):
+            sprites, logic_ms, draw_ms, summary = play(count, volleys)
+            results[volleys] = summary
+            print(f"{count:>5} {'volleys' if volleys else 'swords':<7} {sprites:>8.1f} {logic_ms:>9.3f} "
+                  f"{draw_ms:>8.3f} {summary['killed_monsters']:>6} {summary['score']:>6}")
+        assert results[False] == results[True], "volleys changed the game's results"
+
+
+if __name__ == "__main__":
+    main()
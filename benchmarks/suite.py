@@ -0,0 +1,243 @@
+"""Benchmark suite: per-subsystem cost on synthetic scenes.
+
+Each scene has N monsters of every monster type, M swords of every sword
+type in flight over the wormhole and attack areas and K active sword rains
+locked on random monsters. Every subsystem is timed on its own against
+the scene: check_collisions, find_nearest_monster, Player.shoot,
+SwordRain.apply_damage (all K rains), all_sprites.update(),
+Monster.draw_health_bar (all monsters), draw_sword_hud and a full
+draw_frame. Subsystems that change the scene (kill monsters, add swords,
+move sprites) get a freshly built scene for every sample; read-only ones
+are called in a loop. Results go to a JSON file so runs can be compared
+and plotted against entity count:
+
+    python -m benchmarks.suite
+    python -m benchmarks.suite --monsters 10 100 1000 --swords 50 --rains 0 --output grid.json
+"""
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import contextlib
+import json
+import platform
+import random
+import statistics
+import time
+
+import numpy as np
+import pygame
+
+import hofund
+
+MONSTERS_PER_TYPE = [10, 100, 500]
+SWORDS_PER_TYPE = [10, 100, 500]
+RAINS = [0, 8]
+REPEATS = 7
+MIN_SAMPLE_S = 0.005   # 只读子系统每个样本至少运行这么久
+SCENE_TIME = 60000     # 场景的时钟读数（所有冷却都已就绪）
+OUTPUT = "benchmark_results.json"
+
+
+class Scene:
+    """合成场景：游戏状态在hofund的全局变量里，这里只记录额外的对象"""
+    def __init__(self, monsters_per_type, swords_per_type, rains, seed):
+        self.surface = pygame.Surface((hofund.SCREEN_WIDTH, hofund.SCREEN_HEIGHT))
+        self.time = SCENE_TIME
+        hofund.game_clock = hofund.ManualClock(SCENE_TIME)
+        hofund.reset_game(seed)
+        rng = random.Random(seed)
+        defense_line = int(hofund.SCREEN_HEIGHT - hofund.DEFENSE_HEIGHT)
+        player = hofund.player
+
+        for monster_type, (width, height) in sorted(hofund.MONSTER_SIZES.items()):
+            for _ in range(monsters_per_type):
+                monster = hofund.monster_pool.acquire(monster_type,
+                                                      rng.randint(0, hofund.SCREEN_WIDTH - width),
+                                                      rng.randint(-50, defense_line - height))
+                # 受过伤的怪物才有不同长度的血条
+                monster.health = rng.randint(1, monster.max_health)
+                hofund.all_sprites.add(monster)
+                hofund.monsters.add(monster)
+
+        for sword_type in (hofund.NORMAL_SWORD, hofund.ICE_SWORD, hofund.FIRE_SWORD, hofund.SWORD_RAIN):
+            player.unlock_sword_type(sword_type)
+        for sword_type in (hofund.NORMAL_SWORD, hofund.ICE_SWORD, hofund.FIRE_SWORD):
+            stats = player.sword_attributes[sword_type]
+            for _ in range(swords_per_type):
+                sword = hofund.sword_pool.acquire(rng.randint(0, hofund.SCREEN_WIDTH),
+                                                  rng.randint(-20, defense_line),
+                                                  sword_type, stats.damage, stats.range,
+                                                  rng.uniform(0, 180))
+                hofund.all_sprites.add(sword)
+                hofund.swords.add(sword)
+
+        stats = player.sword_attributes[hofund.SWORD_RAIN]
+        targets = list(hofund.monsters)
+        self.rains = []
+        for _ in range(rains if targets else 0):
+            rain = hofund.rain_pool.acquire(rng.choice(targets), stats.damage, stats.radius, stats.duration)
+            rain.rect.center = rain.target_rect.center
+            hofund.all_sprites.add(rain)
+            self.rains.append(rain)
+
+        self.counts = {
+            "monsters_per_type": monsters_per_type,
+            "swords_per_type": swords_per_type,
+            "rains": len(self.rains),
+            "monsters": len(hofund.monsters),
+            "swords": len(hofund.swords),
+        }
+
+
+# Subsystems: 每个函数对场景执行一次被测的操作
+def check_collisions(scene):
+    hofund.check_collisions(hofund.swords, hofund.monsters)
+    hofund.game_events.resolve()
+
+
+def find_nearest_monster(scene):
+    hofund.player.find_nearest_monster(hofund.monsters)
+
+
+def shoot(scene):
+    hofund.player.shoot(scene.time, hofund.all_sprites, hofund.swords, hofund.monsters)
+
+
+def apply_damage(scene):
+    for rain in scene.rains:
+        rain.apply_damage()
+    hofund.game_events.resolve()
+
+
+def update_sprites(scene):
+    if hofund.entity_store is not None:
+        hofund.update_entity_store()
+    hofund.all_sprites.update()
+
+
+def draw_health_bars(scene):
+    for monster in hofund.monsters:
+        monster.draw_health_bar(scene.surface)
+
+
+def draw_sword_hud(scene):
+    hofund.draw_sword_hud(scene.surface, hofund.player, scene.time)
+
+
+def render(scene):
+    hofund.draw_frame(scene.surface, scene.time)
+
+
+# (名称, 函数, 是否修改场景)
+SUBSYSTEMS = [
+    ("check_collisions", check_collisions, True),
+    ("find_nearest_monster", find_nearest_monster, False),
+    ("Player.shoot", shoot, True),
+    ("SwordRain.apply_damage", apply_damage, True),
+    ("all_sprites.update", update_sprites, True),
+    ("Monster.draw_health_bar", draw_health_bars, False),
+    ("draw_sword_hud", draw_sword_hud, False),
+    ("render", render, False),
+]
+
+
+def time_subsystem(func, mutates, build, repeats):
+    """返回 (每个样本的调用次数, 每次调用的耗时列表，单位秒)"""
+    samples = []
+    if mutates:
+        for _ in range(repeats):
+            scene = build()
+            start = time.perf_counter()
+            func(scene)
+            samples.append(time.perf_counter() - start)
+        return 1, samples
+
+    scene = build()
+    start = time.perf_counter()
+    func(scene)   # 预热（缓存的HUD面板、文字等）
+    estimate = time.perf_counter() - start
+    calls = max(1, int(MIN_SAMPLE_S / estimate)) if estimate > 0 else 1000
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(calls):
+            func(scene)
+        samples.append((time.perf_counter() - start) / calls)
+    return calls, samples
+
+
+def run(monster_counts, sword_counts, rain_counts, repeats=REPEATS, seed=0):
+    """逐个场景、逐个子系统计时，每得到一个结果就yield出来"""
+    for monsters_per_type in monster_counts:
+        for swords_per_type in sword_counts:
+            for rains in rain_counts:
+                def build():
+                    return Scene(monsters_per_type, swords_per_type, rains, seed)
+
+                counts = build().counts
+                for name, func, mutates in SUBSYSTEMS:
+                    if func is apply_damage and not counts["rains"]:
+                        continue
+                    calls, samples = time_subsystem(func, mutates, build, repeats)
+                    result = dict(counts)
+                    result.update({
+                        "subsystem": name,
+                        "calls": calls,
+                        "repeats": repeats,
+                        "min_us": min(samples) * 1e6,
+                        "median_us": statistics.median(samples) * 1e6,
+                        "mean_us": statistics.fmean(samples) * 1e6,
+                    })
+                    yield result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time Hofund's subsystems on synthetic scenes.")
+    parser.add_argument("--monsters", type=int, nargs="+", default=MONSTERS_PER_TYPE, help="monsters of each type")
+    parser.add_argument("--swords", type=int, nargs="+", default=SWORDS_PER_TYPE, help="swords of each type")
+    parser.add_argument("--rains", type=int, nargs="+", default=RAINS, help="active sword rains")
+    parser.add_argument("--repeats", type=int, default=REPEATS, help="samples per subsystem")
+    parser.add_argument("--seed", type=int, default=0, help="scene seed")
+    parser.add_argument("--entity-store", action="store_true", help="use the NumPy entity backend")
+    parser.add_argument("--output", default=OUTPUT, help="JSON results file")
+    args = parser.parse_args()
+
+    hofund.USE_ENTITY_STORE = args.entity_store
+    # 预先生成图像，避免第一次计时包含缓存构建
+    hofund.sword_atlas.build()
+
+    results = []
+    print(f"{'monsters':>8} {'swords':>7} {'rains':>5}  {'subsystem':<24} {'median us':>10} {'min us':>9}")
+    runner = run(args.monsters, args.swords, args.rains, args.repeats, args.seed)
+    while True:
+        # 游戏的print输出（升级选择等）不显示
+        with contextlib.redirect_stdout(None):
+            result = next(runner, None)
+        if result is None:
+            break
+        results.append(result)
+        print(f"{result['monsters']:>8} {result['swords']:>7} {result['rains']:>5}  {result['subsystem']:<24} "
+              f"{result['median_us']:>10.1f} {result['min_us']:>9.1f}")
+
+    report = {
+        "metadata": {
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "video_driver": pygame.display.get_driver() if pygame.display.get_init() else None,
+            "entity_store": args.entity_store,
+            "seed": args.seed,
+            "scene_time": SCENE_TIME,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {len(results)} results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Dirty-rectangle renderer.
+
+Instead of clearing and redrawing the whole frame, the renderer compares the
+items of this frame with those of the previous one and only repaints the
+screen regions that changed:
+
+* every item is ``(key, rect, signature, image, draw)``: a stable key (the
+  sprite itself, or a name for HUD elements), the screen area it covers, a
+  value that changes whenever its appearance changes, and either an image
+  to blit at ``rect`` or a ``draw(surface)`` callback;
+* the old and new areas of changed, added and removed items are restored
+  from the background, then every item that overlaps a restored area is
+  drawn again in frame order, so overlapping and translucent items
+  composite exactly as in a full redraw;
+* the returned rect list is meant for ``pygame.display.update(rects)``.
+"""
+
+
+class DirtyRenderer:
+    """脏矩形渲染器：只擦除并重绘与上一帧相比有变化的区域"""
+    def __init__(self, surface, background, max_rects=100):
+        self.surface = surface
+        self.background = background
+        self.screen_rect = surface.get_rect()
+        self.max_rects = max_rects   # 脏区域过多时直接整屏更新
+        self.previous = {}           # 键 -> (区域, 签名)
+        self.full_redraw = True
+        self.frames = 0
+        self.full_frames = 0
+        self.dirty_area = 0          # 累计更新的像素数
+
+    def invalidate(self):
+        """下一帧整屏重绘（背景或窗口变化后调用）"""
+        self.full_redraw = True
+
+    def set_background(self, background):
+        self.background = background
+        self.invalidate()
+
+    def render(self, items):
+        """绘制一帧，返回需要提交到显示器的区域列表"""
+        surface = self.surface
+        background = self.background
+        previous = self.previous
+        current = {}
+        self.frames += 1
+
+        if self.full_redraw:
+            return self._redraw_all(items)
+
+        # 新增、消失和外观变化的元素的新旧区域都要重绘
+        dirty = []
+        redraw = [False] * len(items)
+        for i, (key, rect, signature, image, draw) in enumerate(items):
+            old = previous.pop(key, None)
+            current[key] = (rect.copy(), signature)
+            if old is None:
+                dirty.append(rect)
+                redraw[i] = True
+            elif old[1] != signature or old[0] != rect:
+                dirty.append(old[0])
+                dirty.append(rect)
+                redraw[i] = True
+        for old_rect, _ in previous.values():
+            dirty.append(old_rect)
+        self.previous = current
+
+        if not dirty:
+            return []
+        if len(dirty) > self.max_rects:
+            # 大部分画面都在变化，整屏重绘比逐块处理更快
+            return self._redraw_all(items)
+
+        # 与重绘区域重叠的未变化元素整块重绘（半透明元素不能只补一部分）
+        expanded = True
+        while expanded:
+            expanded = False
+            for i, item in enumerate(items):
+                if not redraw[i] and item[1].collidelist(dirty) != -1:
+                    redraw[i] = True
+                    dirty.append(item[1])
+                    expanded = True
+
+        rects = []
+        screen_rect = self.screen_rect
+        for rect in dirty:
+            rect = rect.clip(screen_rect)
+            if rect.width and rect.height:
+                rects.append(rect)
+
+        for rect in rects:
+            surface.blit(background, rect, rect)
+        for i, (key, rect, signature, image, draw) in enumerate(items):
+            if redraw[i]:
+                if image is not None:
+                    surface.blit(image, rect)
+                else:
+                    draw(surface)
+
+        self.dirty_area += sum(rect.width * rect.height for rect in rects)
+        return rects
+
+    def _redraw_all(self, items):
+        self.full_redraw = False
+        surface = self.surface
+        surface.blit(self.background, (0, 0))
+        current = {}
+        for key, rect, signature, image, draw in items:
+            current[key] = (rect.copy(), signature)
+            if image is not None:
+                surface.blit(image, rect)
+            else:
+                draw(surface)
+        self.previous = current
+        self.full_frames += 1
+        self.dirty_area += self.screen_rect.width * self.screen_rect.height
+        return [self.screen_rect.copy()]
+
+    def stats(self):
+        """平均每帧更新的屏幕比例"""
+        screen_area = self.screen_rect.width * self.screen_rect.height
+        return {
+            "frames": self.frames,
+            "full_frames": self.full_frames,
+            "dirty_fraction": self.dirty_area / (self.frames * screen_area) if self.frames else 0.0,
+        }
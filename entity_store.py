@@ -0,0 +1,218 @@
+"""Structure-of-arrays entity backend for monsters and swords.
+
+Positions, velocities, health, speed, damage and flags of every live entity
+are kept in NumPy arrays, so movement, off-screen culling and defense-line
+arrival are computed for all entities in one vectorized step. The sprites
+that own the slots become thin views: their stored attributes are
+``StoredField`` descriptors that read and write the arrays. Sword rects are
+synced in the step whenever the integer position changes, since every sword
+is collided every tick. A monster's rect is a ``StoredRect``: the step only
+records its new position, and the rect is synced when something reads it
+(a collision candidate, the target index, drawing). Moved monsters are
+reported to ``on_moved`` once per step as a batch, with their old and new
+tops as arrays, so the grid and target index can pick out the few that
+changed cell or band with array operations.
+"""
+import numpy as np
+
+# Entity kinds
+MONSTER = 0
+SWORD = 1
+
+
+def round_half_away(values):
+    """与pygame.Rect一样，把浮点坐标四舍五入（.5远离0）"""
+    return np.copysign(np.floor(np.abs(values) + 0.5), values)
+
+
+class StoredField:
+    """把精灵属性映射到EntityStore中的数组元素；实体不在存储中时退回到实例字典"""
+    def __init__(self, array_name, cast=float):
+        self.array_name = array_name
+        self.cast = cast
+        self.name = array_name
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        if obj.slot is None:
+            return obj.__dict__[self.name]
+        return self.cast(getattr(obj.store, self.array_name)[obj.slot])
+
+    def __set__(self, obj, value):
+        if obj.slot is None:
+            obj.__dict__[self.name] = value
+        else:
+            getattr(obj.store, self.array_name)[obj.slot] = value
+
+
+class StoredRect:
+    """精灵的rect：实体在存储中时，step只记下新位置，读取rect时才同步到Rect上"""
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        rect = obj.__dict__[self.name]
+        if obj.slot is not None:
+            store = obj.store
+            if obj in store.stale:
+                store.sync(obj, rect)
+        return rect
+
+    def __set__(self, obj, value):
+        obj.__dict__[self.name] = value
+
+
+class EntityStore:
+    """结构化数组(SoA)实体存储：每个实体占一个槽位，删除时用最后一个实体填补空位"""
+    FIELDS = {
+        "kind": np.int8,
+        "x": np.float64,          # 左上角x
+        "y": np.float64,          # 左上角y（怪物为y_float）
+        "vx": np.float64,         # 飞剑每帧速度
+        "vy": np.float64,
+        "width": np.int32,
+        "height": np.int32,
+        "rect_x": np.int32,       # 上次同步到精灵rect的整数位置
+        "rect_y": np.int32,
+        "speed": np.float64,      # 怪物每帧下移速度 / 飞剑速度
+        "health": np.float64,
+        "damage": np.float64,
+        "attacking": np.bool_,
+    }
+
+    def __init__(self, capacity=1024):
+        self.capacity = 0
+        self.count = 0
+        self.owners = []
+        self.stale = set()        # 位置还没同步到rect上的怪物
+        for name, dtype in self.FIELDS.items():
+            setattr(self, name, np.zeros(0, dtype))
+        self.reserve(capacity)
+
+    def __len__(self):
+        return self.count
+
+    def reserve(self, capacity):
+        """预先分配至少capacity个槽位"""
+        if capacity <= self.capacity:
+            return
+        for name in self.FIELDS:
+            old = getattr(self, name)
+            new = np.zeros(capacity, old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+        self.owners.extend([None] * (capacity - self.capacity))
+        self.capacity = capacity
+
+    def add(self, owner, kind, **values):
+        """为精灵分配槽位并写入初始值，返回槽位号"""
+        if self.count == self.capacity:
+            self.reserve(self.capacity * 2)
+        slot = self.count
+        self.count += 1
+        self.owners[slot] = owner
+        self.kind[slot] = kind
+        for name in self.FIELDS:
+            if name != "kind":
+                getattr(self, name)[slot] = values.get(name, 0)
+        owner.store = self
+        owner.slot = slot
+        return slot
+
+    def sync(self, owner, rect):
+        """把数组中的整数位置同步到owner的rect上"""
+        self.stale.discard(owner)
+        rect.topleft = (int(self.rect_x[owner.slot]), int(self.rect_y[owner.slot]))
+
+    def remove(self, owner, fields=()):
+        """释放槽位；fields中的属性值会写回精灵的实例字典"""
+        slot = owner.slot
+        if slot is None or owner.store is not self:
+            return
+        if owner in self.stale:
+            self.sync(owner, owner.__dict__["rect"])
+        for field in fields:
+            owner.__dict__[field.name] = field.cast(getattr(self, field.array_name)[slot])
+        last = self.count - 1
+        if slot != last:
+            for name in self.FIELDS:
+                array = getattr(self, name)
+                array[slot] = array[last]
+            moved = self.owners[last]
+            self.owners[slot] = moved
+            moved.slot = slot
+        self.owners[last] = None
+        self.count = last
+        owner.slot = None
+
+    def step(self, screen_width, screen_height, defense_line, on_moved=None):
+        """向量化推进一帧：移动所有实体、检测到达防线的怪物、剔除飞出屏幕的飞剑
+
+        返回 (本帧攻击防线的怪物伤害列表, 飞出屏幕的飞剑精灵列表)。
+        on_moved(owners, old_tops, new_tops, heights) 在rect移动了的怪物上整批调用一次，
+        后三个参数是与owners对应的整数数组。
+        """
+        n = self.count
+        if n == 0:
+            return [], []
+        x = self.x[:n]
+        y = self.y[:n]
+        width = self.width[:n]
+        height = self.height[:n]
+        attacking = self.attacking[:n]
+        monster = self.kind[:n] == MONSTER
+        sword = ~monster
+
+        # 已经在攻击防线的怪物不再移动，只消耗护甲（飞剑的attacking总为False）
+        drains = self.damage[:n][attacking].tolist() if np.count_nonzero(attacking) else []
+
+        # 怪物的vx、vy为0，飞剑的attacking为False：一次算完所有实体的移动
+        # 怪物下移，rect.y取整数部分；飞剑按角度移动，rect坐标每帧取整
+        moving = monster & ~attacking
+        y += np.where(moving, self.speed[:n], self.vy[:n])
+        x[:] = round_half_away(x + self.vx[:n])
+        top = np.where(monster, np.trunc(y), round_half_away(y))
+        np.copyto(y, top, where=sword)
+        arrived = moving & (top + height >= defense_line)
+        if np.count_nonzero(arrived):
+            attacking[arrived] = True
+            # 停在防线上（与rect.bottom赋值相同的取整方式）
+            y[arrived] = round_half_away(defense_line - height[arrived])
+            top[arrived] = y[arrived]
+
+        offscreen = sword & ((top + height < 0) | (top > screen_height) |
+                             (x + width < 0) | (x > screen_width))
+        culled = [self.owners[i] for i in offscreen.nonzero()[0].tolist()] if np.count_nonzero(offscreen) else []
+
+        rect_x = self.rect_x[:n]
+        rect_y = self.rect_y[:n]
+        new_x = x.astype(np.int32)
+        new_y = top.astype(np.int32)
+        changed = (new_x != rect_x) | (new_y != rect_y)
+        moved = (changed & monster).nonzero()[0]
+        synced = (changed & sword).nonzero()[0]
+        owners = self.owners
+        # 飞剑每tick都参与碰撞检测，直接同步rect
+        if len(synced):
+            for i, left, top_y in zip(synced.tolist(), new_x[synced].tolist(), new_y[synced].tolist()):
+                owners[i].rect.topleft = (left, top_y)
+            rect_x[synced] = new_x[synced]
+            rect_y[synced] = new_y[synced]
+        # 怪物只记下新位置，读取rect时再同步
+        if len(moved):
+            moved_owners = [owners[i] for i in moved.tolist()]
+            old_tops = rect_y[moved]
+            new_tops = new_y[moved]
+            self.stale.update(moved_owners)
+            rect_x[moved] = new_x[moved]
+            rect_y[moved] = new_tops
+            if on_moved is not None:
+                on_moved(moved_owners, old_tops, new_tops, height[moved])
+
+        return drains, culled
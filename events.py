@@ -0,0 +1,56 @@
+"""Per-tick damage and kill event queue.
+
+Sword hits and sword-rain hits report their damage here as they happen, and
+kills are reported as the monster is removed from the game. The queue is
+resolved once at the end of the tick: every listener is called once with
+the whole batch, in subscription order. The game's scoring and upgrade
+popup are the first listener, so several kills in one tick open the popup
+(and draw its options) only once. Stats and telemetry can subscribe next to
+it instead of wrapping the collision code.
+
+Events are plain tuples:
+
+* damage: ``(monster, source, damage, health)``, ``health`` being what is
+  left after the hit (zero or less for a killing hit);
+* kill: ``(monster, source, attacking, drops_upgrade)``, captured at the
+  moment of the kill because a killed monster goes back to its pool.
+
+``source`` is the sword type of the hit (the sword rain has its own type).
+"""
+
+
+class EventQueue:
+    """每tick的伤害和击杀事件队列，tick结束时整批交给监听者"""
+    def __init__(self):
+        self.damage = []       # (怪物, 来源, 伤害, 受伤后的生命值)
+        self.kills = []        # (怪物, 来源, 是否正在攻击, 是否掉落升级)
+        self.listeners = []    # listener(damage, kills)
+        self.batches = 0
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        self.listeners.remove(listener)
+
+    def hit(self, monster, source, damage, health):
+        self.damage.append((monster, source, damage, health))
+
+    def kill(self, monster, source, attacking, drops_upgrade):
+        self.kills.append((monster, source, attacking, drops_upgrade))
+
+    def resolve(self):
+        """把本tick的整批事件按订阅顺序交给每个监听者一次；没有事件时什么也不做"""
+        if not self.damage and not self.kills:
+            return
+        # 先换上新的列表：监听者中产生的事件进入下一批
+        damage, kills = self.damage, self.kills
+        self.damage, self.kills = [], []
+        self.batches += 1
+        for listener in self.listeners:
+            listener(damage, kills)
+
+    def clear(self):
+        """丢弃还没结算的事件（监听者保留）"""
+        self.damage = []
+        self.kills = []
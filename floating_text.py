@@ -0,0 +1,110 @@
+"""Global floating-text system for damage numbers.
+
+All live numbers sit in one fixed-capacity ring buffer of NumPy arrays
+(position, value, spawn time, alpha and rise). Numbers are spawned in time
+order and share one lifetime, so the live entries are always a contiguous
+run of the ring: culling only advances the tail, and ageing the rest is one
+vectorized pass. Hits on the same owner within the same tick are merged
+into one number, and each number is drawn from a cached glyph surface.
+"""
+import numpy as np
+
+
+class FloatingText:
+    """环形缓冲区存储的全局飘字系统"""
+    def __init__(self, glyph, capacity=512, lifetime=500, rise=20):
+        self.glyph = glyph           # glyph(value) -> 缓存的文字图像
+        self.capacity = capacity
+        self.lifetime = lifetime     # 存在时间（毫秒）
+        self.rise = rise             # 存在期间上浮的像素数
+        self.x = np.zeros(capacity, np.int32)        # 文字中心x
+        self.y = np.zeros(capacity, np.int32)        # 文字基准y（上浮前）
+        self.value = np.zeros(capacity, np.int64)
+        self.spawn = np.zeros(capacity, np.int64)
+        self.alpha = np.zeros(capacity, np.int32)
+        self.offset = np.zeros(capacity, np.float64)  # 上浮偏移（负数向上）
+        self.tail = 0                # 最老的条目
+        self.count = 0
+        self.merge_time = None
+        self.merge_slots = {}        # 本tick内 owner -> 槽位，用于合并同一目标的伤害
+        self.merged = 0
+        self.overwritten = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, owner, x, y, value, now):
+        """在(x, y)处生成一个伤害数字；同一tick内同一owner的伤害合并为一个数字"""
+        if now != self.merge_time:
+            self.merge_time = now
+            self.merge_slots.clear()
+        slot = self.merge_slots.get(owner)
+        if slot is not None and self.spawn[slot] == now and self._live(slot):
+            self.value[slot] += value
+            self.x[slot] = x
+            self.y[slot] = y
+            self.merged += 1
+            return slot
+        if self.count == self.capacity:
+            # 缓冲区满时覆盖最老的数字
+            self.tail = (self.tail + 1) % self.capacity
+            self.count -= 1
+            self.overwritten += 1
+        slot = (self.tail + self.count) % self.capacity
+        self.count += 1
+        self.x[slot] = x
+        self.y[slot] = y
+        self.value[slot] = value
+        self.spawn[slot] = now
+        self.alpha[slot] = 255
+        self.offset[slot] = 0.0
+        self.merge_slots[owner] = slot
+        return slot
+
+    def _live(self, slot):
+        return (slot - self.tail) % self.capacity < self.count
+
+    def slots(self):
+        """存活条目的槽位数组，从老到新"""
+        return (self.tail + np.arange(self.count)) % self.capacity
+
+    def update(self, now):
+        """一次处理所有数字：剔除过期的，更新其余的透明度和上浮位置"""
+        capacity = self.capacity
+        spawn = self.spawn
+        lifetime = self.lifetime
+        while self.count and now - spawn[self.tail] > lifetime:
+            self.tail = (self.tail + 1) % capacity
+            self.count -= 1
+        if not self.count:
+            return
+        slots = self.slots()
+        progress = (now - spawn[slots]) / lifetime
+        self.alpha[slots] = (255 * (1 - progress)).astype(np.int32)  # 从255渐变到0
+        self.offset[slots] = -self.rise * progress                   # 向上飘动效果
+
+    def entries(self):
+        """每个存活数字的 (槽位, 文字图像, 绘制位置)，从老到新"""
+        slots = self.slots()
+        glyph = self.glyph
+        result = []
+        for slot, x, y, value, offset in zip(slots.tolist(), self.x[slots].tolist(), self.y[slots].tolist(),
+                                             self.value[slots].tolist(), self.offset[slots].tolist()):
+            image = glyph(value)
+            result.append((slot, image, (x - image.get_width() // 2, int(y + offset))))
+        return result
+
+    def draw_entry(self, surface, slot, image, position):
+        # 缓存的文字是共享的，每次绘制前都要设置透明度
+        image.set_alpha(int(self.alpha[slot]))
+        surface.blit(image, position)
+
+    def draw(self, surface):
+        for slot, image, position in self.entries():
+            self.draw_entry(surface, slot, image, position)
+
+    def clear(self):
+        self.tail = 0
+        self.count = 0
+        self.merge_time = None
+        self.merge_slots.clear()
@@ -1,8 +1,25 @@
 import pygame
+import copy
 import random
+import numpy as np
 import sys
 import os
+import time
 from pygame.locals import *
+from spatial_hash import SpatialHash
+from sweep import entry_times, entry_time
+from targeting import TargetIndex, DamageLedger
+from text_cache import FontRegistry, TextCache
+from pools import ObjectPool
+from dirty_rects import DirtyRenderer
+from hud import TextWidget, SwordPanel
+from floating_text import FloatingText
+from events import EventQueue
+from waves import WaveConfig, WaveScheduler
+from replay import ReplayRecorder
+from profiler import FrameProfiler, ProfilerOverlay
+from advisor import UpgradeAdvisor
+from entity_store import EntityStore, StoredField, StoredRect, MONSTER, SWORD, round_half_away
 
 # Initialize pygame
 pygame.init()
@@ -12,11 +29,89 @@ SCREEN_WIDTH = 480
 SCREEN_HEIGHT = 800
 FPS = 60
 
+# 固定时间步长：游戏逻辑每秒TICK_RATE个tick，与画面帧率无关；画面每秒最多RENDER_FPS帧
+TICK_RATE = FPS
+RENDER_FPS = FPS
+# 每帧在正常应跑的 ceil(TICK_RATE / RENDER_FPS) 个tick之外最多再补跑的tick数；
+# 落后更多时丢弃积压的时间（游戏变慢，而不会越追越落后）
+CATCH_UP_TICKS = 4
+# 在上一个tick和当前tick的位置之间插值绘制精灵
+RENDER_INTERPOLATION = True
+
 # Area dimensions
 WORMHOLE_HEIGHT = SCREEN_HEIGHT * 0.18  # Top 20% for wormhole area
 DEFENSE_HEIGHT = SCREEN_HEIGHT * 0.3    # Bottom 30% for defense area
 ATTACK_HEIGHT = SCREEN_HEIGHT * 0.52     # Middle 50% for attack area
 
+# 碰撞检测空间网格的格子大小（像素）
+GRID_CELL_SIZE = 64
+
+# 连续碰撞检测：检测飞剑本tick的整条移动路径，而不只是移动后的位置（飞剑每tick移动50像素，
+# 比怪物还高，只检测最终位置会从怪物中间穿过去）
+SWEPT_COLLISIONS = True
+# 飞剑数达到此值时连续碰撞检测改用NumPy批量计算，否则逐把用标量计算
+SWEEP_BATCH_SIZE = 256
+
+# 使用NumPy数组后端存储怪物和飞剑（reset_game时生效）
+USE_ENTITY_STORE = False
+# 数组后端一帧移动的怪物达到此值时用数组运算挑出需要更新索引的怪物，否则逐个更新
+MOVE_BATCH_SIZE = 20
+
+# 齐射：每次发射只创建一个精灵，用数组保存这次发射的所有飞剑（reset_game时生效）
+USE_VOLLEYS = False
+
+# 按在途伤害分配目标：已发射的飞剑足以击杀的怪物不再被瞄准，多出的飞剑转向下一个目标
+ALLOCATE_TARGETS = False
+
+# 渲染文字缓存的最大条目数
+TEXT_CACHE_SIZE = 256
+
+# 飞剑图集的角度精度（度），飞剑图像按此精度预先旋转
+SWORD_ANGLE_STEP = 1
+
+# 对象池：复用飞剑、怪物和剑雨对象（reset_game时生效）
+USE_OBJECT_POOLS = True
+SWORD_POOL_SIZE = 512
+MONSTER_POOL_SIZE = 256
+RAIN_POOL_SIZE = 16
+
+# 脏矩形渲染：只重绘和提交变化的屏幕区域，代替每帧整屏重绘和flip
+USE_DIRTY_RECTS = False
+
+# 游戏区域背景主题（见BACKGROUND_THEMES）
+BACKGROUND_THEME = "classic"
+
+# 剑状态面板的冷却圆盘分多少档重绘
+SWORD_HUD_DIAL_STEPS = 24
+
+# 性能分析覆盖层的位置（左上角，避开右侧的剑状态面板）
+PROFILER_OVERLAY_POS = (5, 5)
+
+# 刷怪波次配置（见WAVES）
+WAVE_PRESET = "classic"
+
+# 录制每局游戏的录像（保存到REPLAY_DIR，可用 simulation.py --replay 重放）
+RECORD_REPLAY = False
+REPLAY_DIR = "replays"
+
+# 性能分析：按阶段统计每帧耗时，F3显示/隐藏覆盖层；PROFILE_LOG为逐帧写入的CSV文件
+PROFILE = False
+PROFILE_LOG = None
+PROFILE_STAGES = ("input", "spawn", "shoot", "rain", "update", "collision", "draw", "hud", "popup", "flip")
+
+# 升级顾问：弹窗打开时为每个选项分叉游戏状态向前模拟，用金色边框标出推荐的选项
+UPGRADE_ADVISOR = False
+ADVISOR_HORIZON_MS = 60000     # 向前模拟的游戏时间
+ADVISOR_BUDGET_MS = 300        # 每次弹窗的计算时间预算
+ADVISOR_WORKERS = 0            # 工作进程数，0表示在游戏进程中模拟
+
+# 同时显示的伤害数字上限
+FLOATING_TEXT_CAPACITY = 512
+
+# 剑雨动画：每种半径预先生成的帧数和换帧间隔（毫秒）
+RAIN_ANIMATION_FRAMES = 8
+RAIN_FRAME_INTERVAL = 100
+
 # Colors
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
@@ -25,6 +120,7 @@ GREEN = (0, 255, 0)
 BLUE = (0, 0, 255)
 CYAN = (0, 255, 255)
 ORANGE = (255, 165, 0)
+GOLD = (255, 215, 0)
 
 # Game variables
 armor = 600
@@ -38,24 +134,142 @@ ICE_SWORD = 1
 FIRE_SWORD = 2
 SWORD_RAIN = 3  # 新增剑雨类型
 
+# Balance: 平衡参数（batch.py 扫描参数时覆盖这些全局变量，在reset_game时生效）
+# 各类型怪物的颜色、生命值、下落速度和每帧对防线的伤害
+MONSTER_STATS = {
+    0: {"color": RED, "max_health": 40, "speed": 0.5, "damage": 5},     # Basic monster
+    1: {"color": GREEN, "max_health": 30, "speed": 0.8, "damage": 3},   # Fast monster
+    2: {"color": BLUE, "max_health": 80, "speed": 0.3, "damage": 10},   # Tank monster
+}
+# 各剑类型的初始 (数量, 每秒发射次数, 伤害)
+SWORD_BASE_STATS = {
+    NORMAL_SWORD: (1, 2.0, 8),
+    ICE_SWORD: (0, 2.0, 10),
+    FIRE_SWORD: (0, 2.0, 15),
+}
+SWORD_FIRE_RATE_UPGRADE = 1.2   # 每次提速的发射频率倍数
+SWORD_DAMAGE_UPGRADE = 5        # 每次强化增加的伤害
+UPGRADE_DROP_CHANCE = 0.015     # 怪物掉落升级的概率
+UPGRADE_DROP_KILL_LIMIT = 2000  # 击杀数达到此值后不再掉落升级
+SPAWN_INTERVAL_SCALE = 1.0      # 刷怪间隔的倍数（小于1刷怪更快）
+
 # Paths
 current_dir = os.path.dirname(os.path.abspath(__file__))
 pic_dir = os.path.join(current_dir, "pic")
 
-# Create the game window
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Hofund - Tower Defense")
+# Create the game window (only when run as the game; the headless simulation
+# imports this module without opening one)
+screen = None
+if __name__ == "__main__":
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Hofund - Tower Defense")
 clock = pygame.time.Clock()
 
+# Game clock
+class ManualClock:
+    """手动推进的游戏时钟：主循环每个tick推进固定步长，无界面模拟也用它快速推进"""
+    def __init__(self, start_time=0):
+        self.time = float(start_time)
+
+    def get_ticks(self):
+        return int(self.time)
+
+    def advance(self, milliseconds):
+        self.time += milliseconds
+
+# 所有游戏逻辑都通过game_clock读取时间，主循环和模拟器各自替换它
+game_clock = ManualClock()
+
+# 游戏逻辑使用的随机数（刷怪种子、升级选项），reset_game(seed)时重新播种，录像据此重现整局游戏
+game_rng = random.Random()
+
+# Shared fonts and rendered text
+fonts = FontRegistry()
+text_cache = TextCache(TEXT_CACHE_SIZE)
+
+# 主循环各阶段的性能分析（关闭时每个mark只是一次属性检查）
+profiler = FrameProfiler(PROFILE_STAGES, log_path=PROFILE_LOG)
+profiler_overlay = ProfilerOverlay(profiler, fonts.get(20))
+
+def render_text(size, text, color):
+    """从共享缓存中取得渲染好的文字（默认字体）"""
+    return text_cache.render(fonts.get(size), text, color)
+
+def damage_glyph(damage):
+    return render_text(20, f"-{damage}", (255, 50, 50))
+
+# 所有怪物的伤害数字（受伤显示）
+floating_text = FloatingText(damage_glyph, FLOATING_TEXT_CAPACITY)
+
+# 伤害和击杀事件，每tick结束时统一结算（计分和升级弹窗是第一个监听者）
+game_events = EventQueue()
+
 # Load images
 try:
-    player_img = pygame.image.load(os.path.join(pic_dir, "Heimdall00.jpeg")).convert_alpha()
+    player_img = pygame.image.load(os.path.join(pic_dir, "Heimdall00.jpeg"))
+    # 没有窗口时无法convert_alpha
+    if pygame.display.get_surface() is not None:
+        player_img = player_img.convert_alpha()
     player_img = pygame.transform.scale(player_img, (100, 100))
 except pygame.error:
     # Fallback if image loading fails
     player_img = pygame.Surface((80, 80), pygame.SRCALPHA)
     pygame.draw.circle(player_img, BLUE, (40, 40), 40)
 
+# Sword stats
+class SwordStats:
+    """一种飞剑的属性；冷却时间和下次可发射时间只在发射或升级时重新计算"""
+    __slots__ = ("count", "fire_rate", "damage", "range", "upgrades", "last_shot",
+                 "cooldown_ms", "next_ready")
+    
+    def __init__(self, count, fire_rate, damage, damage_range=20):
+        self.count = count            # 剑的数量
+        self.fire_rate = fire_rate    # 发射频率（每秒）
+        self.damage = damage          # 伤害值
+        self.range = damage_range     # 伤害范围
+        self.upgrades = 0             # 升级次数
+        self.last_shot = 0            # 上次发射时间
+        self.refresh()
+    
+    def refresh(self):
+        """修改fire_rate后重新计算派生值"""
+        self.cooldown_ms = 1000 / self.fire_rate
+        # 时间是整数毫秒：current_time - last_shot > cooldown_ms 等价于 current_time >= next_ready
+        self.next_ready = self.last_shot + int(self.cooldown_ms) + 1
+    
+    def fire(self, current_time):
+        self.last_shot = current_time
+        self.next_ready = current_time + int(self.cooldown_ms) + 1
+    
+    def cooldown_percentage(self, current_time):
+        """冷却进度（0-1）"""
+        return min((current_time - self.last_shot) / self.cooldown_ms, 1.0)
+
+class RainStats:
+    """剑雨技能的属性"""
+    __slots__ = ("damage", "radius", "duration", "cooldown", "upgrades", "last_used", "next_ready")
+    
+    def __init__(self, damage, radius, duration, cooldown):
+        self.damage = damage          # 每次伤害值（0表示未解锁）
+        self.radius = radius          # 影响范围
+        self.duration = duration      # 持续时间(毫秒)
+        self.cooldown = cooldown      # 冷却时间(毫秒)
+        self.upgrades = 0             # 升级次数
+        self.last_used = 0            # 上次使用时间
+        self.refresh()
+    
+    def refresh(self):
+        """修改cooldown后重新计算下次可用时间"""
+        self.next_ready = self.last_used + self.cooldown
+    
+    def fire(self, current_time):
+        self.last_used = current_time
+        self.next_ready = current_time + self.cooldown
+    
+    def cooldown_percentage(self, current_time):
+        """冷却进度（0-1）"""
+        return min((current_time - self.last_used) / self.cooldown, 1.0)
+
 # Player class
 class Player(pygame.sprite.Sprite):
     def __init__(self):
@@ -73,38 +287,10 @@ class Player(pygame.sprite.Sprite):
         
         # 为每种剑类型创建独立的属性
         self.sword_attributes = {
-            NORMAL_SWORD: {
-                "count": 1,          # 剑的数量
-                "fire_rate": 2.0,    # 发射频率
-                "damage": 8,        # 伤害值
-                "range": 20,         # 伤害范围
-                "upgrades": 0,       # 升级次数
-                "last_shot": 0       # 上次发射时间
-            },
-            ICE_SWORD: {
-                "count": 0,
-                "fire_rate": 2.0,
-                "damage": 10,
-                "range": 20,
-                "upgrades": 0,
-                "last_shot": 0
-            },
-            FIRE_SWORD: {
-                "count": 0,
-                "fire_rate": 2.0,
-                "damage": 15,
-                "range": 20,
-                "upgrades": 0,
-                "last_shot": 0
-            },
-            SWORD_RAIN: {
-                "damage": 0,         # 每次伤害值（0表示未解锁）
-                "radius": 60,        # 影响范围
-                "duration": 5000,    # 持续时间(毫秒)
-                "cooldown": 15000,   # 冷却时间(毫秒)
-                "upgrades": 0,       # 升级次数
-                "last_used": 0       # 上次使用时间
-            }
+            NORMAL_SWORD: SwordStats(*SWORD_BASE_STATS[NORMAL_SWORD]),
+            ICE_SWORD: SwordStats(*SWORD_BASE_STATS[ICE_SWORD]),
+            FIRE_SWORD: SwordStats(*SWORD_BASE_STATS[FIRE_SWORD]),
+            SWORD_RAIN: RainStats(damage=0, radius=60, duration=5000, cooldown=15000)
         }
         
         # 剑雨技能是否激活
@@ -122,10 +308,10 @@ class Player(pygame.sprite.Sprite):
             self.unlocked_sword_types.append(sword_type)
             # 如果是剑雨，设置初始伤害值
             if sword_type == SWORD_RAIN:
-                self.sword_attributes[SWORD_RAIN]["damage"] = 3
+                self.sword_attributes[SWORD_RAIN].damage = 3
             # 其他剑类型设置初始数量为1
             else:
-                self.sword_attributes[sword_type]["count"] = 1
+                self.sword_attributes[sword_type].count = 1
             return True
         return False
     
@@ -134,49 +320,8 @@ class Player(pygame.sprite.Sprite):
         pass
     
     def find_nearest_monster(self, monsters):
-        nearest_monster = None
-        min_distance = float('inf')
-        defense_line = SCREEN_HEIGHT - DEFENSE_HEIGHT
-        attack_line = SCREEN_HEIGHT - DEFENSE_HEIGHT - ATTACK_HEIGHT
-        
-        # 首先检查是否有怪物已经到达防线
-        attacking_monsters = []
-        for monster in monsters:
-            if monster.attacking:
-                attacking_monsters.append(monster)
-        
-        # 如果有正在攻击的怪物，优先攻击它们中距离玩家最近的
-        if attacking_monsters:
-            for monster in attacking_monsters:
-                dx = monster.rect.centerx - self.rect.centerx
-                dy = monster.rect.centery - self.rect.centery
-                distance = (dx * dx + dy * dy) ** 0.5
-                
-                if distance < min_distance:
-                    min_distance = distance
-                    nearest_monster = monster
-        
-        # 如果没有正在攻击的怪物，则选择距离防线最近的怪物
-        else:
-            for monster in monsters:
-                # 只考虑已经进入攻防区域的怪物
-                if monster.rect.bottom >= attack_line and not monster.attacking:
-                    # 计算怪物到防线的距离
-                    distance_to_defense = defense_line - monster.rect.bottom
-                    
-                    if distance_to_defense < min_distance:
-                        min_distance = distance_to_defense
-                        nearest_monster = monster
-        
-        if nearest_monster:
-            if nearest_monster.attacking:
-                print(f"Targeting attacking monster at: {nearest_monster.rect.topleft}")
-            else:
-                print(f"Targeting monster at: {nearest_monster.rect.topleft}, Distance to defense: {min_distance}")
-        else:
-            print("No monsters in attack area.")
-        
-        return nearest_monster
+        """优先选择正在攻击防线、距离玩家最近的怪物；否则选择攻防区内距离防线最近的怪物"""
+        return monsters.targets.nearest(self.rect.center)
     
     def calculate_angle_to_target(self, target):
         # 计算射击角度
@@ -187,10 +332,37 @@ class Player(pygame.sprite.Sprite):
         # 调整角度使飞剑朝向目标
         return -angle  # 负号使飞剑朝向目标
     
+    def allocate_targets(self, monsters, count, damage):
+        """按目标优先顺序为count把伤害为damage的飞剑分配目标：每个目标分到足以耗尽剩余生命
+        （扣除在途伤害）的飞剑后换下一个；所有候选都已足够时剩下的飞剑不分配"""
+        targets = []
+        for monster in monsters.targets.ranked(self.rect.center):
+            remaining = damage_ledger.remaining_health(monster)
+            while remaining > 0 and len(targets) < count:
+                targets.append(monster)
+                remaining -= damage
+            if len(targets) == count:
+                break
+        return targets
+    
+    def spread_angles(self, base_angle, count, attacking):
+        """不分配目标时一次发射的飞剑角度"""
+        # 根据怪物是否正在攻击调整飞剑的分布
+        if attacking:
+            # 如果怪物正在攻击防线，所有飞剑都瞄准它
+            return [base_angle] * count
+        # 如果怪物还未到达防线，飞剑可以有一定的扇形分布
+        angles = []
+        for i in range(count):
+            angle_offset = 0
+            if count > 1:
+                angle_offset = (i - (count - 1) / 2) * 15
+            angles.append(base_angle + angle_offset)
+        return angles
+    
     def shoot(self, current_time, all_sprites, swords, monsters):
-        nearest_monster = self.find_nearest_monster(monsters)
-        if not nearest_monster:
-            return
+        nearest_monster = None
+        targets = None
 
         # 对每种已解锁的剑类型分别检查是否可以发射
         for sword_type in self.unlocked_sword_types:
@@ -198,45 +370,54 @@ class Player(pygame.sprite.Sprite):
             if sword_type == SWORD_RAIN:
                 continue
                 
-            attrs = self.sword_attributes[sword_type]
+            stats = self.sword_attributes[sword_type]
+            # 冷却中：一次整数比较即可跳过
+            if current_time < stats.next_ready:
+                continue
             # 确保剑的数量大于0
-            if attrs["count"] <= 0:
+            if stats.count <= 0:
                 continue
-                
-            time_since_last_shot = current_time - attrs["last_shot"]
             
-            if time_since_last_shot > 1000 / attrs["fire_rate"]:
-                attrs["last_shot"] = current_time
-                base_angle = self.calculate_angle_to_target(nearest_monster)
+            if ALLOCATE_TARGETS:
+                # 每把飞剑直接瞄准分到的目标；没有需要更多伤害的目标时不发射，冷却保持就绪
+                blade_damage = hit_damage(sword_type, stats.damage)
+                targets = self.allocate_targets(monsters, stats.count, blade_damage)
+                if not targets:
+                    continue
+                stats.fire(current_time)
+                angles = [self.calculate_angle_to_target(target) for target in targets]
+            else:
+                # 有剑可以发射时才查找目标
+                if nearest_monster is None:
+                    nearest_monster = self.find_nearest_monster(monsters)
+                    if not nearest_monster:
+                        return
+                    base_angle = self.calculate_angle_to_target(nearest_monster)
                 
-                # 根据怪物是否正在攻击调整飞剑的分布
-                if nearest_monster.attacking:
-                    # 如果怪物正在攻击防线，所有飞剑都瞄准它
-                    for i in range(attrs["count"]):
-                        new_sword = Sword(self.rect.centerx, self.rect.centery, 
-                                        sword_type, attrs["damage"], attrs["range"],
-                                        base_angle)
-                        all_sprites.add(new_sword)
-                        swords.add(new_sword)
-                else:
-                    # 如果怪物还未到达防线，飞剑可以有一定的扇形分布
-                    for i in range(attrs["count"]):
-                        angle_offset = 0
-                        if attrs["count"] > 1:
-                            angle_offset = (i - (attrs["count"] - 1) / 2) * 15
-                        
-                        new_sword = Sword(self.rect.centerx, self.rect.centery, 
-                                        sword_type, attrs["damage"], attrs["range"],
-                                        base_angle + angle_offset)
-                        all_sprites.add(new_sword)
-                        swords.add(new_sword)
+                stats.fire(current_time)
+                angles = self.spread_angles(base_angle, stats.count, nearest_monster.attacking)
+            
+            if volley_mode:
+                # 一次发射的所有飞剑组成一个齐射
+                volley = sword_pool.acquire(self.rect.centerx, self.rect.centery,
+                                            sword_type, stats.damage, stats.range, angles)
+                swords.add(volley)
+                if targets:
+                    for blade, target in enumerate(targets):
+                        damage_ledger.commit((volley, blade), target, blade_damage)
+                continue
+            for i, angle in enumerate(angles):
+                new_sword = sword_pool.acquire(self.rect.centerx, self.rect.centery, 
+                                sword_type, stats.damage, stats.range,
+                                angle)
+                all_sprites.add(new_sword)
+                swords.add(new_sword)
+                if targets:
+                    damage_ledger.commit(new_sword, targets[i], blade_damage)
 
     def get_cooldown_percentage(self, current_time, sword_type):
         """获取指定剑类型的冷却百分比（0-1）"""
-        attrs = self.sword_attributes[sword_type]
-        time_since_last_shot = current_time - attrs["last_shot"]
-        cooldown_time = 1000 / attrs["fire_rate"]
-        return min(time_since_last_shot / cooldown_time, 1.0)
+        return self.sword_attributes[sword_type].cooldown_percentage(current_time)
 
     def auto_use_sword_rain(self, current_time, all_sprites):
         """自动触发剑雨技能，不检查冷却时间"""
@@ -250,65 +431,94 @@ class Player(pygame.sprite.Sprite):
             nearest_monster = dummy_target
         
         # 创建剑雨效果
-        attrs = self.sword_attributes[SWORD_RAIN]
-        sword_rain = SwordRain(
+        stats = self.sword_attributes[SWORD_RAIN]
+        sword_rain = rain_pool.acquire(
             nearest_monster, 
-            attrs["damage"],
-            attrs["radius"],
-            attrs["duration"]
+            stats.damage,
+            stats.radius,
+            stats.duration
         )
         
         all_sprites.add(sword_rain)
-        attrs["last_used"] = current_time
+        stats.fire(current_time)
         self.sword_rain_active = True
         return True
     
     def use_sword_rain(self, current_time, all_sprites):
         """检查冷却时间后触发剑雨技能"""
         # 检查冷却时间
-        attrs = self.sword_attributes[SWORD_RAIN]
-        if current_time - attrs["last_used"] < attrs["cooldown"]:
+        stats = self.sword_attributes[SWORD_RAIN]
+        if current_time < stats.next_ready:
             return False
         
         # 检查剑雨是否已解锁（伤害值大于0）
-        if attrs["damage"] <= 0:
+        if stats.damage <= 0:
             return False
             
         return self.auto_use_sword_rain(current_time, all_sprites)
 
     def get_sword_rain_cooldown_percentage(self, current_time):
         """获取剑雨技能的冷却百分比（0-1）"""
-        attrs = self.sword_attributes[SWORD_RAIN]
-        time_since_last_used = current_time - attrs["last_used"]
-        return min(time_since_last_used / attrs["cooldown"], 1.0)
+        return self.sword_attributes[SWORD_RAIN].cooldown_percentage(current_time)
+
+# Sword image atlas
+class SwordAtlas:
+    """按量化角度预先旋转好的飞剑图像，所有飞剑共享，避免每把剑都分配和旋转Surface"""
+    colors = {
+        NORMAL_SWORD: WHITE,
+        ICE_SWORD: CYAN,
+        FIRE_SWORD: ORANGE
+    }
+    
+    def __init__(self, angle_step=SWORD_ANGLE_STEP):
+        self.angle_step = angle_step
+        self.steps = int(round(360 / angle_step))
+        self.base_images = {}
+        self.rotated = {}  # sword_type -> [每个量化角度的图像，未生成时为None]
+        for sword_type, color in self.colors.items():
+            image = pygame.Surface((20, 5), pygame.SRCALPHA)
+            pygame.draw.rect(image, color, (0, 0, 20, 5))
+            self.base_images[sword_type] = image
+            self.rotated[sword_type] = [None] * self.steps
+    
+    def get(self, sword_type, angle):
+        """返回量化到angle_step的旋转图像（按需生成）"""
+        index = int(round(angle / self.angle_step)) % self.steps
+        images = self.rotated[sword_type]
+        image = images[index]
+        if image is None:
+            # 注意：pygame的旋转是逆时针的
+            image = pygame.transform.rotate(self.base_images[sword_type], index * self.angle_step)
+            images[index] = image
+        return image
+    
+    def build(self):
+        """一次性生成所有角度的图像（启动时调用，避免游戏中按需生成的卡顿）"""
+        for sword_type in self.colors:
+            for index in range(self.steps):
+                self.get(sword_type, index * self.angle_step)
+
+sword_atlas = SwordAtlas()
 
 # Sword class
 class Sword(pygame.sprite.Sprite):
     def __init__(self, x, y, sword_type, damage, damage_range, angle):
         super().__init__()
+        self.reset(x, y, sword_type, damage, damage_range, angle)
+    
+    def reset(self, x, y, sword_type, damage, damage_range, angle):
+        """（重新）初始化飞剑，对象池复用时调用"""
         self.sword_type = sword_type
         self.damage = damage
         self.damage_range = damage_range
         self.angle = angle  # 直接使用计算好的角度
         self.speed = 50
         
-        # Create sword image based on type
-        if sword_type == NORMAL_SWORD:
-            self.image = pygame.Surface((20, 5), pygame.SRCALPHA)
-            pygame.draw.rect(self.image, WHITE, (0, 0, 20, 5))
-        elif sword_type == ICE_SWORD:
-            self.image = pygame.Surface((20, 5), pygame.SRCALPHA)
-            pygame.draw.rect(self.image, CYAN, (0, 0, 20, 5))
-        elif sword_type == FIRE_SWORD:
-            self.image = pygame.Surface((20, 5), pygame.SRCALPHA)
-            pygame.draw.rect(self.image, ORANGE, (0, 0, 20, 5))
-        
         # 保存原始图像
-        self.original_image = self.image
+        self.original_image = sword_atlas.base_images[sword_type]
         
-        # 旋转飞剑图像以匹配射击角度
-        # 注意：pygame的旋转是逆时针的，所以需要调整角度
-        self.image = pygame.transform.rotate(self.original_image, angle)
+        # 从图集中取得旋转好的飞剑图像以匹配射击角度
+        self.image = sword_atlas.get(sword_type, angle)
         self.rect = self.image.get_rect()
         self.rect.centerx = x
         self.rect.centery = y
@@ -325,143 +535,169 @@ class Sword(pygame.sprite.Sprite):
         if self.rect.bottom < 0 or self.rect.top > SCREEN_HEIGHT or \
            self.rect.right < 0 or self.rect.left > SCREEN_WIDTH:
             self.kill()
+    
+    def kill(self):
+        super().kill()
+        damage_ledger.release(self)
+        sword_pool.release(self)
 
 # SwordRain class
+def draw_rain_frame(radius, rng):
+    """绘制一帧剑雨效果，rng为动画专用的随机数生成器"""
+    image = pygame.Surface((radius*2, radius*2), pygame.SRCALPHA)
+    
+    # 绘制范围指示圈
+    pygame.draw.circle(image, (255,255,255,50), 
+                      (radius, radius), radius)
+    pygame.draw.circle(image, (255,255,255,100), 
+                      (radius, radius), radius, 2)
+    
+    # 绘制随机的"剑"效果
+    for _ in range(20):
+        x = rng.randint(0, radius*2)
+        y = rng.randint(0, radius*2)
+        length = rng.randint(5, 15)
+        angle = rng.randint(0, 360)
+        end_x = x + length * math.cos(math.radians(angle))
+        end_y = y + length * math.sin(math.radians(angle))
+        
+        # 只在圆形区域内绘制
+        dist = ((x - radius)**2 + (y - radius)**2)**0.5
+        if dist <= radius:
+            pygame.draw.line(image, (200,200,255,200), 
+                            (x, y), (end_x, end_y), 2)
+    return image
+
+class RainAnimation:
+    """剑雨动画帧缓存：每种半径预先生成一小组循环帧，同半径的剑雨共享，按固定的动画时钟换帧"""
+    def __init__(self, frame_count=RAIN_ANIMATION_FRAMES, interval=RAIN_FRAME_INTERVAL, seed=0):
+        self.frame_count = frame_count
+        self.interval = interval
+        self.seed = seed
+        self.frames = {}  # 半径 -> 帧列表
+    
+    def build(self, radius):
+        """生成指定半径的动画帧（动画使用独立的随机数，不影响游戏逻辑的随机序列）"""
+        frames = self.frames.get(radius)
+        if frames is None:
+            rng = random.Random(self.seed * 100003 + radius)
+            frames = [draw_rain_frame(radius, rng) for _ in range(self.frame_count)]
+            self.frames[radius] = frames
+        return frames
+    
+    def frame(self, radius, current_time):
+        frames = self.build(radius)
+        return frames[(current_time // self.interval) % len(frames)]
+
+rain_animation = RainAnimation()
+
 class SwordRain(pygame.sprite.Sprite):
     def __init__(self, target_monster, damage, radius, duration):
         super().__init__()
+        self.reset(target_monster, damage, radius, duration)
+    
+    def reset(self, target_monster, damage, radius, duration):
+        """（重新）初始化剑雨，对象池复用时调用"""
         self.target = target_monster
+        # 目标被击杀后可能被对象池复用，所以记下它当前的rect和代数（只在目标死后用来确定最后的位置）
+        self.target_rect = target_monster.rect
+        self.target_generation = getattr(target_monster, "generation", 0)
+        self.fixed_position = None
         self.damage = damage  # 每次伤害值
         self.radius = radius  # 影响范围
         self.duration = duration  # 持续时间(毫秒)
-        self.created_time = pygame.time.get_ticks()
+        self.created_time = game_clock.get_ticks()
         
-        # 创建剑雨的视觉效果
-        self.image = pygame.Surface((radius*2, radius*2), pygame.SRCALPHA)
+        # 剑雨的视觉效果取自共享的动画帧
+        self.image = rain_animation.frame(radius, self.created_time)
         self.rect = self.image.get_rect()
         
-        # 绘制剑雨效果
-        self.draw_rain_effect()
-        
         # 伤害计时器
         self.last_damage_time = 0
         self.damage_interval = 200  # 每200毫秒造成一次伤害
     
-    def draw_rain_effect(self):
-        # 清空图像
-        self.image.fill((0,0,0,0))
-        
-        # 绘制范围指示圈
-        pygame.draw.circle(self.image, (255,255,255,50), 
-                          (self.radius, self.radius), self.radius)
-        pygame.draw.circle(self.image, (255,255,255,100), 
-                          (self.radius, self.radius), self.radius, 2)
-        
-        # 绘制随机的"剑"效果
-        for _ in range(20):
-            x = random.randint(0, self.radius*2)
-            y = random.randint(0, self.radius*2)
-            length = random.randint(5, 15)
-            angle = random.randint(0, 360)
-            end_x = x + length * math.cos(math.radians(angle))
-            end_y = y + length * math.sin(math.radians(angle))
-            
-            # 只在圆形区域内绘制
-            dist = ((x - self.radius)**2 + (y - self.radius)**2)**0.5
-            if dist <= self.radius:
-                pygame.draw.line(self.image, (200,200,255,200), 
-                                (x, y), (end_x, end_y), 2)
-    
     def update(self):
-        current_time = pygame.time.get_ticks()
+        current_time = game_clock.get_ticks()
         
         # 检查是否已经超过持续时间
         if current_time - self.created_time > self.duration:
             self.kill()
             return
         
-        # 如果目标怪物还存在，跟随它移动
-        if hasattr(self.target, 'alive') and self.target.alive():
+        # 如果目标怪物还存在，跟随它移动（读取目标的rect：数组后端的怪物rect在读取时才同步）
+        if self.target_alive():
             self.rect.center = self.target.rect.center
-        elif hasattr(self.target, 'rect'):
-            # 如果目标不是怪物或已死亡，但有rect属性，保持位置不变
-            if not hasattr(self, 'fixed_position'):
-                self.fixed_position = self.target.rect.center
-                self.rect.center = self.fixed_position
+        elif self.fixed_position is None:
+            # 如果目标不是怪物或已死亡，保持在它最后的位置不变
+            self.fixed_position = self.target_rect.center
+            self.rect.center = self.fixed_position
         
-        # 定期重绘效果以产生动画
-        if current_time % 100 < 20:  # 每100ms更新一次动画
-            self.draw_rain_effect()
+        # 按动画时钟切换到当前帧
+        self.image = rain_animation.frame(self.radius, current_time)
         
         # 定期对范围内的怪物造成伤害
         if current_time - self.last_damage_time > self.damage_interval:
             self.apply_damage()
             self.last_damage_time = current_time
     
+    def target_alive(self):
+        """目标仍然存活，且没有被对象池复用为另一只怪物"""
+        return (self.target.alive() and
+                getattr(self.target, "generation", 0) == self.target_generation)
+    
+    def kill(self):
+        super().kill()
+        rain_pool.release(self)
+    
     def apply_damage(self):
-        # 获取所有在范围内的怪物
-        for monster in monsters:
-            # 计算与中心点的距离
-            dx = monster.rect.centerx - self.rect.centerx
-            dy = monster.rect.centery - self.rect.centery
-            distance = (dx**2 + dy**2)**0.5
-            
-            # 如果在范围内，造成伤害
-            if distance <= self.radius:
-                # 使用新的take_damage方法
-                monster_killed = monster.take_damage(self.damage)
-                
-                # 检查怪物是否被击败
-                if monster_killed:
-                    global score, killed_monsters, upgrade_popup
-                    score += 10
-                    
-                    # 如果是正在攻击的怪物被击杀，给予额外分数
-                    if monster.attacking:
-                        score += 5
-                    
-                    # 前两只怪物被击杀时必然弹出升级窗口
-                    if killed_monsters < 2 or monster.drops_upgrade:
-                        upgrade_popup.active = True
-                        upgrade_popup.popup_count += 1  # 增加弹出计数
-                        upgrade_popup.randomize_upgrades()  # 每次激活时随机选择新的升级选项
-                    
-                    killed_monsters += 1
-                    monster.kill()
+        # 一次查询出范围内的所有怪物（平方距离比较），统一造成伤害
+        for monster in monsters.query_radius(self.rect.center, self.radius):
+            if monster.take_damage(self.damage, SWORD_RAIN):
+                kill_monster(monster, SWORD_RAIN)
+
+# 同类怪物共享一张图像
+monster_images = {}
+
+def monster_image(size, color):
+    image = monster_images.get((size, color))
+    if image is None:
+        image = pygame.Surface(size)
+        image.fill(color)
+        monster_images[(size, color)] = image
+    return image
 
 # Monster class
+# 各类型怪物的大小
+MONSTER_SIZES = {
+    0: (40, 40),  # Basic monster
+    1: (30, 30),  # Fast monster
+    2: (50, 50),  # Tank monster
+}
+
 class Monster(pygame.sprite.Sprite):
-    def __init__(self, monster_type):
+    def __init__(self, monster_type, x=None, y=None):
         super().__init__()
+        self.generation = 0
+        self.reset(monster_type, x, y)
+    
+    def reset(self, monster_type, x=None, y=None):
+        """（重新）初始化怪物，对象池复用时调用；没有给出位置时随机选择"""
         self.monster_type = monster_type
+        # 每次复用代数加一，持有旧引用的对象可以据此判断目标已经换了
+        self.generation += 1
         
-        # Different monster types
-        if monster_type == 0:  # Basic monster
-            self.image = pygame.Surface((40, 40))
-            self.image.fill(RED)
-            self.max_health = 40
-            self.health = self.max_health
-            self.speed = 0.5
-            self.damage = 5
-        elif monster_type == 1:  # Fast monster
-            self.image = pygame.Surface((30, 30))
-            self.image.fill(GREEN)
-            self.max_health = 30
-            self.health = self.max_health
-            self.speed = 0.8
-            self.damage = 3
-        elif monster_type == 2:  # Tank monster
-            self.image = pygame.Surface((50, 50))
-            self.image.fill(BLUE)
-            self.max_health = 80
-            self.health = self.max_health
-            self.speed = 0.3
-            self.damage = 10
+        # Different monster types（属性见MONSTER_STATS）
+        stats = MONSTER_STATS[monster_type]
+        self.image = monster_image(MONSTER_SIZES[monster_type], stats["color"])
+        self.max_health = stats["max_health"]
+        self.health = self.max_health
+        self.speed = stats["speed"]
+        self.damage = stats["damage"]
         
         self.rect = self.image.get_rect()
         # Random x position in wormhole area
-        self.rect.x = random.randint(0, SCREEN_WIDTH - self.rect.width)
-        self.rect.y = random.randint(-50, int(WORMHOLE_HEIGHT) - self.rect.height)
+        self.rect.x = game_rng.randint(0, SCREEN_WIDTH - self.rect.width) if x is None else x
+        self.rect.y = game_rng.randint(-50, int(WORMHOLE_HEIGHT) - self.rect.height) if y is None else y
         
         # For smooth movement
         self.y_float = float(self.rect.y)
@@ -472,38 +708,32 @@ class Monster(pygame.sprite.Sprite):
         # Flag to check if monster is attacking
         self.attacking = False
         
-        # 受伤显示相关属性
-        self.damage_indicators = []  # 存储受伤显示信息
         self.last_health = self.health  # 记录上一帧的生命值
         
-    def take_damage(self, damage):
-        """处理受伤逻辑，返回是否死亡"""
+    def kill(self):
+        super().kill()
+        damage_ledger.forget(self)
+        monster_pool.release(self)
+    
+    def take_damage(self, damage, source):
+        """处理受伤逻辑（source为伤害来源的剑类型），返回是否死亡"""
         self.last_health = self.health
         self.health -= damage
+        game_events.hit(self, source, damage, self.health)
         
-        # 添加受伤显示
-        self.damage_indicators.append({
-            "damage": damage,
-            "time": pygame.time.get_ticks(),
-            "alpha": 255,
-            "y_offset": 0  # 用于上浮效果
-        })
+        # 添加受伤显示（怪物上方，随时间向上漂浮）
+        floating_text.add(self, self.rect.centerx, self.rect.y - 15, damage, game_clock.get_ticks())
         
         return self.health <= 0
         
     def update(self):
-        global armor
-        current_time = pygame.time.get_ticks()
-        
         # If monster is attacking, reduce armor
         if self.attacking:
-            armor -= self.damage * 0.02  # Adjust the rate of damage as needed
-            armor = float("{:.2f}".format(armor))
-            if armor < 0:
-                armor = 0
+            damage_armor(self.damage)
             return
         
         # Move monster down
+        old_y = self.rect.y
         self.y_float += self.speed
         self.rect.y = int(self.y_float)
         
@@ -513,20 +743,17 @@ class Monster(pygame.sprite.Sprite):
             # Stop the monster exactly at the defense line
             self.rect.bottom = SCREEN_HEIGHT - DEFENSE_HEIGHT
             self.y_float = float(self.rect.y)
-            
-        # 更新受伤显示
-        for indicator in self.damage_indicators[:]:
-            # 计算存在时间（毫秒）
-            time_diff = current_time - indicator["time"]
-            if time_diff > 500:  # 0.5秒后移除
-                self.damage_indicators.remove(indicator)
-            else:
-                # 更新透明度和位置
-                indicator["alpha"] = 255 * (1 - time_diff / 500)  # 从255渐变到0
-                indicator["y_offset"] = -20 * (time_diff / 500)  # 向上飘动效果
+        
+        # 更新空间网格和目标索引
+        if self.rect.y != old_y:
+            monsters.move(self, old_y)
+    
+    def health_bar_area(self):
+        """血条覆盖的屏幕区域"""
+        return pygame.Rect(self.rect.x, self.rect.y - 7, self.rect.width, 5)
     
     def draw_health_bar(self, surface):
-        """绘制血量条和受伤显示"""
+        """绘制血量条"""
         # 健康条宽度和高度
         bar_width = self.rect.width
         bar_height = 5
@@ -551,25 +778,317 @@ class Monster(pygame.sprite.Sprite):
             bar_color = (255, 0, 0)  # 红色
             
         pygame.draw.rect(surface, bar_color, (bar_x, bar_y, health_bar_width, bar_height))
-        
-        # 绘制受伤显示
-        font = pygame.font.Font(None, 20)
-        for indicator in self.damage_indicators:
-            # 创建带透明度的文本
-            damage_text = font.render(f"-{indicator['damage']}", True, (255, 50, 50))
-            damage_text_surface = pygame.Surface(damage_text.get_size(), pygame.SRCALPHA)
-            damage_text_surface.fill((255, 255, 255, 0))  # 完全透明的背景
-            damage_text_surface.blit(damage_text, (0, 0))
-            
-            # 应用透明度
-            damage_text_surface.set_alpha(int(indicator["alpha"]))
-            
-            # 计算位置（怪物上方，随时间向上漂浮）
-            text_x = self.rect.centerx - damage_text.get_width() // 2
-            text_y = self.rect.y - 15 + indicator["y_offset"]
-            
-            # 绘制
-            surface.blit(damage_text_surface, (text_x, text_y))
+
+# Array-backed entities
+class StoredMonster(Monster):
+    """数组后端的怪物：位置、速度、生命值等保存在EntityStore中，移动由EntityStore.step统一完成"""
+    health = StoredField("health")
+    speed = StoredField("speed")
+    damage = StoredField("damage", int)
+    y_float = StoredField("y")
+    attacking = StoredField("attacking", bool)
+    rect = StoredRect()
+    stepped = True   # 由EntityStore.step推进，all_sprites.update()跳过
+    
+    def __init__(self, monster_type, x=None, y=None):
+        self.slot = None
+        super().__init__(monster_type, x, y)
+    
+    def reset(self, monster_type, x=None, y=None):
+        super().reset(monster_type, x, y)
+        entity_store.add(self, MONSTER, x=self.rect.x, y=self.y_float,
+                         width=self.rect.width, height=self.rect.height,
+                         rect_x=self.rect.x, rect_y=self.rect.y,
+                         speed=self.speed, health=self.health, damage=self.damage)
+    
+    def update(self):
+        pass
+    
+    def kill(self):
+        super().kill()
+        self.store.remove(self, (StoredMonster.health, StoredMonster.speed, StoredMonster.damage,
+                                 StoredMonster.y_float, StoredMonster.attacking))
+
+class StoredSword(Sword):
+    """数组后端的飞剑：移动和飞出屏幕检测由EntityStore.step统一完成"""
+    damage = StoredField("damage", int)
+    stepped = True
+    
+    def __init__(self, x, y, sword_type, damage, damage_range, angle):
+        self.slot = None
+        super().__init__(x, y, sword_type, damage, damage_range, angle)
+    
+    def reset(self, x, y, sword_type, damage, damage_range, angle):
+        super().reset(x, y, sword_type, damage, damage_range, angle)
+        entity_store.add(self, SWORD, x=self.rect.x, y=self.rect.y,
+                         vx=self.speed * math.cos(self.angle_rad),
+                         vy=-self.speed * math.sin(self.angle_rad),
+                         width=self.rect.width, height=self.rect.height,
+                         rect_x=self.rect.x, rect_y=self.rect.y,
+                         speed=self.speed, damage=self.damage)
+    
+    def update(self):
+        pass
+    
+    def kill(self):
+        super().kill()
+        self.store.remove(self, (StoredSword.damage,))
+
+# Volley class
+class Volley(pygame.sprite.Sprite):
+    """一次齐射：一个精灵用数组保存这次发射的所有飞剑（刀片），整体移动，命中批量检测
+
+    每把刀片的移动、取整和飞出屏幕的判断都与单独的Sword相同，所以命中和伤害结果不变。
+    齐射不在all_sprites中，由swords组更新，刀片用图集中的图像绘制。
+    """
+    # blades数组每行一把刀片，各列为：矩形 (x, y, 宽, 高)、每tick位移、上一tick的位置（插值用）
+    # 和刀片在齐射中的序号
+    RECT = slice(0, 4)
+    POSITION = slice(0, 2)
+    MOVE = slice(4, 6)
+    PREVIOUS = slice(6, 8)
+    BLADE = 8
+
+    def __init__(self, x, y, sword_type, damage, damage_range, angles):
+        super().__init__()
+        self.reset(x, y, sword_type, damage, damage_range, angles)
+
+    def reset(self, x, y, sword_type, damage, damage_range, angles):
+        """（重新）初始化齐射，(x, y)为发射点，angles为每把刀片的角度"""
+        self.sword_type = sword_type
+        self.damage = damage
+        self.damage_range = damage_range
+        self.speed = 50
+        self.angles = list(angles)
+        self.images = [sword_atlas.get(sword_type, angle) for angle in self.angles]
+        blades = np.empty((len(self.angles), 9))
+        for i, (angle, image) in enumerate(zip(self.angles, self.images)):
+            width, height = image.get_size()
+            angle_rad = math.radians(angle)
+            left = x - width // 2
+            top = y - height // 2
+            blades[i] = (left, top, width, height, self.speed * math.cos(angle_rad),
+                         -(self.speed * math.sin(angle_rad)), left, top, i)
+        self.blades = blades
+
+    def update(self):
+        update_volleys([self])
+
+    def remove_blades(self, rows):
+        """移除命中或飞出屏幕的刀片（rows为blades的行号），没有刀片时齐射消失"""
+        if damage_ledger:
+            for blade in self.blades[rows, self.BLADE].tolist():
+                damage_ledger.release((self, int(blade)))
+        keep = np.ones(len(self.blades), bool)
+        keep[rows] = False
+        self.blades = self.blades[keep]
+        self.images = [image for image, kept in zip(self.images, keep.tolist()) if kept]
+        self.angles = [angle for angle, kept in zip(self.angles, keep.tolist()) if kept]
+        if not len(self.blades):
+            self.kill()
+
+    def remember_positions(self):
+        self.blades[:, self.PREVIOUS] = self.blades[:, self.POSITION]
+
+    def positions(self, alpha=None):
+        """刀片的绘制位置；alpha不为None时在上一tick和当前tick之间插值"""
+        current = self.blades[:, self.POSITION]
+        if alpha is None:
+            return current.astype(int).tolist()
+        previous = self.blades[:, self.PREVIOUS]
+        return np.round(previous + (current - previous) * alpha).astype(int).tolist()
+
+    def blits(self, alpha=None):
+        """(图像, 位置) 列表，供surface.blits使用"""
+        return list(zip(self.images, self.positions(alpha)))
+
+    def kill(self):
+        super().kill()
+        sword_pool.release(self)
+
+# Sprite groups
+class SpriteGroup(pygame.sprite.Group):
+    """全部精灵的组：数组后端的怪物和飞剑由EntityStore.step统一推进，update()不逐个调用它们"""
+    def __init__(self, *sprites):
+        self.updated = {}   # 需要逐个update()的精灵（dict保持加入顺序）
+        super().__init__(*sprites)
+    
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite)
+        if not getattr(sprite, "stepped", False):
+            self.updated[sprite] = None
+    
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        self.updated.pop(sprite, None)
+    
+    def update(self, *args, **kwargs):
+        # 与pygame.sprite.Group.update相同，先复制一份：update中精灵可能被删除
+        for sprite in list(self.updated):
+            sprite.update(*args, **kwargs)
+
+# Monster group
+class MonsterGroup(pygame.sprite.Group):
+    """怪物精灵组：额外维护攻防区的空间网格索引和目标选择索引"""
+    def __init__(self, *sprites):
+        self.grid = SpatialHash((0, 0, SCREEN_WIDTH, SCREEN_HEIGHT - DEFENSE_HEIGHT), GRID_CELL_SIZE)
+        self.targets = TargetIndex(SCREEN_HEIGHT - DEFENSE_HEIGHT - ATTACK_HEIGHT,
+                                   SCREEN_HEIGHT - DEFENSE_HEIGHT)
+        super().__init__(*sprites)
+    
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite)
+        self.grid.insert(sprite, sprite.rect)
+        self.targets.insert(sprite)
+    
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        self.grid.remove(sprite)
+        self.targets.remove(sprite)
+    
+    def move(self, sprite, old_top):
+        """怪物从old_top下移（或开始攻击）后更新索引：只处理可能换了网格行或目标桶的情况"""
+        rect = sprite.rect
+        if self.grid.rows_changed(old_top, rect.y, rect.height):
+            self.grid.update(sprite, rect)
+        if self.targets.bands_changed(old_top + rect.height, rect.bottom):
+            self.targets.update(sprite)
+    
+    def move_many(self, sprites, old_tops, new_tops, heights):
+        """数组后端的怪物整批下移后更新索引：只处理可能换了网格行或目标桶的怪物"""
+        if len(sprites) < MOVE_BATCH_SIZE:
+            for sprite, old_top in zip(sprites, old_tops.tolist()):
+                self.move(sprite, old_top)
+            return
+        update = self.grid.update
+        for i in self.grid.rows_changed(old_tops, new_tops, heights).nonzero()[0].tolist():
+            update(sprites[i], sprites[i].rect)
+        rebucket = self.targets.update
+        for i in self.targets.bands_changed(old_tops + heights, new_tops + heights).nonzero()[0].tolist():
+            rebucket(sprites[i])
+    
+    def spritecollide(self, sprite):
+        """与pygame.sprite.spritecollide(sprite, self, False)结果相同（包括顺序）"""
+        colliderect = sprite.rect.colliderect
+        return [monster for monster in self.grid.query(sprite.rect) if colliderect(monster.rect)]
+
+    def sweepcollide(self, swords):
+        """连续碰撞检测：返回 [(飞剑, 怪物列表)]，怪物是飞剑本tick从上一位置移动到当前位置的路径上
+        碰到的怪物，按碰到的先后排列（同时碰到的按加入顺序）"""
+        swords = list(swords)
+        if not swords or not self.grid.entries:
+            return []
+        if len(swords) >= SWEEP_BATCH_SIZE:
+            rects = np.array([(sword.rect.x, sword.rect.y, sword.rect.width, sword.rect.height)
+                              for sword in swords], np.float64)
+            # 与Sword.update相同的位移
+            moves = np.array([(sword.speed * math.cos(sword.angle_rad), -(sword.speed * math.sin(sword.angle_rad)))
+                              for sword in swords])
+            return [(swords[i], hit) for i, hit in self.boxcollide(rects, moves)]
+        
+        # 飞剑不多时逐把计算：大多数飞剑的路径包围盒里没有怪物，构造数组的固定开销比计算本身还大
+        query = self.grid.query
+        result = []
+        for sword in swords:
+            x, y, width, height = sword.rect
+            half_size = (width / 2, height / 2)
+            move = (sword.speed * math.cos(sword.angle_rad), -(sword.speed * math.sin(sword.angle_rad)))
+            end_x = x + half_size[0]
+            end_y = y + half_size[1]
+            start = (end_x - move[0], end_y - move[1])
+            x0 = math.floor(min(start[0], end_x) - half_size[0])
+            y0 = math.floor(min(start[1], end_y) - half_size[1])
+            x1 = math.ceil(max(start[0], end_x) + half_size[0])
+            y1 = math.ceil(max(start[1], end_y) + half_size[1])
+            path = pygame.Rect(x0, y0, x1 - x0, y1 - y0)
+            found = query(path)
+            if not found:
+                continue
+            # 先用C实现的矩形相交排除离路径包围盒太远的候选；扩大1像素，贴着边界的候选仍交给
+            # entry_time判断（浮点误差下可能算作碰到），结果与批量计算完全相同
+            hits = []
+            for order in path.inflate(2, 2).collidelistall([monster.rect for monster in found]):
+                monster = found[order]
+                entered = entry_time(start, move, half_size, monster.rect)
+                if entered <= 1:
+                    hits.append((entered, order, monster))
+            if hits:
+                hits.sort(key=lambda hit: hit[:2])
+                result.append((sword, [monster for _, _, monster in hits]))
+        return result
+
+    def boxcollide(self, rects, moves, groups=None):
+        """批量检测移动的矩形：rects为 (N, 4) 的 (x, y, 宽, 高)，moves为 (N, 2) 的本tick位移
+
+        返回 [(矩形序号, 怪物列表)]，怪物是矩形从rects - moves移动到rects的路径上碰到的，
+        按碰到的先后排列（同时碰到的按加入顺序）。moves全为0时与逐个spritecollide的结果相同。
+        groups为相邻矩形的分组大小（和为N），同组的矩形只查询一次网格（用整组路径的包围盒），
+        如一次齐射的所有刀片；组内每个矩形再用自己路径的包围盒筛掉不相交的候选。
+        分组只影响查询次数，不影响结果。
+        """
+        if not len(rects) or not self.grid.entries:
+            return []
+        half_sizes = rects[:, 2:] / 2
+        ends = rects[:, :2] + half_sizes
+        starts = ends - moves
+        # 每个矩形路径的包围盒，和每组的包围盒
+        low = np.minimum(starts, ends) - half_sizes
+        high = np.maximum(starts, ends) + half_sizes
+        if groups is None:
+            groups = [1] * len(rects)
+        first_rows = np.cumsum([0] + list(groups[:-1]))
+        group_low = np.floor(np.minimum.reduceat(low, first_rows)).astype(int).tolist()
+        group_high = np.ceil(np.maximum.reduceat(high, first_rows)).astype(int).tolist()
+        query = self.grid.query
+        index = {}   # 怪物 -> 候选序号：同一只怪物在几组中出现时只取一次矩形
+        pair_boxes = []
+        pair_candidates = []
+        first = 0
+        for size, (x0, y0), (x1, y1) in zip(groups, group_low, group_high):
+            found = query((x0, y0, x1 - x0, y1 - y0))
+            if found:
+                # 组内每个矩形和该组的每个候选配对（按加入顺序）
+                found = [index.setdefault(monster, len(index)) for monster in found]
+                for box in range(first, first + size):
+                    pair_boxes += [box] * len(found)
+                pair_candidates += found * size
+            first += size
+        if not index:
+            return []
+        candidates = list(index)
+        pair_boxes = np.array(pair_boxes)
+        pair_candidates = np.array(pair_candidates)
+        boxes = np.array([(monster.rect.x, monster.rect.y, monster.rect.width, monster.rect.height)
+                          for monster in candidates], np.float64)
+        # 先排除路径包围盒与怪物不相交的配对（留1像素余量，不影响结果），再精确计算进入时间
+        box_low = boxes[:, :2][pair_candidates]
+        box_high = box_low + boxes[:, 2:][pair_candidates]
+        near = ((low[pair_boxes] <= box_high + 1) & (box_low <= high[pair_boxes] + 1)).all(axis=1)
+        pair_boxes = pair_boxes[near]
+        pair_candidates = pair_candidates[near]
+        times = entry_times(starts[pair_boxes], moves[pair_boxes], half_sizes[pair_boxes], boxes[pair_candidates])
+        hit = np.flatnonzero(times <= 1)
+        # 同一个矩形的候选按加入顺序排列，所以按 (矩形, 时间, 配对位置) 排序
+        hit = hit[np.lexsort((hit, times[hit], pair_boxes[hit]))]
+        result = []
+        last = -1
+        for box, candidate in zip(pair_boxes[hit].tolist(), pair_candidates[hit].tolist()):
+            if box != last:
+                result.append((box, []))
+                last = box
+            result[-1][1].append(candidates[candidate])
+        return result
+
+    def query_radius(self, center, radius):
+        """返回中心点与center距离不超过radius的怪物（按加入顺序），用平方距离向量化比较"""
+        cx, cy = center
+        box = pygame.Rect(cx - radius, cy - radius, radius * 2 + 1, radius * 2 + 1)
+        candidates = self.grid.query(box)
+        if not candidates:
+            return []
+        offsets = np.array([monster.rect.center for monster in candidates]) - (cx, cy)
+        inside = np.flatnonzero((offsets * offsets).sum(axis=1) <= radius * radius)
+        return [candidates[i] for i in inside.tolist()]
 
 # Upgrade popup class
 class UpgradePopup:
@@ -606,6 +1125,9 @@ class UpgradePopup:
         # 当前显示的升级选项
         self.current_upgrades = []
         
+        # 升级顾问推荐的选项文字（None表示还没有推荐）
+        self.recommended = None
+        
         # 刷新按钮
         self.refresh_button = {
             "rect": pygame.Rect(self.rect.centerx - button_width // 2, 
@@ -614,7 +1136,11 @@ class UpgradePopup:
             "text": "Refresh Options"
         }
         
-        self.font = pygame.font.Font(None, 28)
+        self.font = fonts.get(28)
+        
+        # 缓存的弹窗图像，选项或满级状态变化时才重绘
+        self.image = pygame.Surface(self.rect.size)
+        self.image_signature = None
         
         # 初始化随机选项
         self.randomize_upgrades()
@@ -652,18 +1178,19 @@ class UpgradePopup:
         """随机选择3个升级选项"""
         # 更新已解锁剑类型的升级选项
         self.update_unlocked_upgrades()
+        self.recommended = None
         
         # 获取所有可用的升级选项
         available_upgrades = []
         
         # 添加普通剑的升级选项
         for upgrade in self.all_upgrades:
-            if player.sword_attributes[upgrade["sword_type"]]["upgrades"] < 10:
+            if player.sword_attributes[upgrade["sword_type"]].upgrades < 10:
                 available_upgrades.append(upgrade)
         
         # 添加已解锁剑类型的升级选项
         for upgrade in self.unlocked_upgrades:
-            if player.sword_attributes[upgrade["sword_type"]]["upgrades"] < 10:
+            if player.sword_attributes[upgrade["sword_type"]].upgrades < 10:
                 available_upgrades.append(upgrade)
         
         # 添加可解锁的新剑类型选项
@@ -679,7 +1206,7 @@ class UpgradePopup:
         
         # 随机选择3个或更少的升级选项
         num_options = min(3, len(available_upgrades))
-        selected_upgrades = random.sample(available_upgrades, num_options)
+        selected_upgrades = game_rng.sample(available_upgrades, num_options)
         
         # 设置按钮位置
         button_width = 180
@@ -707,44 +1234,69 @@ class UpgradePopup:
             return True
         return False
     
-    def draw(self, surface):
-        if not self.active:
-            return
-            
+    def signature(self):
+        """当前按钮文字和满级状态，变化时需要重绘弹窗"""
+        return tuple((button["text"], player.sword_attributes[button["sword_type"]].upgrades >= 10,
+                      button["text"] == self.recommended)
+                     for button in self.current_upgrades)
+    
+    def render(self):
+        """返回缓存的弹窗图像，需要时重绘"""
+        signature = self.signature()
+        if signature != self.image_signature:
+            self.image_signature = signature
+            self.redraw()
+        return self.image
+    
+    def redraw(self):
+        surface = self.image
+        offset = (-self.rect.x, -self.rect.y)
+        local_rect = surface.get_rect()
+        
         # Draw popup background
-        pygame.draw.rect(surface, (50, 50, 50), self.rect)
-        pygame.draw.rect(surface, WHITE, self.rect, 2)
+        pygame.draw.rect(surface, (50, 50, 50), local_rect)
+        pygame.draw.rect(surface, WHITE, local_rect, 2)
         
         # Draw title
-        title = self.font.render("Choose Upgrade", True, WHITE)
-        surface.blit(title, (self.rect.centerx - title.get_width() // 2, self.rect.y + 10))
+        title = text_cache.render(self.font, "Choose Upgrade", WHITE)
+        surface.blit(title, (local_rect.centerx - title.get_width() // 2, 10))
         
         # Draw upgrade buttons
         for button in self.current_upgrades:
             # 检查是否达到升级上限
             sword_type = button["sword_type"]
-            is_maxed = player.sword_attributes[sword_type]["upgrades"] >= 10
+            is_maxed = player.sword_attributes[sword_type].upgrades >= 10
+            button_rect = button["rect"].move(offset)
             
             # 设置按钮颜色
             button_color = (100, 100, 100, 128) if is_maxed else (100, 100, 100)
-            pygame.draw.rect(surface, button_color, button["rect"])
-            pygame.draw.rect(surface, WHITE, button["rect"], 2)
+            pygame.draw.rect(surface, button_color, button_rect)
+            if button["text"] == self.recommended:
+                pygame.draw.rect(surface, GOLD, button_rect, 3)
+            else:
+                pygame.draw.rect(surface, WHITE, button_rect, 2)
             
             # 设置文本颜色
             text_color = (150, 150, 150) if is_maxed else WHITE
-            text = self.font.render(button["text"], True, text_color)
-            text_pos = (button["rect"].centerx - text.get_width() // 2, 
-                        button["rect"].centery - text.get_height() // 2)
+            text = text_cache.render(self.font, button["text"], text_color)
+            text_pos = (button_rect.centerx - text.get_width() // 2, 
+                        button_rect.centery - text.get_height() // 2)
             surface.blit(text, text_pos)
         
         # Draw refresh button
-        pygame.draw.rect(surface, (80, 80, 120), self.refresh_button["rect"])
-        pygame.draw.rect(surface, WHITE, self.refresh_button["rect"], 2)
-        refresh_text = self.font.render(self.refresh_button["text"], True, WHITE)
-        refresh_pos = (self.refresh_button["rect"].centerx - refresh_text.get_width() // 2, 
-                      self.refresh_button["rect"].centery - refresh_text.get_height() // 2)
+        refresh_rect = self.refresh_button["rect"].move(offset)
+        pygame.draw.rect(surface, (80, 80, 120), refresh_rect)
+        pygame.draw.rect(surface, WHITE, refresh_rect, 2)
+        refresh_text = text_cache.render(self.font, self.refresh_button["text"], WHITE)
+        refresh_pos = (refresh_rect.centerx - refresh_text.get_width() // 2, 
+                      refresh_rect.centery - refresh_text.get_height() // 2)
         surface.blit(refresh_text, refresh_pos)
     
+    def draw(self, surface):
+        if not self.active:
+            return
+        surface.blit(self.render(), self.rect)
+    
     def handle_click(self, pos, player):
         if not self.active:
             return False
@@ -761,7 +1313,7 @@ class UpgradePopup:
                 sword_type = button["sword_type"]
                 
                 # 检查是否达到升级上限
-                if player.sword_attributes[sword_type]["upgrades"] >= 10:
+                if player.sword_attributes[sword_type].upgrades >= 10:
                     print(f"Cannot upgrade further - max level reached")
                     return True
                 
@@ -773,254 +1325,452 @@ class UpgradePopup:
     
     def add_sword(self, sword_type):
         global player
-        attrs = player.sword_attributes[sword_type]
-        attrs["count"] += 1
-        attrs["upgrades"] += 1
-        print(f"Added sword - type: {sword_type}, count: {attrs['count']}, upgrades: {attrs['upgrades']}/10")
+        stats = player.sword_attributes[sword_type]
+        stats.count += 1
+        stats.upgrades += 1
+        print(f"Added sword - type: {sword_type}, count: {stats.count}, upgrades: {stats.upgrades}/10")
     
     def increase_fire_rate(self, sword_type):
         global player
-        attrs = player.sword_attributes[sword_type]
-        attrs["fire_rate"] *= 1.2
-        attrs["upgrades"] += 1
-        print(f"Increased fire rate - type: {sword_type}, rate: {attrs['fire_rate']:.2f}, upgrades: {attrs['upgrades']}/10")
+        stats = player.sword_attributes[sword_type]
+        stats.fire_rate *= SWORD_FIRE_RATE_UPGRADE
+        stats.refresh()
+        stats.upgrades += 1
+        print(f"Increased fire rate - type: {sword_type}, rate: {stats.fire_rate:.2f}, upgrades: {stats.upgrades}/10")
     
     def increase_damage(self, sword_type):
         global player
-        attrs = player.sword_attributes[sword_type]
-        attrs["damage"] += 5
-        attrs["upgrades"] += 1
-        print(f"Increased damage - type: {sword_type}, damage: {attrs['damage']}, upgrades: {attrs['upgrades']}/10")
+        stats = player.sword_attributes[sword_type]
+        stats.damage += SWORD_DAMAGE_UPGRADE
+        stats.upgrades += 1
+        print(f"Increased damage - type: {sword_type}, damage: {stats.damage}, upgrades: {stats.upgrades}/10")
     
     def upgrade_sword_rain_damage(self):
         global player
-        attrs = player.sword_attributes[SWORD_RAIN]
-        attrs["damage"] += 2
-        attrs["upgrades"] += 1
-        print(f"Increased sword rain damage - damage: {attrs['damage']}, upgrades: {attrs['upgrades']}/10")
+        stats = player.sword_attributes[SWORD_RAIN]
+        stats.damage += 2
+        stats.upgrades += 1
+        print(f"Increased sword rain damage - damage: {stats.damage}, upgrades: {stats.upgrades}/10")
     
     def upgrade_sword_rain_radius(self):
         global player
-        attrs = player.sword_attributes[SWORD_RAIN]
-        attrs["radius"] += 10
-        attrs["upgrades"] += 1
-        print(f"Increased sword rain radius - radius: {attrs['radius']}, upgrades: {attrs['upgrades']}/10")
+        stats = player.sword_attributes[SWORD_RAIN]
+        stats.radius += 10
+        stats.upgrades += 1
+        print(f"Increased sword rain radius - radius: {stats.radius}, upgrades: {stats.upgrades}/10")
     
     def upgrade_sword_rain_duration(self):
         global player
-        attrs = player.sword_attributes[SWORD_RAIN]
-        attrs["duration"] += 1000  # 增加1秒
-        attrs["upgrades"] += 1
-        print(f"Increased sword rain duration - duration: {attrs['duration']/1000}s, upgrades: {attrs['upgrades']}/10")
+        stats = player.sword_attributes[SWORD_RAIN]
+        stats.duration += 1000  # 增加1秒
+        stats.upgrades += 1
+        print(f"Increased sword rain duration - duration: {stats.duration/1000}s, upgrades: {stats.upgrades}/10")
     
     def upgrade_sword_rain_cooldown(self):
         global player
-        attrs = player.sword_attributes[SWORD_RAIN]
-        attrs["cooldown"] = max(5000, attrs["cooldown"] - 1000)  # 减少1秒，最低5秒
-        attrs["upgrades"] += 1
-        print(f"Decreased sword rain cooldown - cooldown: {attrs['cooldown']/1000}s, upgrades: {attrs['upgrades']}/10")
+        stats = player.sword_attributes[SWORD_RAIN]
+        stats.cooldown = max(5000, stats.cooldown - 1000)  # 减少1秒，最低5秒
+        stats.refresh()
+        stats.upgrades += 1
+        print(f"Decreased sword rain cooldown - cooldown: {stats.cooldown/1000}s, upgrades: {stats.upgrades}/10")
     
     def unlock_sword_rain(self):
         """解锁剑雨技能"""
         global player
-        attrs = player.sword_attributes[SWORD_RAIN]
-        attrs["upgrades"] += 1
-        print(f"Unlocked Sword Rain! Initial damage: {attrs['damage']}")
+        stats = player.sword_attributes[SWORD_RAIN]
+        stats.upgrades += 1
+        print(f"Unlocked Sword Rain! Initial damage: {stats.damage}")
         
         # 解锁后自动触发一次剑雨效果
-        current_time = pygame.time.get_ticks()
+        current_time = game_clock.get_ticks()
         player.auto_use_sword_rain(current_time, all_sprites)
 
 # Game functions
-def spawn_monster(all_sprites, monsters):
-    # Determine monster type based on probabilities
-    monster_type = random.choices([0, 1, 2], weights=[0.6, 0.3, 0.1])[0]
+def make_monster(monster_type, x=None, y=None):
+    """按当前实体后端创建怪物"""
+    if entity_store is not None:
+        return StoredMonster(monster_type, x, y)
+    return Monster(monster_type, x, y)
+
+def make_sword(x, y, sword_type, damage, damage_range, angle):
+    """按当前实体后端创建飞剑"""
+    if entity_store is not None:
+        return StoredSword(x, y, sword_type, damage, damage_range, angle)
+    return Sword(x, y, sword_type, damage, damage_range, angle)
+
+def hit_damage(sword_type, damage):
+    """飞剑命中时造成的伤害：火焰剑额外伤害"""
+    if sword_type == FIRE_SWORD:
+        return damage + 5
+    return damage
+
+def damage_armor(damage):
+    """攻击防线的怪物每帧消耗护甲"""
+    global armor
+    armor -= damage * 0.02  # Adjust the rate of damage as needed
+    armor = float("{:.2f}".format(armor))
+    if armor < 0:
+        armor = 0
+
+def update_entity_store():
+    """数组后端：一次向量化步进所有怪物和飞剑"""
+    drains, culled = entity_store.step(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_HEIGHT - DEFENSE_HEIGHT,
+                                       on_moved=monsters.move_many)
+    for damage in drains:
+        damage_armor(damage)
+    for sword in culled:
+        sword.kill()
+
+# 刷怪波次：classic与原来每600ms按0.6/0.3/0.1的概率刷一只怪物相同
+WAVES = {
+    "classic": WaveConfig(),
+    # 刷怪越来越快，并在固定时间出现爆发波次
+    "rush": WaveConfig(intervals=((0, 600), (120000, 400), (300000, 250)),
+                       bursts=((60000, 8, (0.2, 0.6, 0.2)),
+                               (180000, 12, (0.3, 0.3, 0.4)),
+                               (300000, 16, (0.2, 0.3, 0.5)))),
+}
+
+def create_wave_scheduler(seed):
+    """按WAVE_PRESET创建刷怪时间表，从当前时刻开始计时"""
+    config = WAVES[WAVE_PRESET]
+    if SPAWN_INTERVAL_SCALE != 1.0:
+        config = config.scaled(SPAWN_INTERVAL_SCALE)
+    return WaveScheduler(config, seed, MONSTER_SIZES,
+                         SCREEN_WIDTH, -50, int(WORMHOLE_HEIGHT),
+                         start_time=game_clock.get_ticks(), on_batch=reserve_wave)
+
+def reserve_wave(count):
+    """新一批怪物生成时预先扩大实体存储"""
+    if entity_store is not None:
+        entity_store.reserve(len(entity_store) + count)
+
+def spawn_monster(all_sprites, monsters, entry):
+    monster_time, monster_type, x, y, drop_roll = entry
     
     # Create monster
-    new_monster = Monster(monster_type)
+    new_monster = monster_pool.acquire(monster_type, x, y)
     
     # 确保前两只怪物必然掉落升级
     global killed_monsters
     if killed_monsters < 2:
         new_monster.drops_upgrade = True
-    # 其他怪物正常概率掉落
-    elif killed_monsters < 2000 and random.random() < 0.015:  # 1.5% chance for first 2000
+    # 其他怪物正常概率掉落（默认前2000只有1.5%的概率）
+    elif killed_monsters < UPGRADE_DROP_KILL_LIMIT and drop_roll < UPGRADE_DROP_CHANCE:
         new_monster.drops_upgrade = True
     
     all_sprites.add(new_monster)
     monsters.add(new_monster)
 
-def check_collisions(swords, monsters, upgrade_popup):
+def kill_monster(monster, source):
+    """怪物被击杀：立即从游戏中移除（本tick之后的命中会跳过它），计分等在tick结束时结算"""
+    game_events.kill(monster, source, monster.attacking, monster.drops_upgrade)
+    monster.kill()
+
+def award_kills(damage, kills):
+    """事件监听者：按击杀顺序为一批击杀计分和计数；有升级掉落时只弹出一次升级窗口"""
     global score, killed_monsters
     
-    # Check sword-monster collisions
-    for sword in swords:
-        monsters_hit = pygame.sprite.spritecollide(sword, monsters, False)
+    drops = False
+    for monster, source, attacking, drops_upgrade in kills:
+        score += 10
+        
+        # 如果是正在攻击的怪物被击杀，给予额外分数
+        if attacking:
+            score += 5
+        
+        # 前两只怪物被击杀时必然弹出升级窗口
+        if killed_monsters < 2 or drops_upgrade:
+            drops = True
+        
+        killed_monsters += 1
+    
+    if drops:
+        upgrade_popup.active = True
+        upgrade_popup.popup_count += 1  # 增加弹出计数
+        upgrade_popup.randomize_upgrades()  # 每次激活时随机选择新的升级选项
+
+def update_volleys(volleys):
+    """所有齐射的刀片在一次向量化步进中移动（rect坐标每tick取整），移除飞出屏幕的刀片"""
+    volleys = list(volleys)
+    if not volleys:
+        return
+    sizes = [len(volley.blades) for volley in volleys]
+    blades = np.concatenate([volley.blades for volley in volleys])
+    positions = round_half_away(blades[:, Volley.POSITION] + blades[:, Volley.MOVE])
+    x = positions[:, 0]
+    y = positions[:, 1]
+    offscreen = (y + blades[:, 3] < 0) | (y > SCREEN_HEIGHT) | (x + blades[:, 2] < 0) | (x > SCREEN_WIDTH)
+    first_rows = np.cumsum([0] + sizes)
+    bounds = first_rows.tolist()
+    for volley, first, last in zip(volleys, bounds, bounds[1:]):
+        volley.blades[:, Volley.POSITION] = positions[first:last]
+    if offscreen.any():
+        rows = np.flatnonzero(offscreen)
+        owners = np.searchsorted(first_rows, rows, "right") - 1
+        culled = {}
+        for index, row in zip(owners.tolist(), (rows - first_rows[owners]).tolist()):
+            culled.setdefault(index, []).append(row)
+        for index, rows in culled.items():
+            volleys[index].remove_blades(rows)
+
+def volley_hits(volleys, monsters):
+    """齐射模式：所有齐射的刀片一起批量检测，返回 [(齐射, 刀片行号, 怪物列表)]，刀片按发射顺序排列"""
+    volleys = volleys.sprites()
+    if not volleys or not monsters.grid.entries:
+        return []
+    blades = np.concatenate([volley.blades for volley in volleys])
+    sizes = [len(volley.blades) for volley in volleys]
+    owners = np.repeat(np.arange(len(volleys)), sizes).tolist()
+    first_rows = np.cumsum([0] + sizes).tolist()
+    moves = blades[:, Volley.MOVE] if SWEPT_COLLISIONS else np.zeros((len(blades), 2))
+    # 每次齐射只用所有刀片路径的包围盒查询一次网格，刀片和候选的配对用NumPy一起检测
+    return [(volleys[owners[i]], i - first_rows[owners[i]], hit)
+            for i, hit in monsters.boxcollide(blades[:, Volley.RECT], moves, sizes)]
+
+def check_collisions(swords, monsters):
+    # Check sword-monster collisions（每把飞剑或刀片只命中一个怪物）
+    if volley_mode:
+        hits = volley_hits(swords, monsters)
+    elif SWEPT_COLLISIONS:
+        # 命中路径上最先碰到的怪物；候选是一次性算出的，跳过已被前面的飞剑击杀的怪物
+        hits = ((sword, None, monsters_hit) for sword, monsters_hit in monsters.sweepcollide(swords))
+    else:
+        hits = ((sword, None, monsters.spritecollide(sword)) for sword in swords)
+    spent_blades = {}
+    for sword, blade, monsters_hit in hits:
         for monster in monsters_hit:
-            # 使用新的take_damage方法
-            damage = sword.damage
-            
+            if not monster.alive():
+                continue
+
             # 特殊效果基于剑的类型
             if sword.sword_type == ICE_SWORD:
                 monster.speed *= 0.8  # 减速效果
             
             # 额外伤害
-            if sword.sword_type == FIRE_SWORD:
-                damage += 5  # 额外伤害
+            damage = hit_damage(sword.sword_type, sword.damage)
             
-            # 应用伤害
-            monster_killed = monster.take_damage(damage)
-            
-            # 检查怪物是否被击败
-            if monster_killed:
-                score += 10
-                
-                # 如果是正在攻击的怪物被击杀，给予额外分数
-                if monster.attacking:
-                    score += 5
-                
-                # 前两只怪物被击杀时必然弹出升级窗口
-                if killed_monsters < 2 or monster.drops_upgrade:
-                    upgrade_popup.active = True
-                    upgrade_popup.popup_count += 1  # 增加弹出计数
-                    upgrade_popup.randomize_upgrades()  # 每次激活时随机选择新的升级选项
-                
-                killed_monsters += 1
-                monster.kill()
+            # 应用伤害，检查怪物是否被击败
+            if monster.take_damage(damage, sword.sword_type):
+                kill_monster(monster, sword.sword_type)
             
-            # 移除剑（命中后消失）
-            sword.kill()
+            # 移除剑（命中后消失）；齐射的刀片在所有命中处理完后一起移除，行号不会变
+            if blade is None:
+                sword.kill()
+            else:
+                spent_blades.setdefault(sword, []).append(blade)
             break
+    for volley, rows in spent_blades.items():
+        volley.remove_blades(rows)
 
-def draw_game_areas(surface):
+# 背景主题：三个区域和防线的颜色，wormhole_art为虫洞区域的贴图文件名（位于pic目录）
+# 或"rings"（绘制同心圆虫洞）
+BACKGROUND_THEMES = {
+    "classic": {
+        "wormhole": (30, 30, 50),
+        "attack": (50, 50, 70),
+        "defense": (70, 70, 90),
+        "line": WHITE,
+        "wormhole_art": None,
+    },
+    "void": {
+        "wormhole": (10, 5, 25),
+        "attack": (25, 20, 45),
+        "defense": (45, 40, 65),
+        "line": (180, 180, 255),
+        "wormhole_art": "rings",
+    },
+}
+
+def paint_game_areas(surface, theme):
+    """按主题绘制三个游戏区域和防线（区域高度随surface高度缩放）"""
+    width, height = surface.get_size()
+    scale = height / SCREEN_HEIGHT
+    wormhole_height = WORMHOLE_HEIGHT * scale
+    attack_height = ATTACK_HEIGHT * scale
+    defense_height = DEFENSE_HEIGHT * scale
+    
     # Draw wormhole area
-    pygame.draw.rect(surface, (30, 30, 50), (0, 0, SCREEN_WIDTH, WORMHOLE_HEIGHT))
+    pygame.draw.rect(surface, theme["wormhole"], (0, 0, width, wormhole_height))
     
     # Draw attack area
-    pygame.draw.rect(surface, (50, 50, 70), 
-                    (0, WORMHOLE_HEIGHT, SCREEN_WIDTH, ATTACK_HEIGHT))
+    pygame.draw.rect(surface, theme["attack"], 
+                    (0, wormhole_height, width, attack_height))
     
     # Draw defense area
-    pygame.draw.rect(surface, (70, 70, 90), 
-                    (0, WORMHOLE_HEIGHT + ATTACK_HEIGHT, SCREEN_WIDTH, DEFENSE_HEIGHT))
+    pygame.draw.rect(surface, theme["defense"], 
+                    (0, wormhole_height + attack_height, width, defense_height))
     
     # Draw defense line
-    pygame.draw.line(surface, WHITE, 
-                    (0, SCREEN_HEIGHT - DEFENSE_HEIGHT), 
-                    (SCREEN_WIDTH, SCREEN_HEIGHT - DEFENSE_HEIGHT), 3)
+    pygame.draw.line(surface, theme["line"], 
+                    (0, height - defense_height), 
+                    (width, height - defense_height), 3)
+    
+    art = theme["wormhole_art"]
+    if art == "rings":
+        paint_wormhole_rings(surface, (0, 0, width, wormhole_height))
+    elif art:
+        try:
+            image = pygame.image.load(os.path.join(pic_dir, art))
+        except (pygame.error, OSError):
+            # 贴图缺失时只保留纯色区域
+            image = None
+        if image is not None:
+            surface.blit(pygame.transform.scale(image, (width, int(wormhole_height))), (0, 0))
 
-def draw_hud(surface):
-    font = pygame.font.Font(None, 30)
+def paint_wormhole_rings(surface, area):
+    """绘制虫洞：逐渐变亮的同心椭圆"""
+    area = pygame.Rect(area)
+    for i in range(8, 0, -1):
+        ring = area.inflate(-area.width * (8 - i) // 9, -area.height * (8 - i) // 9)
+        shade = 25 + (8 - i) * 18
+        pygame.draw.ellipse(surface, (shade // 2, shade // 3, shade), ring, 2)
+
+class BackgroundLayer:
+    """预先绘制的游戏区域背景层，只在分辨率或主题变化时重建"""
+    def __init__(self, theme=BACKGROUND_THEME):
+        self.theme = theme
+        self.surface = None
+        self.rebuilds = 0
+    
+    def set_theme(self, theme):
+        if theme != self.theme:
+            self.theme = theme
+            self.surface = None
     
+    def get(self, size=(SCREEN_WIDTH, SCREEN_HEIGHT)):
+        """返回指定大小的背景，需要时重建"""
+        if self.surface is None or self.surface.get_size() != tuple(size):
+            self.surface = self.build(size)
+            self.rebuilds += 1
+        return self.surface
+    
+    def build(self, size):
+        surface = pygame.Surface(size)
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        surface.fill(BLACK)
+        paint_game_areas(surface, BACKGROUND_THEMES[self.theme])
+        return surface
+
+background_layer = BackgroundLayer()
+
+def draw_game_areas(surface):
+    # 静态区域已预先绘制好，每帧只需一次blit
+    surface.blit(background_layer.get(surface.get_size()), (0, 0))
+
+# 底部HUD文字控件，数值变化时才重新渲染
+hud_armor = TextWidget(fonts.get(30), WHITE, "Armor: {}")
+hud_score = TextWidget(fonts.get(30), WHITE, "Score: {}")
+hud_killed = TextWidget(fonts.get(30), WHITE, "Monsters: {}/200")
+
+def draw_hud(surface):
     # Draw armor
-    armor_text = font.render(f"Armor: {armor}", True, WHITE)
+    armor_text = hud_armor.update(armor)
     surface.blit(armor_text, (15, SCREEN_HEIGHT - 40))
     
     # Draw score
-    score_text = font.render(f"Score: {score}", True, WHITE)
+    score_text = hud_score.update(score)
     surface.blit(score_text, (SCREEN_WIDTH - score_text.get_width() - 10, SCREEN_HEIGHT - 40))
     
     # Draw killed monsters count
-    killed_text = font.render(f"Monsters: {killed_monsters}/200", True, WHITE)
+    killed_text = hud_killed.update(killed_monsters)
     surface.blit(killed_text, (SCREEN_WIDTH // 2 - killed_text.get_width() // 2, SCREEN_HEIGHT - 40))
 
 def draw_game_over(surface):
-    font_large = pygame.font.Font(None, 72)
-    font_small = pygame.font.Font(None, 36)
+    font_large = fonts.get(72)
+    font_small = fonts.get(36)
     
     # Draw game over text
-    game_over_text = font_large.render("GAME OVER", True, RED)
+    game_over_text = text_cache.render(font_large, "GAME OVER", RED)
     surface.blit(game_over_text, 
                 (SCREEN_WIDTH // 2 - game_over_text.get_width() // 2, 
                  SCREEN_HEIGHT // 2 - game_over_text.get_height() // 2))
     
     # Draw final score
-    score_text = font_small.render(f"Final Score: {score}", True, WHITE)
+    score_text = text_cache.render(font_small, f"Final Score: {score}", WHITE)
     surface.blit(score_text, 
                 (SCREEN_WIDTH // 2 - score_text.get_width() // 2, 
                  SCREEN_HEIGHT // 2 + game_over_text.get_height()))
     
     # Draw restart instruction
-    restart_text = font_small.render("Press R to restart", True, WHITE)
+    restart_text = text_cache.render(font_small, "Press R to restart", WHITE)
     surface.blit(restart_text, 
                 (SCREEN_WIDTH // 2 - restart_text.get_width() // 2, 
                  SCREEN_HEIGHT // 2 + game_over_text.get_height() + score_text.get_height() + 20))
 
-def draw_sword_hud(surface, player, current_time):
-    # HUD位置和大小设置
+# 剑类型颜色映射
+SWORD_HUD_COLORS = {
+    NORMAL_SWORD: WHITE,
+    ICE_SWORD: CYAN,
+    FIRE_SWORD: ORANGE,
+    SWORD_RAIN: (180, 180, 255)  # 淡蓝紫色
+}
+
+SWORD_HUD_NAMES = {
+    NORMAL_SWORD: "Normal",
+    ICE_SWORD: "Ice",
+    FIRE_SWORD: "Fire",
+    SWORD_RAIN: "Rain"
+}
+
+def sword_hud_rect(index):
+    """第index个剑状态面板的位置和大小"""
     hud_width = 80
-    hud_x = SCREEN_WIDTH - hud_width - 10
-    hud_y = 10
     item_height = 60
     padding = 10
-    
-    # 字体设置
-    font = pygame.font.Font(None, 24)
-    
-    # 剑类型颜色映射
-    sword_colors = {
-        NORMAL_SWORD: WHITE,
-        ICE_SWORD: CYAN,
-        FIRE_SWORD: ORANGE,
-        SWORD_RAIN: (180, 180, 255)  # 淡蓝紫色
-    }
-    
-    sword_names = {
-        NORMAL_SWORD: "Normal",
-        ICE_SWORD: "Ice",
-        FIRE_SWORD: "Fire",
-        SWORD_RAIN: "Rain"
-    }
-    
-    # 获取已解锁的剑类型（不包括NORMAL_SWORD）
-    unlocked_types = [t for t in player.unlocked_sword_types if t != NORMAL_SWORD]
-    
+    return pygame.Rect(SCREEN_WIDTH - hud_width - 10, 10 + (item_height + padding) * index,
+                       hud_width, item_height)
+
+def sword_hud_types(player):
+    """已解锁的剑类型（不包括NORMAL_SWORD）"""
+    return [t for t in player.unlocked_sword_types if t != NORMAL_SWORD]
+
+def sword_cooldown(player, sword_type, current_time):
+    if sword_type == SWORD_RAIN:
+        return player.get_sword_rain_cooldown_percentage(current_time)
+    return player.get_cooldown_percentage(current_time, sword_type)
+
+# 每种剑一个缓存的状态面板
+sword_panels = {}
+
+def sword_panel(player, sword_type, current_time):
+    """返回剑状态面板的图像（等级或冷却档位变化时才重绘）"""
+    panel = sword_panels.get(sword_type)
+    if panel is None:
+        panel = SwordPanel(sword_hud_rect(0).size, SWORD_HUD_COLORS[sword_type],
+                           SWORD_HUD_NAMES[sword_type], fonts.get(24), SWORD_HUD_DIAL_STEPS)
+        sword_panels[sword_type] = panel
+    return panel, panel.update(player.sword_attributes[sword_type].upgrades,
+                               sword_cooldown(player, sword_type, current_time))
+
+def draw_sword_hud(surface, player, current_time):
     # 绘制每种已解锁剑的状态
-    for i, sword_type in enumerate(unlocked_types):
-        attrs = player.sword_attributes[sword_type]
-        y = hud_y + (item_height + padding) * i
-        
-        # 创建半透明背景
-        bg_surface = pygame.Surface((hud_width, item_height), pygame.SRCALPHA)
-        bg_surface.fill((50, 50, 50, 150))  # 半透明背景
-        surface.blit(bg_surface, (hud_x, y))
-        
-        # 绘制边框
-        pygame.draw.rect(surface, sword_colors[sword_type], 
-                        (hud_x, y, hud_width, item_height), 2)
-        
-        # 绘制剑类型名称和等级
-        name_text = font.render(f"{sword_names[sword_type]} Lv.{attrs['upgrades']}", True, sword_colors[sword_type])
-        surface.blit(name_text, (hud_x + 5, y + 5))
-        
-        # 绘制CD倒计时圆盘
-        cd_radius = 15
-        cd_x = hud_x + hud_width // 2
-        cd_y = y + item_height - cd_radius - 5
-        
-        # 绘制底层圆
-        pygame.draw.circle(surface, (30, 30, 30, 150), (cd_x, cd_y), cd_radius)
-        
-        # 计算并绘制CD进度
-        if sword_type == SWORD_RAIN:
-            cooldown = player.get_sword_rain_cooldown_percentage(current_time)
-        else:
-            cooldown = player.get_cooldown_percentage(current_time, sword_type)
-            
-        if cooldown < 1:
-            angle = (1 - cooldown) * 360  # 转换为角度
-            # 绘制扇形
-            pygame.draw.arc(surface, sword_colors[sword_type],
-                          (cd_x - cd_radius, cd_y - cd_radius,
-                           cd_radius * 2, cd_radius * 2),
-                          math.radians(270), math.radians(270 + angle), cd_radius)
-        
-        # 绘制圆形边框
-        pygame.draw.circle(surface, sword_colors[sword_type], (cd_x, cd_y), cd_radius, 2)
-
-def reset_game():
+    for i, sword_type in enumerate(sword_hud_types(player)):
+        panel, image = sword_panel(player, sword_type, current_time)
+        surface.blit(image, sword_hud_rect(i))
+
+def create_pools():
+    """按当前实体后端创建飞剑（或齐射）、怪物和剑雨的对象池"""
+    return (ObjectPool(Volley if volley_mode else make_sword, SWORD_POOL_SIZE, USE_OBJECT_POOLS),
+            ObjectPool(make_monster, MONSTER_POOL_SIZE, USE_OBJECT_POOLS),
+            ObjectPool(SwordRain, RAIN_POOL_SIZE, USE_OBJECT_POOLS))
+
+def pool_stats():
+    """各对象池的统计信息"""
+    return {
+        "swords": sword_pool.stats(),
+        "monsters": monster_pool.stats(),
+        "rains": rain_pool.stats(),
+    }
+
+def reset_game(seed=None):
+    """开始新的一局；seed相同且输入相同时整局游戏完全相同"""
     global armor, score, killed_monsters, game_over
-    global all_sprites, monsters, swords, player, upgrade_popup
+    global all_sprites, monsters, swords, player, upgrade_popup, entity_store, volley_mode, damage_ledger
+    global sword_pool, monster_pool, rain_pool, wave_scheduler
+    
+    game_rng.seed(seed)
     
     # Reset game variables
     armor = 1000
@@ -1029,9 +1779,16 @@ def reset_game():
     game_over = False
     
     # Reset sprite groups
-    all_sprites = pygame.sprite.Group()
-    monsters = pygame.sprite.Group()
+    all_sprites = SpriteGroup()
+    monsters = MonsterGroup()
     swords = pygame.sprite.Group()
+    entity_store = EntityStore() if USE_ENTITY_STORE else None
+    volley_mode = USE_VOLLEYS
+    damage_ledger = DamageLedger()
+    sword_pool, monster_pool, rain_pool = create_pools()
+    wave_scheduler = create_wave_scheduler(game_rng.randrange(2**32))
+    floating_text.clear()
+    game_events.clear()
     
     # Create player with reset sword attributes
     player = Player()
@@ -1048,9 +1805,13 @@ def reset_game():
 import math
 
 # Create sprite groups
-all_sprites = pygame.sprite.Group()
-monsters = pygame.sprite.Group()
+all_sprites = SpriteGroup()
+monsters = MonsterGroup()
 swords = pygame.sprite.Group()
+entity_store = EntityStore() if USE_ENTITY_STORE else None
+volley_mode = USE_VOLLEYS
+damage_ledger = DamageLedger()
+sword_pool, monster_pool, rain_pool = create_pools()
 
 # Create player
 player = Player()
@@ -1059,84 +1820,521 @@ all_sprites.add(player)
 # Create upgrade popup
 upgrade_popup = UpgradePopup()
 
-# Monster spawn timer
-monster_spawn_timer = 0
-monster_spawn_delay = 600  # milliseconds
+# Monster spawn timeline
+wave_scheduler = create_wave_scheduler(game_rng.randrange(2**32))
+
+# 计分和升级弹窗：伤害和击杀事件的第一个监听者
+game_events.subscribe(award_kills)
+
+# Snapshots: 游戏状态的快照只包含基本类型的元组（不复制Surface），可以廉价地复制和跨进程传递
+MONSTER_FIELDS = ("y_float", "health", "max_health", "speed", "damage", "drops_upgrade", "attacking",
+                  "last_health")
+SCHEDULER_FIELDS = ("start_time", "next_time", "generated_until", "burst_index", "spawned", "batches")
+# 影响游戏结果的规则和平衡参数：快照和录像都记下它们，在另一个进程中也按同样的规则模拟
+RULE_SETTINGS = ("SWEPT_COLLISIONS", "ALLOCATE_TARGETS", "SWORD_ANGLE_STEP", "MONSTER_STATS",
+                 "SWORD_BASE_STATS", "SWORD_FIRE_RATE_UPGRADE", "SWORD_DAMAGE_UPGRADE",
+                 "UPGRADE_DROP_CHANCE", "UPGRADE_DROP_KILL_LIMIT", "SPAWN_INTERVAL_SCALE")
 
-# Main game loop
-running = True
-while running:
-    # Keep loop running at the right speed
-    clock.tick(FPS)
-    current_time = pygame.time.get_ticks()
+def rule_settings():
+    """当前的规则和平衡参数（只含基本类型，可以跨进程传递和写入JSON）"""
+    return {name: copy.deepcopy(globals()[name]) for name in RULE_SETTINGS}
+
+def _like(value, current):
+    """把JSON读回的值还原成current的结构：字符串键换回原来的键，列表换回元组"""
+    if isinstance(value, dict) and isinstance(current, dict):
+        keys = {str(key): key for key in current}
+        restored = {}
+        for key, item in value.items():
+            key = keys.get(str(key), key)
+            restored[key] = _like(item, current.get(key))
+        return restored
+    if isinstance(value, list) and isinstance(current, tuple):
+        return tuple(value)
+    return value
+
+def apply_rule_settings(settings):
+    """应用rule_settings()记下的参数，缺少的项保持不变；飞剑图集的角度精度变化时重新创建图集"""
+    global sword_atlas
+    for name, value in settings.items():
+        if name in RULE_SETTINGS:
+            globals()[name] = _like(copy.deepcopy(value), globals()[name])
+    if sword_atlas.angle_step != SWORD_ANGLE_STEP:
+        sword_atlas = SwordAtlas(SWORD_ANGLE_STEP)
+
+def snapshot_game():
+    """保存完整的游戏逻辑状态（伤害数字等纯视觉效果除外），可用restore_game恢复"""
+    sprites = []
+    monster_index = {}
+    sword_index = {}
+    for sprite in all_sprites:
+        if isinstance(sprite, Monster):
+            monster_index[sprite] = len(monster_index)
+            sprites.append(("monster", sprite.monster_type, tuple(sprite.rect),
+                            tuple(getattr(sprite, name) for name in MONSTER_FIELDS)))
+        elif isinstance(sprite, Sword):
+            sword_index[sprite] = len(sprites)
+            sprites.append(("sword", sprite.sword_type, tuple(sprite.rect),
+                            (sprite.damage, sprite.damage_range, sprite.angle)))
+        elif isinstance(sprite, SwordRain):
+            # 目标仍存活时记下它的序号，否则只记下最后的位置
+            target = monster_index.get(sprite.target) if sprite.target_alive() else None
+            sprites.append(("rain", target, tuple(sprite.rect),
+                            (tuple(sprite.target_rect), sprite.fixed_position, sprite.damage, sprite.radius,
+                             sprite.duration, sprite.created_time, sprite.last_damage_time)))
+        elif sprite is player:
+            sprites.append(("player",))
     
-    # Process input (events)
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        
-        # Check for restart on game over
-        if game_over and event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_r:
-                reset_game()
-        
-        # Check for upgrade popup clicks
-        if event.type == pygame.MOUSEBUTTONDOWN:
-            upgrade_popup.handle_click(event.pos, player)
+    volleys = None
+    if volley_mode:
+        sword_index = {volley: i for i, volley in enumerate(swords)}
+        volleys = tuple((volley.sword_type, volley.damage, volley.damage_range, tuple(volley.angles),
+                         tuple(map(tuple, volley.blades[:, [0, 1, Volley.BLADE]].tolist())))
+                        for volley in swords)
+    # 在途伤害：(飞剑在sprites中的序号或齐射的序号, 刀片序号, 目标怪物的序号, 伤害)
+    ledger = []
+    for token, (monster, damage) in damage_ledger.shots.items():
+        sword, blade = token if isinstance(token, tuple) else (token, None)
+        ledger.append((sword_index[sword], blade, monster_index[monster], damage))
     
-    # Update
-    if not game_over and not upgrade_popup.active:
-        # Spawn monsters
-        if current_time - monster_spawn_timer > monster_spawn_delay:
-            spawn_monster(all_sprites, monsters)
-            monster_spawn_timer = current_time
-        
-        # Auto-shoot
-        player.shoot(current_time, all_sprites, swords, monsters)
-        
-        # 自动触发剑雨技能（如果已解锁且冷却完成）
-        if player.sword_attributes[SWORD_RAIN]["damage"] > 0:
-            player.use_sword_rain(current_time, all_sprites)
-        
-        # Update all sprites
-        all_sprites.update()
-        
-        # Check collisions
-        check_collisions(swords, monsters, upgrade_popup)
-        
-        # Check game over condition
-        if armor <= 0:
-            game_over = True
+    stats = {sword_type: tuple(getattr(value, name) for name in type(value).__slots__)
+             for sword_type, value in player.sword_attributes.items()}
+    scheduler = wave_scheduler
+    return {
+        "time": game_clock.get_ticks(),
+        "globals": (armor, score, killed_monsters, game_over),
+        "entity_store": entity_store is not None,
+        "rules": rule_settings(),
+        "rng": game_rng.getstate(),
+        "player": (tuple(player.unlocked_sword_types), player.sword_rain_active, stats),
+        "popup": (upgrade_popup.active, upgrade_popup.popup_count,
+                  tuple((button["text"], tuple(button["rect"])) for button in upgrade_popup.current_upgrades)),
+        "waves": (scheduler.config, scheduler.rng.bit_generator.state,
+                  tuple(scheduler.timeline[scheduler.cursor:]),
+                  tuple(getattr(scheduler, name) for name in SCHEDULER_FIELDS)),
+        "sprites": tuple(sprites),
+        "volleys": volleys,
+        "ledger": tuple(ledger),
+    }
+
+def restore_game(snapshot):
+    """从snapshot_game的快照恢复游戏状态（精灵是新创建的，不与快照之前的对象共享）"""
+    global armor, score, killed_monsters, game_over, USE_ENTITY_STORE, USE_VOLLEYS
+    global all_sprites, monsters, swords, player, upgrade_popup, entity_store, volley_mode, damage_ledger
+    global sword_pool, monster_pool, rain_pool, wave_scheduler
     
-    # Draw / render
-    screen.fill(BLACK)
+    armor, score, killed_monsters, game_over = snapshot["globals"]
+    apply_rule_settings(snapshot["rules"])
+    USE_ENTITY_STORE = snapshot["entity_store"]
+    USE_VOLLEYS = volley_mode = snapshot["volleys"] is not None
+    all_sprites = SpriteGroup()
+    monsters = MonsterGroup()
+    swords = pygame.sprite.Group()
+    entity_store = EntityStore() if USE_ENTITY_STORE else None
+    damage_ledger = DamageLedger()
+    sword_pool, monster_pool, rain_pool = create_pools()
+    floating_text.clear()
+    game_events.clear()
     
-    # Draw game areas
-    draw_game_areas(screen)
+    # Player
+    unlocked, rain_active, stats = snapshot["player"]
+    player = Player()
+    player.unlocked_sword_types = list(unlocked)
+    player.sword_rain_active = rain_active
+    for sword_type, values in stats.items():
+        attributes = player.sword_attributes[sword_type]
+        for name, value in zip(type(attributes).__slots__, values):
+            setattr(attributes, name, value)
+    
+    # Sprites：按原来的顺序加入精灵组，更新顺序和索引中的先后顺序都与快照前相同
+    current_time = snapshot["time"]
+    restored_monsters = []
+    restored_swords = {}
+    for i, entry in enumerate(snapshot["sprites"]):
+        kind = entry[0]
+        if kind == "player":
+            all_sprites.add(player)
+        elif kind == "monster":
+            _, monster_type, rect, values = entry
+            monster = monster_pool.acquire(monster_type, rect[0], rect[1])
+            for name, value in zip(MONSTER_FIELDS, values):
+                setattr(monster, name, value)
+            all_sprites.add(monster)
+            monsters.add(monster)
+            restored_monsters.append(monster)
+        elif kind == "sword":
+            _, sword_type, rect, (damage, damage_range, angle) = entry
+            center = pygame.Rect(rect).center
+            sword = sword_pool.acquire(center[0], center[1], sword_type, damage, damage_range, angle)
+            restored_swords[i] = sword
+            all_sprites.add(sword)
+            swords.add(sword)
+        elif kind == "rain":
+            _, target, rect, (target_rect, fixed_position, damage, radius, duration,
+                              created_time, last_damage_time) = entry
+            if target is not None:
+                target_sprite = restored_monsters[target]
+            else:
+                target_sprite = pygame.sprite.Sprite()
+                target_sprite.rect = pygame.Rect(target_rect)
+            rain = rain_pool.acquire(target_sprite, damage, radius, duration)
+            rain.fixed_position = fixed_position
+            rain.created_time = created_time
+            rain.last_damage_time = last_damage_time
+            rain.image = rain_animation.frame(radius, current_time)
+            rain.rect = pygame.Rect(rect)
+            all_sprites.add(rain)
+    for i, (sword_type, damage, damage_range, angles, blades) in enumerate(snapshot["volleys"] or ()):
+        volley = sword_pool.acquire(0, 0, sword_type, damage, damage_range, angles)
+        blades = np.array(blades, np.float64)
+        volley.blades[:, Volley.POSITION] = volley.blades[:, Volley.PREVIOUS] = blades[:, :2]
+        volley.blades[:, Volley.BLADE] = blades[:, 2]
+        swords.add(volley)
+        restored_swords[i] = volley
+    for sword, blade, target, damage in snapshot["ledger"]:
+        token = restored_swords[sword] if blade is None else (restored_swords[sword], blade)
+        damage_ledger.commit(token, restored_monsters[target], damage)
+    
+    # Upgrade popup（构造时会随机选项，所以随机数状态最后恢复）
+    active, popup_count, buttons = snapshot["popup"]
+    upgrade_popup = UpgradePopup()
+    upgrade_popup.active = active
+    upgrade_popup.popup_count = popup_count
+    upgrade_popup.update_unlocked_upgrades()
+    options = {upgrade["text"]: upgrade for upgrade in
+               upgrade_popup.all_upgrades + upgrade_popup.unlocked_upgrades + upgrade_popup.unlock_options}
+    upgrade_popup.current_upgrades = []
+    for text, rect in buttons:
+        button = options[text].copy()
+        button["rect"] = pygame.Rect(rect)
+        upgrade_popup.current_upgrades.append(button)
+    
+    # Monster spawn timeline
+    config, rng_state, timeline, values = snapshot["waves"]
+    wave_scheduler = WaveScheduler(config, 0, MONSTER_SIZES, SCREEN_WIDTH, -50, int(WORMHOLE_HEIGHT),
+                                   on_batch=reserve_wave)
+    wave_scheduler.rng.bit_generator.state = rng_state
+    wave_scheduler.timeline = list(timeline)
+    for name, value in zip(SCHEDULER_FIELDS, values):
+        setattr(wave_scheduler, name, value)
+    
+    game_rng.setstate(snapshot["rng"])
+
+
+def handle_event(event):
+    """处理单个输入事件，返回False表示退出游戏"""
+    # Check for restart on game over
+    if game_over and event.type == pygame.KEYDOWN:
+        if event.key == pygame.K_r:
+            # 新一局的种子取自当前局的随机数，录像重放时同样可以重现
+            reset_game(game_rng.randrange(2**32))
+    
+    # F3: 性能分析覆盖层
+    if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+        profiler.toggle()
+    
+    # Check for upgrade popup clicks
+    if event.type == pygame.MOUSEBUTTONDOWN:
+        upgrade_popup.handle_click(event.pos, player)
+    
+    return event.type != pygame.QUIT
+
+def game_state():
+    """用于比较两局游戏是否相同的状态摘要"""
+    return {
+        "score": score,
+        "armor": armor,
+        "killed_monsters": killed_monsters,
+        "game_over": game_over,
+        "monsters": len(monsters),
+        "swords": sword_count(),
+    }
+
+def replay_config():
+    """影响游戏结果的配置，记录在录像中"""
+    return {"wave_preset": WAVE_PRESET, "entity_store": USE_ENTITY_STORE, "volleys": volley_mode,
+            "rules": rule_settings()}
+
+def record_event(recorder, event):
+    """把会影响游戏的输入写入录像"""
+    if event.type == pygame.MOUSEBUTTONDOWN:
+        recorder.click(event.pos)
+    elif event.type == pygame.KEYDOWN:
+        recorder.key(event.key)
+
+def save_replay(recorder):
+    replay = recorder.finish(game_state())
+    replay_dir = os.path.join(current_dir, REPLAY_DIR)
+    os.makedirs(replay_dir, exist_ok=True)
+    path = os.path.join(replay_dir, time.strftime("replay-%Y%m%d-%H%M%S.hofr"))
+    replay.save(path)
+    print(f"Saved replay: {path} ({replay.frames} frames)")
+
+def advise_upgrade(advisor):
+    """弹窗打开且还没有推荐时，让顾问为选项排序并标出最好的一个"""
+    if not upgrade_popup.active or upgrade_popup.recommended is not None or not upgrade_popup.current_upgrades:
+        return
+    ranking = advisor.rank()
+    # 在游戏进程中模拟时，游戏状态（包括弹窗对象）已经从快照恢复
+    upgrade_popup.recommended = ranking[0].option
+    print("Upgrade advice: " + ", ".join(f"{result.option} ({result.value:.0f})" for result in ranking))
+
+def update_game(current_time):
+    """推进一帧游戏逻辑（主循环和无界面模拟共用）"""
+    global game_over
     
-    # Draw all sprites
-    all_sprites.draw(screen)
+    if game_over or upgrade_popup.active:
+        return
     
-    # 为每个怪物绘制血条和伤害指示器
+    # Spawn monsters（同一帧到期的怪物一起出现）
+    for entry in wave_scheduler.due(current_time):
+        spawn_monster(all_sprites, monsters, entry)
+    profiler.mark("spawn")
+    
+    # Auto-shoot
+    player.shoot(current_time, all_sprites, swords, monsters)
+    profiler.mark("shoot")
+    
+    # 自动触发剑雨技能（如果已解锁且冷却完成）
+    if player.sword_attributes[SWORD_RAIN].damage > 0:
+        player.use_sword_rain(current_time, all_sprites)
+    profiler.mark("rain")
+    
+    # Update all sprites
+    if entity_store is not None:
+        update_entity_store()
+    all_sprites.update()
+    if volley_mode:
+        update_volleys(swords)
+    profiler.mark("update")
+    
+    # Check collisions
+    check_collisions(swords, monsters)
+    profiler.mark("collision")
+    
+    # 结算本tick的伤害和击杀事件
+    game_events.resolve()
+    
+    # Check game over condition
+    if armor <= 0:
+        game_over = True
+
+# 渲染插值：最后一个tick之前各精灵的位置
+previous_positions = {}
+
+def remember_positions():
+    """在一帧的最后一个tick之前调用，记下精灵的位置用于插值"""
+    global previous_positions
+    previous_positions = {sprite: sprite.rect.topleft for sprite in all_sprites}
+    if volley_mode:
+        for volley in swords:
+            volley.remember_positions()
+
+def sprite_position(sprite, alpha):
+    """精灵在上一tick和当前tick之间alpha(0~1)处的绘制位置；新出现的精灵画在当前位置"""
+    previous = previous_positions.get(sprite)
+    x, y = sprite.rect.topleft
+    if previous is None or alpha is None:
+        return x, y
+    px, py = previous
+    return round(px + (x - px) * alpha), round(py + (y - py) * alpha)
+
+def draw_frame(surface, current_time, alpha=None):
+    """绘制一帧画面（不包括flip）；alpha不为None时按插值位置绘制精灵"""
+    # Draw game areas (覆盖整个画面，不需要先fill)
+    draw_game_areas(surface)
+    
+    # Draw all sprites（血条和伤害数字仍按rect绘制，怪物每tick只移动不到1像素）
+    if alpha is None:
+        all_sprites.draw(surface)
+    else:
+        surface.blits([(sprite.image, sprite_position(sprite, alpha)) for sprite in all_sprites], False)
+    if volley_mode:
+        for volley in swords:
+            surface.blits(volley.blits(alpha), False)
+    
+    # 为每个怪物绘制血条
     for monster in monsters:
-        monster.draw_health_bar(screen)
+        monster.draw_health_bar(surface)
+    
+    # 伤害数字（纯视觉效果，在绘制时才剔除过期的数字并更新透明度和位置）
+    floating_text.update(current_time)
+    floating_text.draw(surface)
+    profiler.mark("draw")
     
     # Draw HUD
-    draw_hud(screen)
+    draw_hud(surface)
     
     # Draw sword status HUD
-    draw_sword_hud(screen, player, current_time)
+    draw_sword_hud(surface, player, current_time)
+    profiler.mark("hud")
     
     # Draw upgrade popup if active
-    upgrade_popup.draw(screen)
+    upgrade_popup.draw(surface)
     
     # Draw game over screen if game is over
     if game_over:
-        draw_game_over(screen)
+        draw_game_over(surface)
+    
+    # 性能分析覆盖层
+    if profiler.enabled:
+        surface.blit(profiler_overlay.update(current_time), PROFILER_OVERLAY_POS)
+    profiler.mark("popup")
+
+def sword_count():
+    """飞行中的飞剑数（齐射模式下为所有齐射的刀片数）"""
+    if volley_mode:
+        return sum(len(volley.blades) for volley in swords)
+    return len(swords)
+
+def entity_counts():
+    """性能分析记录的实体数量"""
+    counts = {"monsters": len(monsters), "swords": sword_count(), "all_sprites": len(all_sprites)}
+    if volley_mode:
+        counts["volleys"] = len(swords)
+    return counts
+
+def frame_items(current_time, alpha=None):
+    """按draw_frame的绘制顺序列出本帧的所有元素，供脏矩形渲染比较
+    
+    每个元素为 (键, 屏幕区域, 外观签名, 图像或None, 绘制函数或None)。
+    """
+    items = []
+    for sprite in all_sprites:
+        rect = sprite.rect if alpha is None else sprite.image.get_rect(topleft=sprite_position(sprite, alpha))
+        items.append((sprite, rect, sprite.image, sprite.image, None))
+    if volley_mode:
+        for volley in swords:
+            for blade, (image, position) in zip(volley.blades[:, Volley.BLADE].tolist(), volley.blits(alpha)):
+                items.append(((volley, blade), image.get_rect(topleft=position), image, image, None))
+    
+    for monster in monsters:
+        items.append(((monster, "health"), monster.health_bar_area(), monster.health,
+                      None, monster.draw_health_bar))
+    
+    floating_text.update(current_time)
+    for slot, image, position in floating_text.entries():
+        key = ("text", slot, int(floating_text.spawn[slot]))
+        signature = (image, int(floating_text.alpha[slot]), position)
+        items.append((key, image.get_rect(topleft=position), signature, None,
+                      lambda surface, slot=slot, image=image, position=position:
+                          floating_text.draw_entry(surface, slot, image, position)))
+    
+    items.append(("hud", pygame.Rect(0, SCREEN_HEIGHT - 40, SCREEN_WIDTH, 30),
+                  (armor, score, killed_monsters), None, draw_hud))
+    
+    for i, sword_type in enumerate(sword_hud_types(player)):
+        panel, image = sword_panel(player, sword_type, current_time)
+        items.append((("sword_hud", i), sword_hud_rect(i), (panel, panel.version), image, None))
+    
+    if upgrade_popup.active:
+        image = upgrade_popup.render()
+        items.append(("popup", upgrade_popup.rect, upgrade_popup.image_signature, image, None))
+    
+    if game_over:
+        items.append(("game_over", pygame.Rect(0, SCREEN_HEIGHT // 2 - 40, SCREEN_WIDTH, 170),
+                      score, None, draw_game_over))
+    
+    if profiler.enabled:
+        image = profiler_overlay.update(current_time)
+        items.append(("profiler", image.get_rect(topleft=PROFILER_OVERLAY_POS), profiler_overlay.version,
+                      image, None))
+    return items
+
+def main():
+    # 启动时生成全部飞剑图像，避免游戏中按需旋转造成卡顿
+    sword_atlas.build()
+    rain_animation.build(player.sword_attributes[SWORD_RAIN].radius)
+    
+    renderer = DirtyRenderer(screen, background_layer.get(screen.get_size())) if USE_DIRTY_RECTS else None
+    
+    # 游戏逻辑用固定步长的时钟：每个tick前进1000/TICK_RATE毫秒，与画面帧率无关
+    global game_clock
+    tick_ms = 1000 / TICK_RATE
+    # 每帧最多跑的tick数：画面帧率低于逻辑tick率时每帧本来就要跑多个tick
+    max_ticks = math.ceil(TICK_RATE / RENDER_FPS) + CATCH_UP_TICKS
+    game_clock = ManualClock(pygame.time.get_ticks())
+    
+    # 用新的种子开始游戏，录像记录这个种子
+    seed = random.randrange(2**32)
+    reset_game(seed)
+    recorder = ReplayRecorder(seed, game_clock.get_ticks(), replay_config()) if RECORD_REPLAY else None
+    if PROFILE:
+        profiler.enable()
+    advisor = (UpgradeAdvisor(sys.modules[__name__], ADVISOR_HORIZON_MS, ADVISOR_BUDGET_MS, ADVISOR_WORKERS)
+               if UPGRADE_ADVISOR else None)
+    
+    # Main game loop
+    running = True
+    pending_events = []
+    accumulator = 0.0
+    last_real_time = pygame.time.get_ticks()
+    while running:
+        # 限制画面帧率，累计经过的真实时间
+        clock.tick(RENDER_FPS)
+        now = pygame.time.get_ticks()
+        accumulator += now - last_real_time
+        last_real_time = now
+        profiler.begin_frame()
+        
+        # Process input (events)：输入在下一个tick开始时处理，录像中记在那个tick上
+        pending_events.extend(pygame.event.get())
+        profiler.mark("input")
+        
+        # Update：补跑到期的tick；落后太多时丢弃积压，跳过的是画面帧而不是逻辑tick
+        ticks = min(int(accumulator // tick_ms), max_ticks)
+        accumulator = accumulator - ticks * tick_ms if ticks < max_ticks else accumulator % tick_ms
+        for tick in range(ticks):
+            if tick == ticks - 1 and RENDER_INTERPOLATION:
+                remember_positions()
+            game_clock.advance(tick_ms)
+            current_time = game_clock.get_ticks()
+            if recorder is not None:
+                recorder.begin_frame(current_time)
+            for event in pending_events:
+                if recorder is not None:
+                    record_event(recorder, event)
+                if not handle_event(event):
+                    running = False
+            pending_events.clear()
+            profiler.mark("input")
+            
+            update_game(current_time)
+            if recorder is not None:
+                recorder.end_frame(game_state())
+            if advisor is not None:
+                advise_upgrade(advisor)
+        
+        # Draw / render：按剩余的积压时间在最后两个tick之间插值
+        current_time = game_clock.get_ticks()
+        alpha = accumulator / tick_ms if RENDER_INTERPOLATION else None
+        if renderer is not None:
+            # 背景层重建（换主题或分辨率）后整屏重绘一次
+            background = background_layer.get(screen.get_size())
+            if background is not renderer.background:
+                renderer.set_background(background)
+            # 只提交变化的区域（绘制全部计入draw阶段）
+            rects = renderer.render(frame_items(current_time, alpha))
+            profiler.mark("draw")
+            pygame.display.update(rects)
+        else:
+            draw_frame(screen, current_time, alpha)
+            
+            # Flip the display
+            pygame.display.flip()
+        profiler.mark("flip")
+        counts = entity_counts()
+        counts["ticks"] = ticks
+        profiler.end_frame(counts)
+    
+    profiler.close()
+    if advisor is not None:
+        advisor.close()
+    if recorder is not None:
+        save_replay(recorder)
     
-    # Flip the display
-    pygame.display.flip()
+    # Quit the game
+    pygame.quit()
+    sys.exit()
 
-# Quit the game
-pygame.quit()
-sys.exit()
+if __name__ == "__main__":
+    main()
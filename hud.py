@@ -0,0 +1,96 @@
+"""Retained-mode HUD widgets.
+
+Each widget keeps the surface it last rendered together with the value it
+was rendered from, and only renders again when that value changes; drawing
+a frame is then just a blit per widget. Cooldown dials are quantized to a
+fixed number of steps so a cooling sword re-renders its panel a few dozen
+times per cooldown instead of every frame.
+"""
+import math
+
+import pygame
+
+
+class TextWidget:
+    """缓存渲染结果的文字控件，只有显示的值变化时才重新渲染"""
+    def __init__(self, font, color, template):
+        self.font = font
+        self.color = color
+        self.template = template
+        self.value = None
+        self.image = None
+        self.renders = 0
+
+    def update(self, value):
+        """返回显示value的图像"""
+        if self.image is None or value != self.value:
+            self.value = value
+            self.image = self.font.render(self.template.format(value), True, self.color)
+            self.renders += 1
+        return self.image
+
+
+class SwordPanel:
+    """剑状态面板：背景、边框、名称等级和冷却圆盘合成在一张缓存图像上
+
+    不随冷却变化的部分另存为底图，只在等级变化时重新渲染；冷却档位变化时
+    只需把底图复制过来再画一段圆弧。
+    """
+    def __init__(self, size, color, name, font, dial_steps=24, dial_radius=15):
+        self.color = color
+        self.name = name
+        self.font = font
+        self.dial_steps = dial_steps
+        self.dial_radius = dial_radius
+        self.base = pygame.Surface(size, pygame.SRCALPHA)
+        self.image = pygame.Surface(size, pygame.SRCALPHA)
+        self.dial_center = (size[0] // 2, size[1] - dial_radius - 5)
+        self.level = None
+        self.key = None
+        self.version = 0   # 每次重绘加一
+        self.renders = 0
+
+    def update(self, level, progress):
+        """progress为冷却进度(0~1，1表示就绪)；等级或进度档位变化时重绘，返回面板图像"""
+        step = min(int(progress * self.dial_steps), self.dial_steps)
+        key = (level, step)
+        if key != self.key:
+            self.key = key
+            if level != self.level:
+                self.level = level
+                self.draw_base(level)
+            self.draw_dial(step)
+        return self.image
+
+    def draw_base(self, level):
+        base = self.base
+        width, height = base.get_size()
+        color = self.color
+
+        # 半透明背景和边框
+        base.fill((50, 50, 50, 150))
+        pygame.draw.rect(base, color, (0, 0, width, height), 2)
+
+        # 剑类型名称和等级
+        base.blit(self.font.render(f"{self.name} Lv.{level}", True, color), (5, 5))
+
+        # 冷却圆盘底层圆
+        pygame.draw.circle(base, (30, 30, 30), self.dial_center, self.dial_radius)
+
+    def draw_dial(self, step):
+        image = self.image
+        color = self.color
+        radius = self.dial_radius
+        center = self.dial_center
+        self.version += 1
+        self.renders += 1
+
+        # 清空后按加法混合复制底图（保留底图的透明度）
+        image.fill((0, 0, 0, 0))
+        image.blit(self.base, (0, 0), special_flags=pygame.BLEND_RGBA_ADD)
+        if step < self.dial_steps:
+            angle = (1 - step / self.dial_steps) * 360
+            pygame.draw.arc(image, color,
+                            (center[0] - radius, center[1] - radius, radius * 2, radius * 2),
+                            math.radians(270), math.radians(270 + angle), radius)
+        pygame.draw.circle(image, color, center, radius, 2)
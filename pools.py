@@ -0,0 +1,64 @@
+"""Object pools for short-lived game entities.
+
+Released objects are kept (up to ``max_size``) and re-initialised through
+their ``reset(*args)`` method on the next ``acquire`` instead of being
+constructed again. A pool created with ``enabled=False`` always builds new
+objects but keeps the same statistics, so runs with and without pooling
+can be compared.
+"""
+
+
+class ObjectPool:
+    """对象池：acquire时优先复用已释放的对象（调用其reset方法），release时放回池中"""
+    def __init__(self, factory, max_size=256, enabled=True):
+        self.factory = factory
+        self.max_size = max_size
+        self.enabled = enabled
+        self.free = []
+        self.allocated = 0     # 新建对象数
+        self.reused = 0        # 复用对象数
+        self.released = 0
+        self.dropped = 0       # 池满或关闭时被丢弃的对象数
+        self.in_use = 0
+        self.high_water = 0    # 同时在用对象数的最高值
+
+    def acquire(self, *args):
+        if self.free:
+            obj = self.free.pop()
+            obj.reset(*args)
+            self.reused += 1
+        else:
+            obj = self.factory(*args)
+            self.allocated += 1
+        obj.pool_owner = self
+        self.in_use += 1
+        if self.in_use > self.high_water:
+            self.high_water = self.in_use
+        return obj
+
+    def release(self, obj):
+        """归还对象；不是从本池取得的对象或重复归还会被忽略"""
+        if getattr(obj, "pool_owner", None) is not self:
+            return
+        obj.pool_owner = None
+        self.in_use -= 1
+        self.released += 1
+        if self.enabled and len(self.free) < self.max_size:
+            self.free.append(obj)
+        else:
+            self.dropped += 1
+
+    def clear(self):
+        self.free.clear()
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "allocated": self.allocated,
+            "reused": self.reused,
+            "released": self.released,
+            "dropped": self.dropped,
+            "in_use": self.in_use,
+            "free": len(self.free),
+            "high_water": self.high_water,
+        }
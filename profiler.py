@@ -0,0 +1,146 @@
+"""Per-frame stage profiler and its on-screen overlay.
+
+The main loop calls ``begin_frame()`` once per frame, ``mark(stage)`` at the
+end of every stage (the time since the previous mark is charged to that
+stage) and ``end_frame(counts)`` after the flip. The last ``window`` frames
+are kept in a NumPy array for rolling percentiles, and every frame can be
+streamed as one CSV line to a log file. While the profiler is disabled each
+hook is a single attribute check, so the hooks can stay in the game loop.
+"""
+import time
+
+import numpy as np
+import pygame
+
+PERCENTILES = (50, 95, 99)
+
+
+class FrameProfiler:
+    """按阶段记录每帧耗时：滚动窗口统计百分位，开启时可逐帧写入CSV文件"""
+    def __init__(self, stages, window=300, log_path=None):
+        self.stages = list(stages)
+        self.index = {stage: i for i, stage in enumerate(self.stages)}
+        self.window = window
+        # 每行一帧：各阶段耗时和整帧耗时（毫秒）
+        self.samples = np.zeros((window, len(self.stages) + 1))
+        self.frames = 0
+        self.current = [0.0] * len(self.stages)
+        self.frame_start = 0.0
+        self.last = 0.0
+        self.counts = {}
+        self.enabled = False
+        self.log_path = log_path
+        self.log = None
+
+    def enable(self):
+        if self.log_path is not None and self.log is None:
+            self.log = open(self.log_path, "w")
+            self.log.write(",".join(["frame"] + self.stages + ["total"]))
+            self.log_header = False
+        self.enabled = True
+        # 在帧中间打开时，从现在开始计时
+        self.begin_frame()
+
+    def disable(self):
+        self.enabled = False
+        if self.log is not None:
+            self.log.flush()
+
+    def toggle(self):
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self.frame_start = self.last = time.perf_counter()
+        self.current = [0.0] * len(self.stages)
+
+    def mark(self, stage):
+        """结束一个阶段：从上一次mark到现在的时间计入stage"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.current[self.index[stage]] += now - self.last
+        self.last = now
+
+    def end_frame(self, counts):
+        """结束一帧；counts为本帧的实体数量，如 {"monsters": 12}"""
+        if not self.enabled:
+            return
+        total = time.perf_counter() - self.frame_start
+        row = self.samples[self.frames % self.window]
+        row[:-1] = self.current
+        row[-1] = total
+        row *= 1000
+        self.frames += 1
+        self.counts = counts
+        if self.log is not None:
+            if not self.log_header:
+                # 实体数量的列名在第一帧确定
+                self.log.write("".join("," + name for name in counts) + "\n")
+                self.log_header = True
+            self.log.write(f"{self.frames}," + ",".join(f"{value:.4f}" for value in row) +
+                           "".join(f",{value}" for value in counts.values()) + "\n")
+
+    def percentiles(self, q=PERCENTILES):
+        """阶段名（以及"total"）-> 滚动窗口内各百分位的耗时（毫秒）"""
+        count = min(self.frames, self.window)
+        if not count:
+            return {}
+        values = np.percentile(self.samples[:count], q, axis=0)
+        return {stage: values[:, i].tolist() for i, stage in enumerate(self.stages + ["total"])}
+
+    def close(self):
+        self.enabled = False
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+
+
+class ProfilerOverlay:
+    """性能分析覆盖层：每隔refresh_ms重新渲染一次百分位表格"""
+    def __init__(self, profiler, font, refresh_ms=250, color=(255, 255, 0)):
+        self.profiler = profiler
+        self.font = font
+        self.refresh_ms = refresh_ms
+        self.color = color
+        self.line_height = font.get_linesize()
+        self.columns = (0, 90, 145, 200)
+        self.image = None
+        self.rendered_at = None
+        self.version = 0
+
+    def update(self, current_time):
+        """返回覆盖层图像，距上次渲染超过refresh_ms时重新渲染"""
+        if self.image is None or current_time - self.rendered_at >= self.refresh_ms:
+            self.rendered_at = current_time
+            self.render()
+        return self.image
+
+    def render(self):
+        profiler = self.profiler
+        stats = profiler.percentiles()
+        rows = [["stage ms"] + [f"p{q}" for q in PERCENTILES]]
+        for stage in profiler.stages + ["total"]:
+            values = stats.get(stage, [0.0] * len(PERCENTILES))
+            rows.append([stage] + [f"{value:.2f}" for value in values])
+        count_rows = [f"{name}: {value}" for name, value in profiler.counts.items()]
+
+        padding = 5
+        width = self.columns[-1] + 60 + padding * 2
+        height = (len(rows) + len(count_rows)) * self.line_height + padding * 2
+        image = pygame.Surface((width, height), pygame.SRCALPHA)
+        image.fill((0, 0, 0, 170))
+        y = padding
+        for row in rows:
+            for x, text in zip(self.columns, row):
+                image.blit(self.font.render(text, True, self.color), (padding + x, y))
+            y += self.line_height
+        for text in count_rows:
+            image.blit(self.font.render(text, True, self.color), (padding, y))
+            y += self.line_height
+        self.image = image
+        self.version += 1
@@ -0,0 +1,139 @@
+"""Deterministic replays.
+
+A replay holds everything that makes one game differ from another: the
+seed of the game RNG, the game-clock reading of every frame (stored as
+deltas from the previous frame) and the mouse clicks and key presses
+handled in each frame, tagged with the frame number. The headless
+simulation also records the upgrade popups it closes because no upgrade is
+left to pick. Feeding the same
+inputs at the same clock readings into a fresh game reproduces it exactly,
+so the recorded checkpoints and final state (score, armor, kills) must
+match on playback.
+
+File layout: a zlib-compressed blob of a JSON header, the frame deltas as
+unsigned 32-bit ints and the inputs as (frame, kind, a, b) 32-bit ints.
+"""
+import json
+import struct
+import sys
+from array import array
+import zlib
+
+MAGIC = b"HOFR"
+VERSION = 1
+
+# Input kinds
+CLICK = 0    # a, b = 鼠标位置
+KEY = 1      # a = 按键
+CLOSE_POPUP = 2   # 关闭没有可选升级的弹窗（只有无界面模拟会这样做）
+
+
+class Replay:
+    """一局游戏的录像：种子、每帧时钟增量、带帧号的输入、检查点和最终状态"""
+    def __init__(self, seed, start_time=0, config=None):
+        self.seed = seed
+        self.start_time = start_time
+        self.config = config or {}
+        self.deltas = array("I")
+        self.inputs = array("i")     # 扁平存放 (帧号, 类型, a, b)
+        self.checkpoints = {}        # 帧号 -> 状态
+        self.final_state = None
+
+    @property
+    def frames(self):
+        return len(self.deltas)
+
+    def frame_times(self):
+        """每帧的时钟读数"""
+        time = self.start_time
+        for delta in self.deltas:
+            time += delta
+            yield time
+
+    def inputs_by_frame(self):
+        """帧号 -> [(类型, a, b), ...]"""
+        result = {}
+        inputs = self.inputs
+        for i in range(0, len(inputs), 4):
+            result.setdefault(inputs[i], []).append((inputs[i + 1], inputs[i + 2], inputs[i + 3]))
+        return result
+
+    def save(self, path):
+        header = json.dumps({
+            "version": VERSION,
+            "seed": self.seed,
+            "start_time": self.start_time,
+            "config": self.config,
+            "frames": len(self.deltas),
+            "inputs": len(self.inputs) // 4,
+            "checkpoints": {str(frame): state for frame, state in self.checkpoints.items()},
+            "final_state": self.final_state,
+        }).encode("utf-8")
+        deltas = self.deltas
+        inputs = self.inputs
+        if sys.byteorder != "little":
+            deltas = array("I", deltas)
+            deltas.byteswap()
+            inputs = array("i", inputs)
+            inputs.byteswap()
+        body = struct.pack("<I", len(header)) + header + deltas.tobytes() + inputs.tobytes()
+        with open(path, "wb") as f:
+            f.write(MAGIC + zlib.compress(body, 9))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        if data[:4] != MAGIC:
+            raise ValueError(f"{path} is not a Hofund replay")
+        body = zlib.decompress(data[4:])
+        header_size = struct.unpack_from("<I", body)[0]
+        header = json.loads(body[4:4 + header_size])
+        if header["version"] != VERSION:
+            raise ValueError(f"unsupported replay version {header['version']}")
+        replay = cls(header["seed"], header["start_time"], header["config"])
+        offset = 4 + header_size
+        deltas_size = header["frames"] * replay.deltas.itemsize
+        replay.deltas.frombytes(body[offset:offset + deltas_size])
+        replay.inputs.frombytes(body[offset + deltas_size:])
+        if sys.byteorder != "little":
+            replay.deltas.byteswap()
+            replay.inputs.byteswap()
+        replay.checkpoints = {int(frame): state for frame, state in header["checkpoints"].items()}
+        replay.final_state = header["final_state"]
+        return replay
+
+
+class ReplayRecorder:
+    """录制一局游戏：每帧开始时调用begin_frame，处理输入时调用click/key"""
+    def __init__(self, seed, start_time=0, config=None, checkpoint_every=300):
+        self.replay = Replay(seed, start_time, config)
+        self.last_time = start_time
+        self.checkpoint_every = checkpoint_every
+
+    @property
+    def frame(self):
+        """当前帧号"""
+        return len(self.replay.deltas) - 1
+
+    def begin_frame(self, current_time):
+        self.replay.deltas.append(current_time - self.last_time)
+        self.last_time = current_time
+
+    def click(self, pos):
+        self.replay.inputs.extend((self.frame, CLICK, int(pos[0]), int(pos[1])))
+
+    def key(self, key):
+        self.replay.inputs.extend((self.frame, KEY, key, 0))
+
+    def close_popup(self):
+        self.replay.inputs.extend((self.frame, CLOSE_POPUP, 0, 0))
+
+    def end_frame(self, state):
+        """帧结束时调用；每隔checkpoint_every帧记录一次状态，用于定位重放不一致的位置"""
+        if self.frame % self.checkpoint_every == 0:
+            self.replay.checkpoints[self.frame] = state
+
+    def finish(self, state):
+        self.replay.final_state = state
+        return self.replay
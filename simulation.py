@@ -0,0 +1,282 @@
+"""Headless simulation for Hofund.
+
+Drives the game logic (spawning, shooting, sword rain, sprite updates and
+collisions) with a manual clock, without a window and without rendering,
+so a 10 minute game finishes in seconds. Used for balancing and
+regression runs:
+
+    python simulation.py --minutes 10 --seed 42
+
+A run can be recorded with ``--record FILE`` and any replay (also those
+saved by the game with RECORD_REPLAY) played back with ``--replay FILE``;
+playback fails if the game diverges from the recorded checkpoints.
+"""
+import os
+
+# 无界面运行：必须在导入pygame之前设置
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import contextlib
+import random
+import time
+
+import pygame
+
+import hofund
+from advisor import UpgradeAdvisor
+from replay import CLICK, CLOSE_POPUP, KEY, Replay, ReplayRecorder
+
+
+# Upgrade policies: 根据弹窗的当前选项返回要点击的按钮，返回None表示没有可选项
+def first_upgrade(popup, player):
+    """总是选择第一个升级选项"""
+    return popup.current_upgrades[0] if popup.current_upgrades else None
+
+
+def random_upgrade(popup, player):
+    """随机选择一个升级选项"""
+    return random.choice(popup.current_upgrades) if popup.current_upgrades else None
+
+
+class PriorityUpgrade:
+    """脚本化策略：按关键词的优先顺序选择升级，例如 ("Unlock", "Power Up")"""
+    def __init__(self, priorities):
+        self.priorities = tuple(priorities)
+
+    def __call__(self, popup, player):
+        if not popup.current_upgrades:
+            return None
+        for keyword in self.priorities:
+            for button in popup.current_upgrades:
+                if keyword in button["text"]:
+                    return button
+        return popup.current_upgrades[0]
+
+
+class AdvisorUpgrade:
+    """前瞻策略：用UpgradeAdvisor为选项排序，选择最好的一个"""
+    def __init__(self, horizon_ms=60000, budget_ms=300, workers=0):
+        self.horizon_ms = horizon_ms
+        self.budget_ms = budget_ms
+        self.workers = workers
+        self.advisor = None
+
+    def __call__(self, popup, player):
+        if not popup.current_upgrades:
+            return None
+        if self.advisor is None:
+            self.advisor = UpgradeAdvisor(hofund, self.horizon_ms, self.budget_ms, self.workers)
+        best = self.advisor.rank()[0].option
+        # 在本进程中模拟后游戏状态已从快照恢复，要在新的弹窗对象中找按钮
+        for button in hofund.upgrade_popup.current_upgrades:
+            if button["text"] == best:
+                return button
+
+
+# 按名称选择的升级策略（batch.py 的工作进程按名称查找）
+POLICIES = {
+    "first": first_upgrade,
+    "random": random_upgrade,
+    "unlock": PriorityUpgrade(("Unlock", "Add", "Power Up", "Speed Up")),
+    "damage": PriorityUpgrade(("Power Up", "Rain Damage", "Add", "Speed Up")),
+    "volume": PriorityUpgrade(("Add", "Speed Up", "Unlock", "Power Up")),
+    "advisor": AdvisorUpgrade(),
+}
+
+
+class HeadlessSimulation:
+    """无界面模拟引擎：用手动时钟逐帧推进游戏逻辑，不做任何渲染"""
+    def __init__(self, tick_ms=1000 / hofund.TICK_RATE, seed=None, upgrade_policy=first_upgrade, quiet=True,
+                 entity_store=False, object_pools=True, waves="classic", record=False, volleys=False):
+        self.tick_ms = tick_ms
+        self.waves = waves
+        self.entity_store = entity_store
+        self.volleys = volleys
+        self.object_pools = object_pools
+        self.seed = seed
+        self.upgrade_policy = upgrade_policy
+        self.quiet = quiet
+        self.record = record
+        self.recorder = None
+        self.clock = None
+        self.ticks = 0
+        self.reset()
+
+    def reset(self):
+        """重置游戏状态和模拟时钟"""
+        # 全局random只给升级策略使用，游戏本身用seed派生的game_rng
+        random.seed(self.seed)
+        game_seed = self.seed if self.seed is not None else random.randrange(2**32)
+        self.clock = hofund.ManualClock()
+        hofund.game_clock = self.clock
+        hofund.USE_ENTITY_STORE = self.entity_store
+        hofund.USE_VOLLEYS = self.volleys
+        hofund.USE_OBJECT_POOLS = self.object_pools
+        hofund.WAVE_PRESET = self.waves
+        with self.output():
+            hofund.reset_game(game_seed)
+        if self.record:
+            self.recorder = ReplayRecorder(game_seed, self.current_time, hofund.replay_config())
+        self.ticks = 0
+
+    def output(self):
+        """quiet模式下丢弃游戏的print输出"""
+        if not self.quiet:
+            return contextlib.nullcontext()
+        # sys.stdout为None时print直接返回，不做任何格式化输出
+        return contextlib.redirect_stdout(None)
+
+    @property
+    def current_time(self):
+        return self.clock.get_ticks()
+
+    def choose_upgrade(self):
+        """按照升级策略点击弹窗中的按钮，相当于玩家的鼠标点击"""
+        popup = hofund.upgrade_popup
+        button = self.upgrade_policy(popup, hofund.player)
+        # 前瞻策略会从快照恢复游戏状态，弹窗可能已经换成了新对象
+        popup = hofund.upgrade_popup
+        if button is None:
+            # 没有可选的升级时真实游戏会卡在弹窗上，这里直接关闭，并记入录像以便重放
+            if self.recorder is not None:
+                self.recorder.close_popup()
+            popup.active = False
+            return
+        if self.recorder is not None:
+            self.recorder.click(button["rect"].center)
+        popup.handle_click(button["rect"].center, hofund.player)
+
+    def step(self):
+        """推进一帧"""
+        self.clock.advance(self.tick_ms)
+        if self.recorder is not None:
+            self.recorder.begin_frame(self.current_time)
+        if hofund.upgrade_popup.active and not hofund.game_over:
+            self.choose_upgrade()
+        hofund.update_game(self.clock.get_ticks())
+        if self.recorder is not None:
+            self.recorder.end_frame(hofund.game_state())
+        self.ticks += 1
+
+    def run(self, duration_ms=None, max_ticks=None):
+        """运行到游戏结束或达到时长/帧数上限，返回结果摘要"""
+        start = time.perf_counter()
+        start_ticks = self.ticks
+        with self.output():
+            while not hofund.game_over:
+                if duration_ms is not None and self.current_time >= duration_ms:
+                    break
+                if max_ticks is not None and self.ticks >= max_ticks:
+                    break
+                self.step()
+        elapsed = time.perf_counter() - start
+        summary = self.summary()
+        summary["wall_time"] = elapsed
+        summary["ticks_per_second"] = (self.ticks - start_ticks) / elapsed if elapsed > 0 else 0.0
+        return summary
+
+    def finish_recording(self):
+        """结束录制，返回录像"""
+        return self.recorder.finish(hofund.game_state())
+
+    def summary(self):
+        """当前游戏状态摘要"""
+        return {
+            "ticks": self.ticks,
+            "time_ms": self.current_time,
+            "score": hofund.score,
+            "armor": hofund.armor,
+            "killed_monsters": hofund.killed_monsters,
+            "game_over": hofund.game_over,
+        }
+
+
+def play(replay, quiet=True):
+    """用手动时钟重放录像，返回与录像不一致的 (帧号, 录像中的状态, 重放的状态) 列表"""
+    clock = hofund.ManualClock(replay.start_time)
+    hofund.game_clock = clock
+    hofund.USE_ENTITY_STORE = replay.config.get("entity_store", False)
+    hofund.WAVE_PRESET = replay.config.get("wave_preset", "classic")
+    hofund.USE_VOLLEYS = replay.config.get("volleys", False)
+    hofund.apply_rule_settings(replay.config["rules"])
+    inputs = replay.inputs_by_frame()
+    checkpoints = replay.checkpoints
+    mismatches = []
+    output = contextlib.redirect_stdout(None) if quiet else contextlib.nullcontext()
+    with output:
+        hofund.reset_game(replay.seed)
+        for frame, current_time in enumerate(replay.frame_times()):
+            clock.time = current_time
+            for kind, a, b in inputs.get(frame, ()):
+                if kind == CLICK:
+                    event = pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=(a, b), button=1)
+                elif kind == KEY:
+                    event = pygame.event.Event(pygame.KEYDOWN, key=a)
+                else:
+                    if kind == CLOSE_POPUP:
+                        # 无界面模拟在这里关闭了没有可选升级的弹窗
+                        hofund.upgrade_popup.active = False
+                    continue
+                hofund.handle_event(event)
+            hofund.update_game(current_time)
+            expected = checkpoints.get(frame)
+            if expected is not None:
+                state = hofund.game_state()
+                if state != expected:
+                    mismatches.append((frame, expected, state))
+    state = hofund.game_state()
+    if replay.final_state is not None and state != replay.final_state:
+        mismatches.append((replay.frames, replay.final_state, state))
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run Hofund headless, faster than real time.")
+    parser.add_argument("--minutes", type=float, default=10, help="game time to simulate")
+    parser.add_argument("--seed", type=int, default=None, help="random seed")
+    parser.add_argument("--tick-ms", type=float, default=1000 / hofund.TICK_RATE, help="game time per tick")
+    parser.add_argument("--random-upgrades", action="store_true", help="pick upgrades at random")
+    parser.add_argument("--policy", choices=sorted(POLICIES), help="upgrade policy (overrides --random-upgrades)")
+    parser.add_argument("--entity-store", action="store_true", help="use the NumPy entity backend")
+    parser.add_argument("--volleys", action="store_true", help="fire one volley entity per shot")
+    parser.add_argument("--waves", default="classic", choices=sorted(hofund.WAVES), help="spawn wave preset")
+    parser.add_argument("--no-pools", action="store_true", help="disable object pooling")
+    parser.add_argument("--pool-stats", action="store_true", help="print object pool statistics")
+    parser.add_argument("--verbose", action="store_true", help="keep the game's stdout output")
+    parser.add_argument("--record", metavar="FILE", help="save a replay of the run")
+    parser.add_argument("--replay", metavar="FILE", help="play back a replay and check it matches")
+    args = parser.parse_args()
+
+    if args.replay:
+        replay = Replay.load(args.replay)
+        start = time.perf_counter()
+        mismatches = play(replay, quiet=not args.verbose)
+        print(f"replayed {replay.frames} frames in {time.perf_counter() - start:.2f} s")
+        for key, value in hofund.game_state().items():
+            print(f"{key}: {value}")
+        for frame, expected, state in mismatches:
+            print(f"mismatch at frame {frame}: recorded {expected}, replayed {state}")
+        raise SystemExit(1 if mismatches else 0)
+
+    policy = random_upgrade if args.random_upgrades else first_upgrade
+    if args.policy:
+        policy = POLICIES[args.policy]
+    sim = HeadlessSimulation(tick_ms=args.tick_ms, seed=args.seed,
+                             upgrade_policy=policy, quiet=not args.verbose,
+                             entity_store=args.entity_store, object_pools=not args.no_pools,
+                             waves=args.waves, record=args.record is not None, volleys=args.volleys)
+    summary = sim.run(duration_ms=args.minutes * 60 * 1000)
+    for key, value in summary.items():
+        print(f"{key}: {value}")
+    if args.record:
+        sim.finish_recording().save(args.record)
+        print(f"saved replay: {args.record}")
+    if args.pool_stats:
+        for name, stats in hofund.pool_stats().items():
+            print(f"pool {name}: " + ", ".join(f"{key}={value}" for key, value in stats.items()))
+
+
+if __name__ == "__main__":
+    main()
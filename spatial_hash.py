@@ -0,0 +1,115 @@
+"""Uniform-grid spatial index used as the collision broad-phase.
+
+Objects are bucketed by the grid cells their rect overlaps. Rects that fall
+outside the indexed bounds are clamped into the edge cells, so queries stay
+exact for objects anywhere on (or off) the screen.
+"""
+
+
+class SpatialHash:
+    """均匀网格空间索引：对象按其矩形覆盖的网格存放，查询只检查重叠网格中的候选"""
+    def __init__(self, bounds, cell_size=64):
+        left, top, width, height = bounds
+        self.left = int(left)
+        self.top = int(top)
+        self.cell_size = cell_size
+        self.cols = max(1, -(-int(width) // cell_size))
+        self.rows = max(1, -(-int(height) // cell_size))
+        # 每个网格是一个 {对象: 插入序号} 的字典
+        self.cells = [{} for _ in range(self.cols * self.rows)]
+        # 对象 -> (网格范围, 插入序号)
+        self.entries = {}
+        self.counter = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, obj):
+        return obj in self.entries
+
+    def cell_range(self, rect):
+        """返回矩形覆盖的网格范围 (col0, row0, col1, row1)，超出边界的部分夹到边缘网格"""
+        x, y, width, height = rect
+        x -= self.left
+        y -= self.top
+        size = self.cell_size
+        last_col = self.cols - 1
+        last_row = self.rows - 1
+        col0 = x // size
+        row0 = y // size
+        col1 = (x + width - 1) // size
+        row1 = (y + height - 1) // size
+        col0 = 0 if col0 < 0 else last_col if col0 > last_col else col0
+        row0 = 0 if row0 < 0 else last_row if row0 > last_row else row0
+        col1 = col0 if col1 < col0 else last_col if col1 > last_col else col1
+        row1 = row0 if row1 < row0 else last_row if row1 > last_row else row1
+        return col0, row0, col1, row1
+
+    def _cells_in(self, cell_range):
+        col0, row0, col1, row1 = cell_range
+        cells = self.cells
+        cols = self.cols
+        for row in range(row0, row1 + 1):
+            base = row * cols
+            for col in range(col0, col1 + 1):
+                yield cells[base + col]
+
+    def insert(self, obj, rect):
+        """加入对象；插入序号决定查询结果的顺序"""
+        if obj in self.entries:
+            self.remove(obj)
+        order = self.counter
+        self.counter += 1
+        cell_range = self.cell_range(rect)
+        self.entries[obj] = (cell_range, order)
+        for cell in self._cells_in(cell_range):
+            cell[obj] = order
+
+    def remove(self, obj):
+        entry = self.entries.pop(obj, None)
+        if entry is None:
+            return
+        for cell in self._cells_in(entry[0]):
+            del cell[obj]
+
+    def update(self, obj, rect):
+        """对象移动后调用；只有覆盖的网格变化时才重新分桶"""
+        entry = self.entries.get(obj)
+        if entry is None:
+            return
+        old_range, order = entry
+        new_range = self.cell_range(rect)
+        if new_range == old_range:
+            return
+        for cell in self._cells_in(old_range):
+            del cell[obj]
+        self.entries[obj] = (new_range, order)
+        for cell in self._cells_in(new_range):
+            cell[obj] = order
+
+    def rows_changed(self, old_tops, new_tops, heights):
+        """纵向移动的对象覆盖的网格行是否可能变化；参数可以是NumPy数组（逐元素计算）。
+        不考虑夹到边缘网格，结果可能偏多，由update精确判断"""
+        size = self.cell_size
+        old_tops = old_tops - self.top
+        new_tops = new_tops - self.top
+        return ((old_tops // size != new_tops // size) |
+                ((old_tops + heights - 1) // size != (new_tops + heights - 1) // size))
+
+    def clear(self):
+        for cell in self.cells:
+            cell.clear()
+        self.entries.clear()
+
+    def query(self, rect):
+        """返回与矩形所在网格重叠的候选对象，按插入顺序排列"""
+        col0, row0, col1, row1 = self.cell_range(rect)
+        if col0 == col1 and row0 == row1:
+            cell = self.cells[row0 * self.cols + col0]
+            if len(cell) < 2:
+                return list(cell)
+            return sorted(cell, key=cell.__getitem__)
+        candidates = {}
+        for cell in self._cells_in((col0, row0, col1, row1)):
+            candidates.update(cell)
+        return sorted(candidates, key=candidates.__getitem__)
@@ -0,0 +1,66 @@
+"""Swept (continuous) collision tests, vectorized with NumPy.
+
+A sword moves up to 50 px per tick while monsters are only 30-50 px tall,
+so testing only the sword's final rect lets it pass straight through a
+monster between two ticks. Moving a box of half size ``half`` along a
+segment hits another box exactly when the box's centre, moving along the
+same segment, enters the other box grown by ``half`` on every side; the
+entry time then comes from the slab test on each axis.
+
+``entry_time`` is the same test for one segment and one box in plain float
+arithmetic, done in the same order so both give bit-identical times; with
+only a few candidates per tick it is much cheaper than building arrays.
+"""
+import math
+
+import numpy as np
+
+# 起点由终点减去位移算出，有浮点误差：恰好擦到边界的路径可能算出略小于1的进入时间
+EPSILON = 1e-9
+
+
+def entry_times(starts, moves, half_sizes, boxes):
+    """线段 starts + t * moves（t∈[0, 1]）进入扩大half_sizes后的boxes的最早时间t，未碰到为inf
+
+    starts、moves、half_sizes为 (N, 2) 数组，boxes为 (N, 4) 的 (x, y, 宽, 高)。
+    和pygame的colliderect一样，只擦过边界不算碰到。
+    """
+    low = boxes[:, :2] - half_sizes
+    high = boxes[:, :2] + boxes[:, 2:] + half_sizes
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t_low = (low - starts) / moves
+        t_high = (high - starts) / moves
+    near = np.minimum(t_low, t_high)
+    far = np.maximum(t_low, t_high)
+    # 不移动的轴：起点在区间内则整段都在区间内，否则永远不在
+    still = moves == 0
+    inside = (starts > low) & (starts < high)
+    near[still] = np.where(inside[still], -np.inf, np.inf)
+    far[still] = np.where(inside[still], np.inf, -np.inf)
+    enter = np.maximum(near.max(axis=1), 0.0)
+    leave = np.minimum(far.min(axis=1), 1.0)
+    return np.where(enter + EPSILON < leave, enter, np.inf)
+
+
+def entry_time(start, move, half_size, box):
+    """entry_times的标量版本：start、move、half_size为 (x, y)，box为 (x, y, 宽, 高)"""
+    enter = 0.0
+    leave = 1.0
+    for axis in (0, 1):
+        low = box[axis] - half_size[axis]
+        high = box[axis] + box[axis + 2] + half_size[axis]
+        position = start[axis]
+        step = move[axis]
+        if step == 0:
+            if not low < position < high:
+                return math.inf
+            continue
+        t_low = (low - position) / step
+        t_high = (high - position) / step
+        if t_low > t_high:
+            t_low, t_high = t_high, t_low
+        if t_low > enter:
+            enter = t_low
+        if t_high < leave:
+            leave = t_high
+    return enter if enter + EPSILON < leave else math.inf
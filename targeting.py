@@ -0,0 +1,238 @@
+"""Incremental target-selection index.
+
+Keeps the two candidate sets that ``Player.find_nearest_monster`` chooses
+from, updated as monsters move, start attacking or die:
+
+* attacking monsters in a heap keyed by distance to the player (they no
+  longer move, so the key never changes);
+* approaching monsters in a bucket queue keyed by ``rect.bottom``, one
+  bucket per ``band_height`` pixel rows between the attack line and the
+  defense line, so a monster is only re-bucketed every few frames.
+
+The index is updated where the move happens. Each monster's slot keeps the
+range of ``rect.bottom`` it covers, so a moved monster that is still inside
+its band costs one comparison, and the batch mover (``bands_changed``) skips
+those monsters altogether; queries then only look at the top bucket. An
+approaching monster's bottom is always above the defense line (it is placed
+on the line when it starts attacking), so the last band ends at the defense
+line and starting an attack always leaves it.
+
+Ties are broken by insertion order, which matches the group iteration
+order the original linear scans relied on.
+
+``DamageLedger`` records the damage of swords that are already flying at
+each target, so the shooter can tell when a monster is already as good as
+dead and aim the next swords at the next candidate instead.
+"""
+import heapq
+
+WAITING = -1     # 还没进入攻防区
+ATTACKING = -2   # 正在攻击防线
+
+
+class TargetIndex:
+    """增量维护的目标选择索引：攻击中的怪物按到玩家的距离，接近中的怪物按rect.bottom排序"""
+    def __init__(self, attack_line, defense_line, band_height=16):
+        self.attack_line = int(attack_line)
+        self.defense_line = int(defense_line)
+        self.band_height = band_height
+        # 每band_height个像素行一个桶：{怪物: 插入序号}
+        self.buckets = [{} for _ in range((self.defense_line - self.attack_line) // band_height + 1)]
+        self.last_bucket = len(self.buckets) - 1
+        self.top = -1            # 可能非空的最高桶
+        self.slots = {}          # 怪物 -> (所在桶 / WAITING / ATTACKING, 插入序号)
+        self.counter = 0
+        self.origin = None
+        self.attacking = []      # 堆：(距离, 插入序号, 怪物)，删除的条目延迟清理
+        self.ranges = {}         # 怪物 -> 所在位置覆盖的rect.bottom范围 [low, high)
+        self.bands = [self._range(slot) for slot in range(len(self.buckets))]
+
+    def __len__(self):
+        return len(self.slots)
+
+    def _bucket_of(self, monster):
+        if monster.attacking:
+            return ATTACKING
+        bottom = monster.rect.bottom
+        if bottom < self.attack_line:
+            return WAITING
+        return min((bottom - self.attack_line) // self.band_height, self.last_bucket)
+
+    def _distance(self, monster):
+        dx = monster.rect.centerx - self.origin[0]
+        dy = monster.rect.centery - self.origin[1]
+        return (dx * dx + dy * dy) ** 0.5
+
+    def _range(self, slot):
+        """slot覆盖的rect.bottom范围；攻击中的怪物不再移动，范围为空"""
+        if slot == ATTACKING:
+            return (1, 0)
+        if slot == WAITING:
+            return (float("-inf"), self.attack_line)
+        low = self.attack_line + slot * self.band_height
+        return (low, self.defense_line if slot == self.last_bucket else low + self.band_height)
+
+    def _place(self, monster, slot, order):
+        self.slots[monster] = (slot, order)
+        self.ranges[monster] = self._range(slot)
+        if slot == ATTACKING:
+            if self.origin is not None:
+                heapq.heappush(self.attacking, (self._distance(monster), order, monster))
+        elif slot != WAITING:
+            self.buckets[slot][monster] = order
+            if slot > self.top:
+                self.top = slot
+
+    def _unplace(self, slot, monster):
+        if slot >= 0:
+            del self.buckets[slot][monster]
+
+    def insert(self, monster):
+        order = self.counter
+        self.counter += 1
+        self._place(monster, self._bucket_of(monster), order)
+
+    def remove(self, monster):
+        entry = self.slots.pop(monster, None)
+        if entry is not None:
+            del self.ranges[monster]
+            self._unplace(entry[0], monster)
+
+    def update(self, monster):
+        """怪物移动或开始攻击后调用：离开了所在位置的rect.bottom范围时立即重新分桶"""
+        bounds = self.ranges.get(monster)
+        if bounds is None:
+            return
+        bottom = monster.rect.bottom
+        # 还在原来的范围内：一次比较
+        if bounds[0] <= bottom < bounds[1]:
+            return
+        old_slot, order = self.slots[monster]
+        if monster.attacking or bottom < self.attack_line:
+            new_slot = ATTACKING if monster.attacking else WAITING
+            if new_slot != old_slot:
+                self._unplace(old_slot, monster)
+                self._place(monster, new_slot, order)
+            return
+        if old_slot >= 0:
+            del self.buckets[old_slot][monster]
+        # 最常见的情况：接近中的怪物下移进了下一个桶（这里内联了_bucket_of和_place）
+        new_slot = min((bottom - self.attack_line) // self.band_height, self.last_bucket)
+        self.slots[monster] = (new_slot, order)
+        self.ranges[monster] = self.bands[new_slot]
+        self.buckets[new_slot][monster] = order
+        if new_slot > self.top:
+            self.top = new_slot
+
+    def bands_changed(self, old_bottoms, new_bottoms):
+        """接近中的怪物rect.bottom移动后是否可能换了位置（跨过桶边界或到达防线）；
+        参数可以是NumPy数组（逐元素计算）"""
+        band = self.band_height
+        line = self.attack_line
+        # 还没到攻击线的怪物都在WAITING，跨过桶边界也不用处理
+        return ((((old_bottoms - line) // band != (new_bottoms - line) // band) & (new_bottoms >= line)) |
+                (new_bottoms >= self.defense_line))
+
+    def clear(self):
+        for bucket in self.buckets:
+            bucket.clear()
+        self.slots.clear()
+        self.ranges.clear()
+        self.attacking = []
+        self.top = -1
+
+    def _set_origin(self, origin):
+        """玩家位置变化时重建攻击中怪物的距离堆"""
+        self.origin = origin
+        self.attacking = [(self._distance(monster), order, monster)
+                          for monster, (slot, order) in self.slots.items() if slot == ATTACKING]
+        heapq.heapify(self.attacking)
+
+    def nearest_attacking(self, origin):
+        """距离origin最近的攻击中怪物"""
+        if origin != self.origin:
+            self._set_origin(origin)
+        heap = self.attacking
+        slots = self.slots
+        while heap:
+            monster = heap[0][2]
+            if slots.get(monster) == (ATTACKING, heap[0][1]):
+                return monster
+            heapq.heappop(heap)
+        return None
+
+    def closest_to_defense(self):
+        """已进入攻防区、rect.bottom最大（离防线最近）的接近中怪物"""
+        buckets = self.buckets
+        while self.top >= 0 and not buckets[self.top]:
+            self.top -= 1
+        if self.top < 0:
+            return None
+        bucket = buckets[self.top]
+        if len(bucket) == 1:
+            return next(iter(bucket))
+        # 桶内按rect.bottom最大、插入顺序最早选择
+        return max(bucket, key=lambda monster: (monster.rect.bottom, -bucket[monster]))
+
+    def ranked(self, origin):
+        """按nearest的优先顺序依次产生所有候选目标：攻击中的怪物由近到远，然后接近中的怪物由近防线到远"""
+        if self.nearest_attacking(origin) is not None:
+            slots = self.slots
+            for _, order, monster in sorted(self.attacking):
+                if slots.get(monster) == (ATTACKING, order):
+                    yield monster
+        for slot in range(self.top, -1, -1):
+            bucket = self.buckets[slot]
+            if bucket:
+                yield from sorted(bucket, key=lambda monster: (-monster.rect.bottom, bucket[monster]))
+
+    def nearest(self, origin):
+        """优先返回攻击中的最近怪物，否则返回离防线最近的怪物"""
+        monster = self.nearest_attacking(origin)
+        if monster is None:
+            monster = self.closest_to_defense()
+        return monster
+
+
+class DamageLedger:
+    """在途伤害账本：已发射、还在飞行中的飞剑预计对各个目标造成的伤害
+
+    每把飞剑（齐射中为 (齐射, 刀片序号)）是一个token。飞剑命中或飞出屏幕时release，
+    目标死亡时forget，瞄准它的飞剑不再计入任何目标。
+    """
+    def __init__(self):
+        self.incoming = {}   # 怪物 -> 在途伤害
+        self.shots = {}      # token -> (怪物, 伤害)
+        self.by_target = {}  # 怪物 -> {token}
+
+    def __len__(self):
+        return len(self.shots)
+
+    def commit(self, token, monster, damage):
+        self.shots[token] = (monster, damage)
+        self.incoming[monster] = self.incoming.get(monster, 0) + damage
+        self.by_target.setdefault(monster, set()).add(token)
+
+    def release(self, token):
+        """飞剑消失（命中或飞出屏幕）"""
+        entry = self.shots.pop(token, None)
+        if entry is None:
+            return
+        monster, damage = entry
+        tokens = self.by_target[monster]
+        tokens.discard(token)
+        if tokens:
+            self.incoming[monster] -= damage
+        else:
+            del self.by_target[monster]
+            del self.incoming[monster]
+
+    def forget(self, monster):
+        """目标死亡"""
+        for token in self.by_target.pop(monster, ()):
+            del self.shots[token]
+        self.incoming.pop(monster, None)
+
+    def remaining_health(self, monster):
+        """扣除在途伤害后的剩余生命"""
+        return monster.health - self.incoming.get(monster, 0)
@@ -0,0 +1,71 @@
+"""Shared fonts and a bounded LRU cache of rendered text surfaces.
+
+Fonts are created once per (name, size) and reused, and rendered text is
+cached by (font, text, color) so per-frame HUD and damage-number drawing
+only hits ``Font.render`` when the text actually changes. Cached surfaces
+are shared: callers that change a surface's alpha must set it before
+every blit.
+"""
+from collections import OrderedDict
+
+import pygame
+
+
+class FontRegistry:
+    """进程内共享的字体表，每种(字体, 字号)只创建一次"""
+    def __init__(self):
+        self.fonts = {}
+
+    def get(self, size, name=None):
+        key = (name, size)
+        font = self.fonts.get(key)
+        if font is None:
+            font = pygame.font.Font(name, size)
+            self.fonts[key] = font
+        return font
+
+
+class TextCache:
+    """有界LRU文字渲染缓存，键为(font, text, color)"""
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.surfaces)
+
+    def render(self, font, text, color, antialias=True):
+        key = (font, text, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False)
+            self.evictions += 1
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+    def reset_stats(self):
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """命中统计，用于调整缓存大小"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.surfaces),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }